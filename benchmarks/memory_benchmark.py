@@ -0,0 +1,99 @@
+"""Memory used per comment by the in-memory Store.
+
+Builds a tree of N comments (1 post per 100 comments, half of the comments
+are replies) and reports the resident memory it added, divided by N. Each
+run happens in a fresh process so runs don't share allocator state.
+
+    python benchmarks/memory_benchmark.py                      # 1M and 10M comments
+    python benchmarks/memory_benchmark.py --counts 1000000 --layout protobuf
+
+--layout protobuf keeps full reddit_pb2 messages in dicts, the way the Store
+did before it switched to compact records, for comparison.
+"""
+import argparse
+import gc
+import os
+import resource
+import subprocess
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from ids import SnowflakeGenerator
+from proto import reddit_pb2
+from store import Store
+
+AUTHORS = [f"user{i}" for i in range(1000)]
+COMMENTS_PER_POST = 100
+CHUNK_SIZE = 1000
+
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # Peak, not current, outside Linux
+
+
+def generate(count):
+    # Chunks of (posts, comments), with IDs like the server generates
+    ids = SnowflakeGenerator()
+    for start in range(0, count, CHUNK_SIZE):
+        posts = [reddit_pb2.Post(id=str(ids.next_id()), title="Title", text="Post text", author=AUTHORS[0], subreddit_id=1)
+                 for _ in range(-(-CHUNK_SIZE // COMMENTS_PER_POST))]
+        comments = []
+        for i in range(min(CHUNK_SIZE, count - start)):
+            # Even comments are top level, odd ones reply to the comment before them
+            parent_id = posts[i // COMMENTS_PER_POST].id if i % 2 == 0 else comments[-1].comment_id
+            comments.append(reddit_pb2.Comment(comment_id=str(ids.next_id()), author=AUTHORS[i % len(AUTHORS)],
+                                               parent_id=parent_id, text=f"Comment text {i}", publication_date=1700000000))
+        yield posts, comments
+
+
+def fill_store(count):
+    store = Store()
+    for posts, comments in generate(count):
+        store.add_posts(posts)
+        store.add_comments(comments)
+    return store
+
+
+def fill_protobuf(count):
+    posts, comments, children = {}, {}, {}
+    for chunk_posts, chunk_comments in generate(count):
+        posts.update((post.id, post) for post in chunk_posts)
+        for comment in chunk_comments:
+            comments[comment.comment_id] = comment
+            children.setdefault(comment.parent_id, []).append(comment.comment_id)
+    return posts, comments, children
+
+
+def measure(count, layout):
+    gc.collect()
+    before = rss_bytes()
+    data = (fill_store if layout == 'store' else fill_protobuf)(count)
+    gc.collect()
+    used = rss_bytes() - before
+    print(f"{layout:>8} {count:>11,} comments: {used / 2 ** 20:9.1f} MiB, {used / count:6.1f} bytes/comment")
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Store memory benchmark')
+    parser.add_argument('--counts', default='1000000,10000000', help='Comma separated comment counts')
+    parser.add_argument('--layout', default='store', choices=['store', 'protobuf'])
+    parser.add_argument('--single', action='store_true', help=argparse.SUPPRESS)  # One measurement in this process
+    args = parser.parse_args()
+
+    counts = [int(count) for count in args.counts.split(',')]
+    if args.single:
+        measure(counts[0], args.layout)
+        return
+    for count in counts:
+        subprocess.run([sys.executable, __file__, '--counts', str(count), '--layout', args.layout, '--single'], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Vote throughput of the durable in-memory store for different fsync intervals.
+
+Every vote is acknowledged only once it is fsynced, so a single caller is
+bound by fsync latency and throughput comes from many callers sharing each
+fsync (group commit). Runs --threads voters against one DurableStore per
+interval in a temporary directory, plus the plain Store for reference.
+
+    python benchmarks/oplog_benchmark.py --threads 16 --votes 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from durable_store import DurableStore
+from proto import reddit_pb2
+from store import Store
+
+NUM_POSTS = 100
+
+
+def run_votes(backend, num_threads, votes_per_thread):
+    # Returns (votes per second, mean seconds per vote)
+    latencies = []
+    barrier = threading.Barrier(num_threads + 1)
+
+    def voter(index):
+        barrier.wait()
+        start = time.perf_counter()
+        for i in range(votes_per_thread):
+            backend.vote_post(f"p{(index + i) % NUM_POSTS}", 1)
+        latencies.append((time.perf_counter() - start) / votes_per_thread)
+
+    threads = [threading.Thread(target=voter, args=(i,)) for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return num_threads * votes_per_thread / elapsed, sum(latencies) / len(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Operation log group commit benchmark')
+    parser.add_argument('--threads', default=16, type=int)
+    parser.add_argument('--votes', default=500, type=int, help='Votes per thread')
+    parser.add_argument('--intervals', default='0,0.001,0.002,0.005,0.01,0.02', help='Comma separated fsync intervals in seconds')
+    args = parser.parse_args()
+
+    posts = [reddit_pb2.Post(id=f"p{i}") for i in range(NUM_POSTS)]
+    store = Store()
+    store.add_posts(posts)
+    throughput, latency = run_votes(store, args.threads, args.votes)
+    print(f"{'no log':>14}: {throughput:10.0f} votes/s, {latency * 1e3:7.3f} ms/vote")
+
+    for interval in [float(interval) for interval in args.intervals.split(',')]:
+        with tempfile.TemporaryDirectory() as directory:
+            durable = DurableStore(directory, fsync_interval=interval, snapshot_interval=0)
+            durable.add_posts(posts)
+            throughput, latency = run_votes(durable, args.threads, args.votes)
+            durable.close()
+        print(f"fsync {interval * 1e3:5.1f} ms: {throughput:10.0f} votes/s, {latency * 1e3:7.3f} ms/vote")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Startup time of the durable store from a snapshot of N comments.
+
+Writes one snapshot per count in the mapped format and one in the older
+framed format (the logged add of every item), then times opening a
+DurableStore on each: the framed one is replayed into memory, the mapped
+one is only mapped. Also times the first page read after startup, which
+is where the mapped store reads its pages in.
+
+    python benchmarks/startup_benchmark.py --counts 10000,100000,1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from durable_store import DurableStore, encode_add
+from mapped_snapshot import write_mapped_snapshot
+from memory_benchmark import fill_store
+from oplog import frame
+
+
+def write_framed_snapshot(path, items):
+    with open(path, 'wb') as file:
+        for item in items:
+            file.write(frame(encode_add(item)))
+
+
+def time_startup(directory):
+    # Returns (seconds to open, seconds for the first read of a post page)
+    start = time.perf_counter()
+    durable = DurableStore(directory, snapshot_interval=0)
+    opened = time.perf_counter() - start
+    post_id = durable.post_ids()[-1]
+    start = time.perf_counter()
+    for comment in durable.top_children(post_id, 10):
+        durable.top_children(comment.comment_id, 3)
+    first_read = time.perf_counter() - start
+    durable.log.close()  # Without the final snapshot, the directory is thrown away
+    return opened, first_read
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Snapshot startup benchmark')
+    parser.add_argument('--counts', default='10000,100000,1000000', help='Comma separated numbers of comments')
+    args = parser.parse_args()
+
+    for count in [int(count) for count in args.counts.split(',')]:
+        store = fill_store(count)
+        for name, write in (('framed', write_framed_snapshot), ('mapped', write_mapped_snapshot)):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, f"snapshot-{1:010d}")
+                write(path, store.snapshot())
+                size = os.path.getsize(path)
+                opened, first_read = time_startup(directory)
+            print(f"{count:>9} comments, {name}: {size / 2**20:7.1f} MiB, startup {opened * 1e3:9.1f} ms, "
+                  f"first page {first_read * 1e3:6.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
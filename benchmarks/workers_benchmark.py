@@ -0,0 +1,86 @@
+"""Requests per second of the server for different numbers of worker processes.
+
+Starts the server with --workers N for every N in --workers, loads it from
+--clients client processes (one connection each, so the kernel spreads
+them over the workers) for --seconds, half votes and half post reads on a
+set of shared posts, and prints the throughput. --workers 0 is the single
+process server for reference. The curve flattens at the number of cores.
+
+    python benchmarks/workers_benchmark.py --workers 0,1,2,4,8 --clients 16
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import grpc
+
+from proto import reddit_pb2, reddit_pb2_grpc
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+NUM_POSTS = 100
+
+
+def connect(port):
+    channel = grpc.insecure_channel(f"localhost:{port}", options=[('grpc.use_local_subchannel_pool', 1)])
+    grpc.channel_ready_future(channel).result(timeout=10)
+    return channel, reddit_pb2_grpc.RedditServiceStub(channel)
+
+
+def client(port, post_ids, seconds, counts):
+    channel, stub = connect(port)
+    done = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        post_id = post_ids[done % len(post_ids)]
+        if done % 2:
+            stub.UpvoteDownvotePost(reddit_pb2.UpvoteDownvoteRequest(item_id=post_id, upvote=True))
+        else:
+            stub.RetrievePostContent(reddit_pb2.PostRequest(post_id=post_id))
+        done += 1
+    counts.put(done)
+    channel.close()
+
+
+def measure(port, workers, num_clients, seconds):
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'server', 'reddit_service.py'), '--port', str(port),
+                               '--workers', str(workers)],
+                              env={**os.environ, 'PYTHONPATH': ROOT}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        channel, stub = connect(port)
+        time.sleep(0.5 + 0.1 * workers)  # Every worker is listening
+        post_ids = [stub.CreatePost(reddit_pb2.Post(title=f"Post {i}", author="user1")).id for i in range(NUM_POSTS)]
+        channel.close()
+        counts = multiprocessing.Queue()
+        clients = [multiprocessing.Process(target=client, args=(port, post_ids, seconds, counts)) for _ in range(num_clients)]
+        for process in clients:
+            process.start()
+        total = sum(counts.get() for _ in clients)
+        for process in clients:
+            process.join()
+        return total / seconds
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-process server scaling benchmark')
+    parser.add_argument('--workers', default='0,1,2,4', help='Comma separated worker counts (0: single process server)')
+    parser.add_argument('--clients', default=16, type=int, help='Client processes')
+    parser.add_argument('--seconds', default=5.0, type=float)
+    parser.add_argument('--port', default=50081, type=int)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.clients} clients")
+    for workers in [int(workers) for workers in args.workers.split(',')]:
+        throughput = measure(args.port, workers, args.clients, args.seconds)
+        print(f"{workers:>3} workers: {throughput:10.0f} requests/s")
+
+
+if __name__ == '__main__':
+    main()
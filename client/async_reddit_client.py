@@ -0,0 +1,212 @@
+import asyncio
+
+import grpc
+from proto import reddit_pb2
+from proto import reddit_pb2_grpc
+
+DEFAULT_CONCURRENCY = 32  # Calls in flight at once in the fan-out helpers
+
+
+async def fan_out(calls, limit=DEFAULT_CONCURRENCY, return_exceptions=False):
+    """Runs coroutine functions (called without arguments) with at most limit of them in flight.
+
+    Returns their results in the order of calls. A failing call cancels the
+    rest and raises, unless return_exceptions is set, then its exception is
+    put in its place in the results like asyncio.gather() does. Only limit
+    coroutines exist at any time, so calls can be a long lazy iterable.
+    """
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    results = []
+    calls = enumerate(calls)
+
+    async def worker():
+        for i, call in calls:  # Shared iterator, each call is taken by one worker
+            results.extend([None] * (i + 1 - len(results)))
+            try:
+                results[i] = await call()
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results[i] = e
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(limit)]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+    return results
+
+
+class AsyncRedditClient:
+    """asyncio version of RedditClient on a grpc.aio channel, same methods as coroutines.
+
+    Streaming calls are async iterators. Calls share one channel, so many of
+    them can be in flight from a single thread; the fan-out helpers issue
+    many of the same call at once with a bound on how many are in flight.
+    Use it as an async context manager or await close().
+    """
+
+    def __init__(self, host, port):
+        self.channel = grpc.aio.insecure_channel(f"{host}:{port}")
+        self.stub = reddit_pb2_grpc.RedditServiceStub(self.channel)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self.channel.close()
+
+    async def create_post(self, title, text, subreddit_id):
+        post = reddit_pb2.Post(title=title, text=text, subreddit_id=subreddit_id)
+        return await self.stub.CreatePost(post)
+
+    async def upvote_post(self, post_id):
+        request = reddit_pb2.UpvoteDownvoteRequest(item_id=post_id, upvote=True)
+        return await self.stub.UpvoteDownvotePost(request)
+
+    async def downvote_post(self, post_id):
+        request = reddit_pb2.UpvoteDownvoteRequest(item_id=post_id, upvote=False)
+        return await self.stub.UpvoteDownvotePost(request)
+
+    async def retrieve_post_content(self, post_id):
+        request = reddit_pb2.PostRequest(post_id=post_id)
+        return await self.stub.RetrievePostContent(request)
+
+    async def create_comment(self, author, parent_id, text):
+        comment = reddit_pb2.Comment(author=author, parent_id=parent_id, text=text)
+        return await self.stub.CreateComment(comment)
+
+    async def upvote_comment(self, comment_id):
+        request = reddit_pb2.UpvoteDownvoteRequest(item_id=comment_id, upvote=True)
+        return await self.stub.UpvoteDownvoteComment(request)
+
+    async def downvote_comment(self, comment_id):
+        request = reddit_pb2.UpvoteDownvoteRequest(item_id=comment_id, upvote=False)
+        return await self.stub.UpvoteDownvoteComment(request)
+
+    async def retrieve_top_n_comments(self, post_id, n):
+        request = reddit_pb2.TopNCommentsRequest(post_id=post_id, n=n)
+        return await self.stub.RetrieveTopNComments(request)
+
+    async def expand_comment_branch(self, comment_id, n):
+        request = reddit_pb2.ExpandCommentBranchRequest(comment_id=comment_id, n=n)
+        return await self.stub.ExpandCommentBranch(request)
+
+    async def monitor_updates(self, post_id, comment_ids):
+        # Async iterator of ScoreUpdates, the current scores first; breaking out of the loop ends the stream
+        call = self.stub.MonitorUpdates(reddit_pb2.MonitorUpdatesRequest(post_id=post_id, comment_ids=comment_ids))
+        try:
+            async for update in call:
+                yield update
+        finally:
+            call.cancel()
+
+    # Batch calls, one round trip for many items
+    async def batch_get_posts(self, post_ids):
+        request = reddit_pb2.BatchGetPostsRequest(post_ids=post_ids)
+        return await self.stub.BatchGetPosts(request)
+
+    async def batch_vote(self, votes):
+        # votes: iterable of (item_id, upvote) pairs, item_id can be a post or comment ID
+        request = reddit_pb2.BatchVoteRequest(votes=[
+            reddit_pb2.UpvoteDownvoteRequest(item_id=item_id, upvote=upvote) for item_id, upvote in votes])
+        return await self.stub.BatchVote(request)
+
+    async def batch_create_comments(self, comments):
+        # comments: iterable of (author, parent_id, text) tuples
+        request = reddit_pb2.BatchCreateCommentsRequest(comments=[
+            reddit_pb2.Comment(author=author, parent_id=parent_id, text=text) for author, parent_id, text in comments])
+        return await self.stub.BatchCreateComments(request)
+
+    async def expand_comment_tree(self, root_id, depth, breadth, max_nodes=0, max_bytes=0):
+        # root_id can be a comment or a post, max_nodes/max_bytes = 0 leaves the budget to the server
+        request = reddit_pb2.ExpandCommentTreeRequest(root_id=root_id, depth=depth, breadth=breadth,
+                                                      max_nodes=max_nodes, max_bytes=max_bytes)
+        return await self.stub.ExpandCommentTree(request)
+
+    async def get_post_page(self, post_id, n, m):
+        # Post, its top n comments and the top m replies under each in one round trip
+        request = reddit_pb2.PostPageRequest(post_id=post_id, n=n, m=m)
+        return await self.stub.GetPostPage(request)
+
+    async def get_metrics(self):
+        # Server metrics as a name -> value dict
+        return dict((await self.stub.GetMetrics(reddit_pb2.MetricsRequest())).values)
+
+    # Comments under a post in score order, page by page or as a stream of chunks
+    async def retrieve_comments_page(self, post_id, page_size, cursor=""):
+        request = reddit_pb2.CommentsPageRequest(post_id=post_id, page_size=page_size, cursor=cursor)
+        return await self.stub.RetrieveCommentsPage(request)
+
+    async def iter_comment_pages(self, post_id, page_size):
+        # Fetches the next page only when the caller asks for it
+        cursor = ""
+        while True:
+            page = await self.retrieve_comments_page(post_id, page_size, cursor)
+            if page.comments:
+                yield page
+            if not page.next_cursor:
+                return
+            cursor = page.next_cursor
+
+    async def stream_comments(self, post_id, n=0, chunk_size=0):
+        # n = 0 streams all comments, chunk_size = 0 uses the server default
+        request = reddit_pb2.StreamCommentsRequest(post_id=post_id, n=n, chunk_size=chunk_size)
+        async for chunk in self.stub.StreamComments(request):
+            yield chunk
+
+    # Bulk ingest, posts and comments can be plain or async iterables of messages or dicts of their fields
+    async def ingest_posts(self, posts):
+        return await self.stub.IngestPosts(_messages(posts, reddit_pb2.Post))
+
+    async def ingest_comments(self, comments):
+        # Parents have to be streamed before their replies
+        return await self.stub.IngestComments(_messages(comments, reddit_pb2.Comment))
+
+    # Concurrent fan-out, results are in the order of the arguments
+    async def retrieve_posts(self, post_ids, limit=DEFAULT_CONCURRENCY, return_exceptions=False):
+        return await fan_out((lambda post_id=post_id: self.retrieve_post_content(post_id) for post_id in post_ids),
+                             limit, return_exceptions)
+
+    async def vote_posts(self, votes, limit=DEFAULT_CONCURRENCY, return_exceptions=False):
+        # votes: iterable of (post_id, upvote) pairs
+        return await fan_out((lambda post_id=post_id, upvote=upvote: (self.upvote_post if upvote else self.downvote_post)(post_id)
+                              for post_id, upvote in votes), limit, return_exceptions)
+
+    async def vote_comments(self, votes, limit=DEFAULT_CONCURRENCY, return_exceptions=False):
+        # votes: iterable of (comment_id, upvote) pairs
+        return await fan_out((lambda comment_id=comment_id, upvote=upvote:
+                              (self.upvote_comment if upvote else self.downvote_comment)(comment_id)
+                              for comment_id, upvote in votes), limit, return_exceptions)
+
+    async def create_comments(self, comments, limit=DEFAULT_CONCURRENCY, return_exceptions=False):
+        # comments: iterable of (author, parent_id, text) tuples
+        return await fan_out((lambda comment=comment: self.create_comment(*comment) for comment in comments),
+                             limit, return_exceptions)
+
+    # High Level Implemenation
+    async def retrieve_and_expand(self, post_id):
+        try:
+            # Post, its most upvoted comment and that comment's most upvoted reply in one call
+            page = await self.get_post_page(post_id, 1, 1)
+            if not page.post.id or not page.comments or not page.comments[0].replies:
+                return None
+            return page.comments[0].replies[0].comment
+        except grpc.RpcError as e:
+            print(f"Error while making gRPC API call: {e}")
+            return None
+
+
+async def _messages(items, message_class):
+    # Request stream of messages from a plain or async iterable of messages or field dicts
+    if hasattr(items, '__aiter__'):
+        async for item in items:
+            yield item if isinstance(item, message_class) else message_class(**item)
+    else:
+        for item in items:
+            yield item if isinstance(item, message_class) else message_class(**item)
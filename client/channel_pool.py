@@ -0,0 +1,189 @@
+import itertools
+import threading
+import time
+
+import grpc
+from proto import reddit_pb2_grpc
+
+# Pings idle connections so dead peers and NATs that dropped them are noticed
+# before a call is sent into them
+KEEPALIVE_OPTIONS = [
+    ('grpc.keepalive_time_ms', 30000),
+    ('grpc.keepalive_timeout_ms', 10000),
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.max_pings_without_data', 0),
+]
+UNHEALTHY_CODES = (grpc.StatusCode.UNAVAILABLE,)  # Errors that say the endpoint, not the request, is the problem
+POLICIES = ('round_robin', 'least_outstanding')
+
+
+class Endpoint:
+    """Health of one server address in a ChannelPool."""
+
+    def __init__(self, address):
+        self.address = address
+        self.failures = 0  # Consecutive calls that failed with an UNHEALTHY_CODES error
+        self.ejected_until = 0.0
+
+
+class Member:
+    """One channel of a ChannelPool, each has its own connection."""
+
+    def __init__(self, endpoint, channel, stub):
+        self.endpoint = endpoint
+        self.channel = channel
+        self.stub = stub
+        self.outstanding = 0  # Calls started and not finished yet
+
+
+class ChannelPool:
+    """Channels to servers that can all answer the same calls, with client-side load balancing.
+
+    Opens channels_per_endpoint channels (separate HTTP/2 connections, so
+    the per-connection concurrent stream limit applies to each) to every
+    endpoint and picks one per call, round robin or the one with the fewest
+    calls in flight ('least_outstanding'). An endpoint whose calls fail with
+    UNAVAILABLE eject_after times in a row gets no calls for
+    ejection_seconds, after that it's tried again. If every endpoint is
+    ejected, calls go to all of them rather than nowhere.
+
+    stub is a RedditServiceStub look-alike that does the picking.
+    """
+
+    def __init__(self, endpoints, channels_per_endpoint=1, policy='round_robin', eject_after=3, ejection_seconds=10.0,
+                 options=KEEPALIVE_OPTIONS, stub_class=reddit_pb2_grpc.RedditServiceStub, clock=time.monotonic):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}")
+        self.policy = policy
+        self.eject_after = eject_after
+        self.ejection_seconds = ejection_seconds
+        self.clock = clock
+        self.endpoints = [Endpoint(address) for address in endpoints]
+        self.members = []
+        for _ in range(channels_per_endpoint):
+            for endpoint in self.endpoints:
+                # A local subchannel pool keeps channels to the same address from sharing one connection
+                channel = grpc.insecure_channel(endpoint.address, options=[*options, ('grpc.use_local_subchannel_pool', 1)])
+                self.members.append(Member(endpoint, channel, stub_class(channel)))
+        self._lock = threading.Lock()
+        self._next = itertools.count()
+        self.stub = BalancedStub(self)
+
+    def _candidates(self):
+        now = self.clock()
+        healthy = [member for member in self.members if member.endpoint.ejected_until <= now]
+        return healthy or self.members
+
+    def acquire(self):
+        # Picks the member for a call and counts the call as outstanding on it
+        with self._lock:
+            candidates = self._candidates()
+            start = next(self._next) % len(candidates)
+            rotated = candidates[start:] + candidates[:start]  # Round robin, also breaks least_outstanding ties
+            member = rotated[0] if self.policy == 'round_robin' else min(rotated, key=lambda member: member.outstanding)
+            member.outstanding += 1
+            return member
+
+    def release(self, member, error=None):
+        # Ends a call acquire() started, error is the exception it failed with, if any
+        with self._lock:
+            member.outstanding -= 1
+            endpoint = member.endpoint
+            if isinstance(error, grpc.RpcError) and error.code() in UNHEALTHY_CODES:
+                endpoint.failures += 1
+                if endpoint.failures >= self.eject_after:
+                    endpoint.ejected_until = self.clock() + self.ejection_seconds
+            else:
+                endpoint.failures = 0
+
+    def healthy_endpoints(self):
+        with self._lock:
+            now = self.clock()
+            return [endpoint.address for endpoint in self.endpoints if endpoint.ejected_until <= now]
+
+    def close(self):
+        for member in self.members:
+            member.channel.close()
+
+
+class BalancedStub:
+    """Stub whose methods run on the member the pool picks for each call."""
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._methods = {}
+
+    def __getattr__(self, name):
+        method = self._methods.get(name)
+        if method is None:
+            method = self._methods[name] = BalancedMethod(self._pool, name)
+        return method
+
+
+class BalancedMethod:
+    def __init__(self, pool, name):
+        self.pool = pool
+        self.name = name
+
+    def __call__(self, request, *args, **kwargs):
+        member = self.pool.acquire()
+        try:
+            response = getattr(member.stub, self.name)(request, *args, **kwargs)
+        except Exception as e:
+            self.pool.release(member, e)
+            raise
+        if hasattr(response, '__next__'):
+            return CountedStream(self.pool, member, response)  # Outstanding until the stream ends
+        self.pool.release(member)
+        return response
+
+    def future(self, request, *args, **kwargs):
+        member = self.pool.acquire()
+        try:
+            future = getattr(member.stub, self.name).future(request, *args, **kwargs)
+        except Exception as e:
+            self.pool.release(member, e)
+            raise
+        future.add_done_callback(lambda done: self.pool.release(member, None if done.cancelled() else done.exception()))
+        return future
+
+
+class CountedStream:
+    """Response stream of a balanced call, counted as outstanding until it ends.
+
+    Other attributes (cancel(), code(), ...) are those of the grpc call.
+    """
+
+    def __init__(self, pool, member, call):
+        self._pool = pool
+        self._member = member
+        self._call = call
+        self._released = False
+
+    def _release(self, error=None):
+        if not self._released:
+            self._released = True
+            self._pool.release(self._member, error)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._call)
+        except StopIteration:
+            self._release()
+            raise
+        except Exception as e:
+            self._release(e)
+            raise
+
+    def cancel(self):
+        self._release()
+        return self._call.cancel()
+
+    def __getattr__(self, name):
+        return getattr(self._call, name)
+
+    def __del__(self):
+        self._release()
@@ -0,0 +1,220 @@
+import collections
+import threading
+import time
+
+import grpc
+from proto import reddit_pb2
+
+
+class PostEntries:
+    """What a ReadCache holds for one post."""
+
+    def __init__(self):
+        self.post = None  # (Post, time fetched)
+        self.top = {}  # n -> (TopNCommentsResponse, time fetched)
+        self.watched = set()  # Comment IDs of its lists
+
+
+class ReadCache:
+    """Client-side cache of post and top comment reads, kept fresh by MonitorUpdates.
+
+    Holds the reads of up to max_posts posts, least recently read posts are
+    dropped first. Every cached post and the comments in its cached top-N
+    lists are watched by MonitorUpdates: a post score update is patched into
+    the cached post, a comment score update drops the lists holding the
+    comment (their order may have changed). A stream sends the current
+    scores first, so changes between the read and the subscription aren't
+    missed either.
+
+    The whole cache shares one stream (one per shard in a sharded cluster)
+    rather than one per post: a stream holds a server thread for as long as
+    it is open, and a thread pool server only has a few. When a read brings
+    a post or comment the streams don't watch yet, they are opened again
+    with every cached post and comment, at most once per watch_interval
+    seconds: the new streams send the current score of everything again,
+    so reads of many new posts share a reopen rather than each paying for
+    the whole cache. Changes in between are in those current scores. Dropped
+    posts stay watched until the next reopen, their updates are ignored.
+
+    Scores are thus as fresh as the stream. Changes MonitorUpdates doesn't
+    report, new comments and comments outside a list overtaking one in it,
+    are bounded by ttl: no entry is served older than ttl seconds. The posts
+    of a stream that fails are dropped and read again next time.
+
+    Use it through RedditClient(..., cache=ReadCache()), the client binds it
+    to its monitor_posts() and drops entries for its own writes. Cached
+    messages are shared, don't modify them.
+    """
+
+    def __init__(self, max_posts=256, ttl=5.0, watch_interval=0.1, clock=time.monotonic):
+        self.max_posts = max_posts
+        self.ttl = ttl
+        self.watch_interval = watch_interval
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._monitor = None
+        self._posts = collections.OrderedDict()  # post_id -> PostEntries, least recently read first
+        self._lists = {}  # comment_id -> IDs of the cached posts whose lists hold it
+        self._streams = []  # (post IDs, call) of the open MonitorUpdates streams
+        self._watched_posts = set()  # What the open streams watch
+        self._watched_comments = set()
+        self._last_watch = None  # time.monotonic() of the last reopen
+        self._timer = None  # Pending reopen
+        self._lock = threading.Lock()
+
+    def bind(self, monitor):
+        # monitor(posts) opens MonitorUpdates streams for a post_id -> comment IDs dict and
+        # returns them as (post IDs, call) pairs
+        self._monitor = monitor
+
+    def _fresh(self, entry):
+        return entry is not None and self.clock() - entry[1] < self.ttl
+
+    def _lookup(self, post_id, pick):
+        with self._lock:
+            entries = self._posts.get(post_id)
+            entry = pick(entries) if entries is not None else None
+            if self._fresh(entry):
+                self._posts.move_to_end(post_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def _store(self, post_id, comment_ids, put):
+        # Caches a read and makes sure the streams watch the post and comment_ids
+        with self._lock:
+            entries = self._posts.get(post_id)
+            if entries is None:
+                entries = self._posts[post_id] = PostEntries()
+                while len(self._posts) > self.max_posts:
+                    self._drop(next(iter(self._posts)))
+            self._posts.move_to_end(post_id)
+            put(entries, self.clock())
+            for comment_id in comment_ids:
+                entries.watched.add(comment_id)
+                self._lists.setdefault(comment_id, set()).add(post_id)
+            if post_id not in self._watched_posts or not self._watched_comments.issuperset(comment_ids):
+                self._watch_soon()
+
+    def post(self, post_id, fetch):
+        # Cached post, fetch() reads it from the server on a miss
+        post = self._lookup(post_id, lambda entries: entries.post)
+        if post is None:
+            post = fetch()
+            if post.id:  # Missing posts aren't cached
+                self._store(post_id, [], lambda entries, now: setattr(entries, 'post', (post, now)))
+        return post
+
+    def top_comments(self, post_id, n, fetch):
+        # Cached top n comments of a post, fetch() reads them from the server on a miss
+        response = self._lookup(post_id, lambda entries: entries.top.get(n))
+        if response is None:
+            response = fetch()
+            self._store(post_id, [comment.comment_id for comment in response.comments],
+                        lambda entries, now: entries.top.__setitem__(n, (response, now)))
+        return response
+
+    def invalidate(self, item_id):
+        # Drops what a write to item_id (a post, or a comment voted on or replied to) may have changed
+        with self._lock:
+            if item_id in self._posts:
+                self._drop(item_id)
+            for post_id in list(self._lists.get(item_id, ())):
+                self._drop_lists_with(self._posts[post_id], item_id)
+
+    def close(self):
+        with self._lock:
+            for post_id in list(self._posts):
+                self._drop(post_id)
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._cancel()
+
+    def _drop(self, post_id):
+        entries = self._posts.pop(post_id)
+        for comment_id in entries.watched:
+            holders = self._lists[comment_id]
+            holders.discard(post_id)
+            if not holders:
+                del self._lists[comment_id]
+
+    @staticmethod
+    def _drop_lists_with(entries, comment_id, score=None):
+        # Drops the top-N lists holding comment_id, unless it still has score there
+        for n, (response, _) in list(entries.top.items()):
+            for comment in response.comments:
+                if comment.comment_id == comment_id and comment.score != score:
+                    del entries.top[n]
+                    break
+
+    def _cancel(self):
+        for _, call in self._streams:
+            call.cancel()
+        self._streams = []
+        self._watched_posts, self._watched_comments = set(), set()
+
+    def _watch_soon(self):
+        # Reopens the streams now, or once watch_interval has passed since the last time
+        if self._timer is not None:
+            return  # That reopen watches whatever is cached by then
+        wait = 0 if self._last_watch is None else self._last_watch + self.watch_interval - time.monotonic()
+        if wait <= 0:
+            self._watch()
+            return
+        self._timer = threading.Timer(wait, self._watch_later)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _watch_later(self):
+        with self._lock:
+            if self._timer is None:
+                return  # Closed meanwhile
+            self._timer = None
+            self._watch()
+
+    def _watch(self):
+        # (Re)opens the streams with every cached post and the comments of its lists
+        self._cancel()
+        self._last_watch = time.monotonic()
+        posts = {post_id: sorted(entries.watched) for post_id, entries in self._posts.items()}
+        self._streams = self._monitor(posts) if posts else []
+        self._watched_posts = set(posts)
+        self._watched_comments = set(self._lists)
+        for post_ids, call in self._streams:
+            threading.Thread(target=self._follow, args=(post_ids, call), daemon=True).start()
+
+    def _current(self, call):
+        return any(current is call for _, current in self._streams)
+
+    def _follow(self, post_ids, call):
+        try:
+            for update in call:
+                self._apply(call, update)
+        except grpc.RpcError:
+            pass
+        with self._lock:
+            # A stream that ended without being replaced or cancelled leaves nothing to keep its posts fresh
+            if self._current(call):
+                self._streams = [(ids, current) for ids, current in self._streams if current is not call]
+                for post_id in post_ids:
+                    self._watched_posts.discard(post_id)
+                    if post_id in self._posts:
+                        self._drop(post_id)
+
+    def _apply(self, call, update):
+        with self._lock:
+            if not self._current(call):
+                return
+            entries = self._posts.get(update.item_id)
+            if entries is not None:
+                if entries.post is not None and entries.post[0].score != update.new_score:
+                    post = reddit_pb2.Post()
+                    post.CopyFrom(entries.post[0])
+                    post.score = update.new_score
+                    entries.post = (post, entries.post[1])
+                return
+            for post_id in self._lists.get(update.item_id, ()):
+                self._drop_lists_with(self._posts[post_id], update.item_id, update.new_score)
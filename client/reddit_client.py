@@ -1,84 +1,410 @@
+import queue
+
 import grpc
 from proto import reddit_pb2
 from proto import reddit_pb2_grpc
+from channel_pool import ChannelPool
+from sharding import HashRing, snowflake_node
+from proto.snowflake import EPOCH_MS
 
 class RedditClient:
-    def __init__(self, host, port):
-        self.channel = grpc.insecure_channel(f"{host}:{port}")
-        self.stub = reddit_pb2_grpc.RedditServiceStub(self.channel)
+    def __init__(self, host=None, port=None, shards=None, endpoints=None, cache=None, ids_since=EPOCH_MS,
+                 **pool_options):
+        # shards: addresses ("host:port") of the servers of a sharded cluster, a list for shards
+        # 0..N-1 or a shard -> address dict (a shard is the --node-id of its server). Calls are
+        # routed to the shard that owns their post, host and port aren't used then.
+        # ids_since: Unix time in ms the cluster started generating IDs at, decimal IDs with an
+        # older timestamp are taken for IDs from elsewhere (see _named_shard).
+        # endpoints: addresses of servers that can all answer the same calls (replicas), calls are
+        # balanced over a ChannelPool of them and pool_options are passed to it (channels_per_endpoint,
+        # policy, eject_after, ...). A shard can also be a list of replicas.
+        # cache: a ReadCache for post and top comment reads, kept fresh with MonitorUpdates.
+        self.ring = None
+        self.cache = cache
+        if cache is not None:
+            cache.bind(self.monitor_posts)
+        if shards is None:
+            self.channel, self.stub = self._connect(endpoints or f"{host}:{port}", pool_options)
+            return
+        if not isinstance(shards, dict):
+            shards = dict(enumerate(shards))
+        connections = {shard: self._connect(address, pool_options) for shard, address in shards.items()}
+        self.channels = {shard: channel for shard, (channel, _) in connections.items()}
+        self.stubs = {shard: stub for shard, (_, stub) in connections.items()}
+        self.ring = HashRing(self.stubs)
+        self.ids_since = ids_since
+        self._located = {}  # ID that doesn't name its shard, or names another one -> shard it is on
+
+    @staticmethod
+    def _connect(address, pool_options):
+        # (channel or pool, stub) for one address or a balanced pool for a list of them
+        if isinstance(address, str) and not pool_options:
+            channel = grpc.insecure_channel(address)
+            return channel, reddit_pb2_grpc.RedditServiceStub(channel)
+        pool = ChannelPool([address] if isinstance(address, str) else address, **pool_options)
+        return pool, pool.stub
+
+    # Routing in a sharded cluster: a post and its whole comment tree live on one shard. New posts go to
+    # the shard of their subreddit on a consistent hash ring, and the server that creates an item puts its
+    # shard in the node bits of the ID, so an ID names its shard and no lookup is needed. IDs kept from
+    # elsewhere (ingested archives) don't: such posts are placed by hashing the post ID on the ring, and
+    # such comments are looked for on the shards once and remembered. Archive IDs can look like the
+    # cluster's, so node bits are only read off IDs whose timestamp the cluster could have made, and
+    # where this client put or found an item is looked up before anything else. An archive comment
+    # is on its parent's shard whatever its bits say: when the shard they name doesn't have the item,
+    # it is looked for (_item_call), and parents are confirmed before comments go under them.
+    def _named_shard(self, item_id):
+        # Shard named by the node bits of an ID this cluster generated, None for other IDs
+        shard = snowflake_node(item_id, self.ids_since)
+        return shard if shard in self.stubs else None
+
+    def _post_shard(self, post_id):
+        shard = self._located.get(post_id)
+        if shard is None:
+            shard = self._named_shard(post_id)
+        return shard if shard is not None else self.ring.owner(post_id)
+
+    def _item_shard(self, item_id):
+        # Shard of a comment, or of an ID that can be a post or a comment
+        shard = self._located.get(item_id)
+        if shard is None:
+            shard = self._named_shard(item_id)
+        if shard is None:
+            shard = self._locate(item_id)
+        return shard
+
+    def _locate(self, item_id):
+        owner = self.ring.owner(item_id)
+        found = self.stubs[owner].BatchGetPosts(reddit_pb2.BatchGetPostsRequest(post_ids=[item_id])).results
+        if found[0].status == reddit_pb2.ITEM_OK:
+            self._located[item_id] = owner  # A post placed by the ring
+            return owner
+        for shard in [owner, *(shard for shard in self.stubs if shard != owner)]:
+            request = reddit_pb2.ExpandCommentBranchRequest(comment_id=item_id, n=0)
+            if self.stubs[shard].ExpandCommentBranch(request).comments:
+                self._located[item_id] = shard
+                return shard
+        return owner  # Missing, the call gets the usual answer for that
+
+    def _parent_shard(self, parent_id):
+        # Shard a new comment under parent_id goes to. A parent routed by its bits is asked for first,
+        # a comment under a parent that isn't there would be on the wrong shard for good.
+        shard = self._located.get(parent_id)
+        if shard is not None:
+            return shard
+        shard = self._named_shard(parent_id)
+        if shard is None or not self._has(shard, parent_id):
+            return self._locate(parent_id)
+        self._located[parent_id] = shard
+        return shard
+
+    def _has(self, shard, item_id):
+        found = self.stubs[shard].BatchGetPosts(reddit_pb2.BatchGetPostsRequest(post_ids=[item_id])).results
+        if found[0].status == reddit_pb2.ITEM_OK:
+            return True
+        request = reddit_pb2.ExpandCommentBranchRequest(comment_id=item_id, n=0)
+        return bool(self.stubs[shard].ExpandCommentBranch(request).comments)
+
+    def _by_bits(self, item_id):
+        # Whether item_id is routed only on the word of its node bits
+        return item_id not in self._located and self._named_shard(item_id) is not None
+
+    def _post_stub(self, post_id):
+        return self.stub if self.ring is None else self.stubs[self._post_shard(post_id)]
+
+    def _item_call(self, item_id, call, missing):
+        # call(stub) on the shard of item_id, again on the shard it's found on if the one its bits
+        # name answers missing(response)
+        if self.ring is None:
+            return call(self.stub)
+        shard = self._item_shard(item_id)
+        response = call(self.stubs[shard])
+        if missing(response) and self._by_bits(item_id):
+            located = self._locate(item_id)
+            if located != shard:
+                response = call(self.stubs[located])
+        return response
+
+    def _scatter(self, items, shard_of, call):
+        # Sends the items of each shard in one concurrent call, call(stub, items) returns a future of a
+        # response whose results are in item order. Returns the results in the order of items.
+        groups = {}
+        for i, item in enumerate(items):
+            groups.setdefault(shard_of(item), []).append(i)
+        futures = {shard: call(self.stubs[shard], [items[i] for i in indexes]) for shard, indexes in groups.items()}
+        results = [None] * len(items)
+        for shard, indexes in groups.items():
+            for i, result in zip(indexes, futures[shard].result().results):
+                results[i] = result
+        return results
+
+    def _split_stream(self, method, items, shard_of):
+        # Client stream split into one stream per shard, items are passed on as they are produced.
+        # Returns the merged IngestSummary with the IDs and rejections in the order of items.
+        queues, futures, order = {}, {}, []
+        for item in items:
+            shard = shard_of(item)
+            if shard not in queues:
+                queues[shard] = queue.Queue(maxsize=1000)
+                futures[shard] = getattr(self.stubs[shard], method).future(iter(queues[shard].get, None))
+            while True:
+                try:
+                    queues[shard].put(item, timeout=1)
+                    break
+                except queue.Full:
+                    if futures[shard].done():
+                        futures[shard].result()  # Raises the error that ended the stream
+            order.append(shard)
+        for stream in queues.values():
+            stream.put(None)
+        summaries = {shard: future.result() for shard, future in futures.items()}
+        positions = {shard: [] for shard in summaries}  # shard -> positions in items of the items it got
+        for position, shard in enumerate(order):
+            positions[shard].append(position)
+        rejected = sorted((reddit_pb2.IngestRejection(index=positions[shard][rejection.index], id=rejection.id,
+                                                      status=rejection.status)
+                           for shard, summary in summaries.items() for rejection in summary.rejected),
+                          key=lambda rejection: rejection.index)
+        refused = {rejection.index for rejection in rejected}
+        ids = {shard: iter(summary.ids) for shard, summary in summaries.items()}
+        return reddit_pb2.IngestSummary(count=sum(summary.count for summary in summaries.values()),
+                                        ids=[next(ids[shard]) for position, shard in enumerate(order)
+                                             if position not in refused],
+                                        rejected=rejected)
 
     def create_post(self, title, text, subreddit_id):
         post = reddit_pb2.Post(title=title, text=text, subreddit_id=subreddit_id)
+        if self.ring is not None:
+            return self.stubs[self.ring.owner(f"subreddit-{subreddit_id}")].CreatePost(post)
         return self.stub.CreatePost(post)
 
+    def _write(self, item_ids, call):
+        # Our own writes show up in our next reads, not only once MonitorUpdates reports them. Cached
+        # entries are dropped again once call() returns, a read in between may have cached the old data.
+        self._invalidate(item_ids)
+        try:
+            return call()
+        finally:
+            self._invalidate(item_ids)
+
+    def _invalidate(self, item_ids):
+        if self.cache is not None:
+            for item_id in item_ids:
+                self.cache.invalidate(item_id)
+
     def upvote_post(self, post_id):
         print(f"Upvoting post with ID: {post_id}")
         request = reddit_pb2.UpvoteDownvoteRequest(item_id=post_id, upvote=True)
-        return self.stub.UpvoteDownvotePost(request)
+        return self._write([post_id], lambda: self._post_stub(post_id).UpvoteDownvotePost(request))
     
     def downvote_post(self, post_id):
         request = reddit_pb2.UpvoteDownvoteRequest(item_id=post_id, upvote=False)
-        return self.stub.UpvoteDownvotePost(request)
+        return self._write([post_id], lambda: self._post_stub(post_id).UpvoteDownvotePost(request))
 
     def retrieve_post_content(self, post_id):
         request = reddit_pb2.PostRequest(post_id=post_id)
-        return self.stub.RetrievePostContent(request)
+        if self.cache is not None:
+            return self.cache.post(post_id, lambda: self._post_stub(post_id).RetrievePostContent(request))
+        return self._post_stub(post_id).RetrievePostContent(request)
 
     def create_comment(self, author, parent_id, text):
         comment = reddit_pb2.Comment(author=author, parent_id=parent_id, text=text)
-        return self.stub.CreateComment(comment)
+        stub = self.stub if self.ring is None else self.stubs[self._parent_shard(parent_id)]
+        return self._write([parent_id], lambda: stub.CreateComment(comment))
 
     def upvote_comment(self, comment_id):
         request = reddit_pb2.UpvoteDownvoteRequest(item_id=comment_id, upvote=True)
-        return self.stub.UpvoteDownvoteComment(request)
+        return self._write([comment_id], lambda: self._item_call(
+            comment_id, lambda stub: stub.UpvoteDownvoteComment(request), lambda comment: not comment.comment_id))
 
     def downvote_comment(self, comment_id):
         request = reddit_pb2.UpvoteDownvoteRequest(item_id=comment_id, upvote=False)
-        return self.stub.UpvoteDownvoteComment(request)
+        return self._write([comment_id], lambda: self._item_call(
+            comment_id, lambda stub: stub.UpvoteDownvoteComment(request), lambda comment: not comment.comment_id))
 
     def retrieve_top_n_comments(self, post_id, n):
         request = reddit_pb2.TopNCommentsRequest(post_id=post_id, n=n)
-        return self.stub.RetrieveTopNComments(request)
+        if self.cache is not None:
+            return self.cache.top_comments(post_id, n, lambda: self._post_stub(post_id).RetrieveTopNComments(request))
+        return self._post_stub(post_id).RetrieveTopNComments(request)
 
     def expand_comment_branch(self, comment_id, n):
         request = reddit_pb2.ExpandCommentBranchRequest(comment_id=comment_id, n=n)
-        return self.stub.ExpandCommentBranch(request)
+        return self._item_call(comment_id, lambda stub: stub.ExpandCommentBranch(request),
+                               lambda branch: not branch.comments)
 
     # Add Monitor Updates
     def monitor_updates(self, post_id, comment_ids):
         request = reddit_pb2.MonitorUpdatesRequest(post_id=post_id, comment_ids=comment_ids)
-        return self.stub.MonitorUpdates(request)
+        return self._post_stub(post_id).MonitorUpdates(request)  # The comments are in the post's tree
+
+    def monitor_posts(self, posts):
+        # posts: dict of post_id -> comment IDs in its tree. One stream per shard rather than per post,
+        # each stream holds a server thread. Returns (post IDs, call) pairs.
+        groups = {}
+        for post_id, comment_ids in posts.items():
+            shard = None if self.ring is None else self._post_shard(post_id)
+            post_ids, group_comments = groups.setdefault(shard, ([], []))
+            post_ids.append(post_id)
+            group_comments.extend(comment_ids)
+        return [(post_ids, (self.stub if shard is None else self.stubs[shard]).MonitorUpdates(
+                    reddit_pb2.MonitorUpdatesRequest(post_ids=post_ids, comment_ids=comment_ids)))
+                for shard, (post_ids, comment_ids) in groups.items()]
+
+    # Batch calls, one round trip for many items (one per shard in a sharded cluster)
+    def batch_get_posts(self, post_ids):
+        if self.ring is not None:
+            post_ids = list(post_ids)
+            return reddit_pb2.BatchGetPostsResponse(results=self._scatter(
+                post_ids, self._post_shard,
+                lambda stub, ids: stub.BatchGetPosts.future(reddit_pb2.BatchGetPostsRequest(post_ids=ids))))
+        request = reddit_pb2.BatchGetPostsRequest(post_ids=post_ids)
+        return self.stub.BatchGetPosts(request)
+
+    def batch_vote(self, votes):
+        # votes: iterable of (item_id, upvote) pairs, item_id can be a post or comment ID
+        request = reddit_pb2.BatchVoteRequest(votes=[
+            reddit_pb2.UpvoteDownvoteRequest(item_id=item_id, upvote=upvote) for item_id, upvote in votes])
+        return self._write([vote.item_id for vote in request.votes], lambda: self._batch_vote(request))
+
+    def _batch_vote(self, request):
+        if self.ring is None:
+            return self.stub.BatchVote(request)
+        votes = list(request.votes)
+        results = self._scatter(votes, lambda vote: self._item_shard(vote.item_id), self._send_votes)
+        # Votes the shard named by the item's bits didn't find go to the shard the item is found on
+        retry = [i for i, result in enumerate(results)
+                 if result.status == reddit_pb2.ITEM_NOT_FOUND and self._by_bits(votes[i].item_id)]
+        shards = {i: self._locate(votes[i].item_id) for i in retry}
+        retry = [i for i in retry if shards[i] != self._named_shard(votes[i].item_id)]
+        retried = self._scatter(retry, shards.get, lambda stub, indexes: self._send_votes(stub, [votes[i] for i in indexes]))
+        for i, result in zip(retry, retried):
+            results[i] = result
+        return reddit_pb2.BatchVoteResponse(results=results)
+
+    @staticmethod
+    def _send_votes(stub, votes):
+        return stub.BatchVote.future(reddit_pb2.BatchVoteRequest(votes=votes))
+
+    def batch_create_comments(self, comments):
+        # comments: iterable of (author, parent_id, text) tuples
+        request = reddit_pb2.BatchCreateCommentsRequest(comments=[
+            reddit_pb2.Comment(author=author, parent_id=parent_id, text=text) for author, parent_id, text in comments])
+        return self._write([comment.parent_id for comment in request.comments],
+                           lambda: self._batch_create_comments(request))
+
+    def _batch_create_comments(self, request):
+        if self.ring is not None:
+            return reddit_pb2.BatchCreateCommentsResponse(results=self._scatter(
+                list(request.comments), lambda comment: self._parent_shard(comment.parent_id),
+                lambda stub, comments: stub.BatchCreateComments.future(
+                    reddit_pb2.BatchCreateCommentsRequest(comments=comments))))
+        return self.stub.BatchCreateComments(request)
+
+    def expand_comment_tree(self, root_id, depth, breadth, max_nodes=0, max_bytes=0):
+        # root_id can be a comment or a post, max_nodes/max_bytes = 0 leaves the budget to the server
+        request = reddit_pb2.ExpandCommentTreeRequest(root_id=root_id, depth=depth, breadth=breadth,
+                                                      max_nodes=max_nodes, max_bytes=max_bytes)
+        # An empty response is also what a post without comments gets, looking it up costs one more call
+        return self._item_call(root_id, lambda stub: stub.ExpandCommentTree(request),
+                               lambda tree: not tree.root.comment_id and not tree.replies)
+
+    def get_post_page(self, post_id, n, m):
+        # Post, its top n comments and the top m replies under each in one round trip
+        request = reddit_pb2.PostPageRequest(post_id=post_id, n=n, m=m)
+        return self._post_stub(post_id).GetPostPage(request)
+
+    def get_metrics(self):
+        # Server metrics as a name -> value dict, in a sharded cluster names are prefixed with "shard<N>."
+        if self.ring is not None:
+            return {f"shard{shard}.{name}": value for shard, stub in self.stubs.items()
+                    for name, value in stub.GetMetrics(reddit_pb2.MetricsRequest()).values.items()}
+        return dict(self.stub.GetMetrics(reddit_pb2.MetricsRequest()).values)
+
+    # Comments under a post in score order, page by page or as a stream of chunks
+    def retrieve_comments_page(self, post_id, page_size, cursor=""):
+        request = reddit_pb2.CommentsPageRequest(post_id=post_id, page_size=page_size, cursor=cursor)
+        return self._post_stub(post_id).RetrieveCommentsPage(request)
+
+    def iter_comment_pages(self, post_id, page_size):
+        # Fetches the next page only when the caller asks for it
+        cursor = ""
+        while True:
+            page = self.retrieve_comments_page(post_id, page_size, cursor)
+            if page.comments:
+                yield page
+            if not page.next_cursor:
+                return
+            cursor = page.next_cursor
+
+    def stream_comments(self, post_id, n=0, chunk_size=0):
+        # n = 0 streams all comments, chunk_size = 0 uses the server default
+        request = reddit_pb2.StreamCommentsRequest(post_id=post_id, n=n, chunk_size=chunk_size)
+        return self._post_stub(post_id).StreamComments(request)
+
+    # Bulk ingest, posts and comments can be any iterable (e.g. a generator reading an archive),
+    # items are streamed to the server as they are produced. Items are Post/Comment messages or
+    # dicts of their fields; IDs, scores and dates given in the items are kept. Items whose ID is
+    # already taken aren't stored, the summary lists them under rejected.
+    def ingest_posts(self, posts):
+        posts = (post if isinstance(post, reddit_pb2.Post) else reddit_pb2.Post(**post) for post in posts)
+        if self.ring is not None:
+            return self._split_stream('IngestPosts', posts, lambda post: self._post_shard(post.id) if post.id
+                                      else self.ring.owner(f"subreddit-{post.subreddit_id}"))
+        return self.stub.IngestPosts(posts)
+
+    def ingest_comments(self, comments):
+        # Parents have to be streamed before their replies
+        comments = (comment if isinstance(comment, reddit_pb2.Comment) else reddit_pb2.Comment(**comment)
+                    for comment in comments)
+        if self.ring is not None:
+            placed = {}  # Comment ID -> shard of the comments streamed so far that their ID names
+            return self._split_stream('IngestComments', comments,
+                                      lambda comment: self._ingested_comment_shard(comment, placed))
+        return self.stub.IngestComments(comments)
+
+    def _ingested_comment_shard(self, comment, placed):
+        # Replies later in the same stream look their parent up before it's stored, so remember where it
+        # went: for later calls too if its ID names another shard, for this stream if it names that one
+        shard = placed.get(comment.parent_id)
+        if shard is None:
+            shard = self._parent_shard(comment.parent_id)
+        if comment.comment_id:
+            if self._named_shard(comment.comment_id) != shard:
+                self._located[comment.comment_id] = shard
+            else:
+                placed[comment.comment_id] = shard
+        return shard
 
     def close(self):
+        if self.cache is not None:
+            self.cache.close()
+        if self.ring is not None:
+            for channel in self.channels.values():
+                channel.close()
+            return
         self.channel.close()
         
      
     # High Level Implemenation
     def retrieve_and_expand(self, post_id):
         try:
-            # Retrieve the post
-            post = self.retrieve_post_content(post_id)
+            # Post, its most upvoted comment and that comment's most upvoted reply in one call
+            page = self.get_post_page(post_id, 1, 1)
 
             # Check if the post exists
-            if not post or not post.id:
+            if not page or not page.post.id:
                 return None
 
-            # Retrieve the most upvoted comments
-            top_comments_response = self.retrieve_top_n_comments(post_id, 1)
-            if not top_comments_response or not top_comments_response.comments:
+            if not page.comments:
                 return None
 
-            most_upvoted_comment = top_comments_response.comments[0]
-
-            # Expand the most upvoted comment
-            expanded_comments_response = self.expand_comment_branch(
-                most_upvoted_comment.comment_id, 2)
-
-            if not expanded_comments_response or len(expanded_comments_response.comments) <= 1:
+            most_upvoted_comment = page.comments[0]
+            if not most_upvoted_comment.replies:
                 return None
 
             # Return the most upvoted reply under the most upvoted comment
-            return expanded_comments_response.comments[1]
+            return most_upvoted_comment.replies[0].comment
         except grpc.RpcError as e:
             print(f"Error while making gRPC API call: {e}")
             return None
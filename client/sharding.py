@@ -0,0 +1,46 @@
+import bisect
+import hashlib
+import time
+
+# A sharded server generates IDs with its shard number as node ID (see the
+# Snowflake layout in proto/snowflake.py), so the shard that holds an item can
+# be read off its ID.
+from proto.snowflake import EPOCH_MS, TIMESTAMP_SHIFT, node_of, timestamp_ms, to_key
+
+MIN_SNOWFLAKE_ID = 1 << TIMESTAMP_SHIFT  # Smaller numbers are IDs from elsewhere (e.g. an archive)
+MAX_AHEAD_MS = 60_000  # How far ahead of the clock a generator may run (see SnowflakeGenerator)
+
+
+def snowflake_node(item_id, since_ms=EPOCH_MS, clock=time.time):
+    # Node ID of a Snowflake ID generated since since_ms (Unix ms), or None for any other ID. IDs from
+    # elsewhere (e.g. an archive) can be decimal numbers too: their node bits only mean something if
+    # their timestamp is one the cluster could have generated them at, between since_ms and now.
+    key = to_key(item_id)
+    if isinstance(key, str) or key < MIN_SNOWFLAKE_ID:
+        return None
+    if not since_ms <= timestamp_ms(key) <= clock() * 1000 + MAX_AHEAD_MS:
+        return None
+    return node_of(key)
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent hashing of keys onto shards.
+
+    Every shard is placed on the ring at `replicas` pseudo-random points and
+    a key belongs to the first point at or after its own hash. Adding or
+    removing a shard only moves the keys of the arcs next to its points,
+    about 1/N of them, and the virtual points spread keys evenly.
+    """
+
+    def __init__(self, shards, replicas=64):
+        points = sorted((_hash(f"{shard}#{i}"), shard) for shard in shards for i in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def owner(self, key):
+        i = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._shards[i]
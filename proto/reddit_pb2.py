@@ -14,19 +14,23 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x12proto/reddit.proto\x12\x0fredditDataModel\"\x17\n\x04User\x12\x0f\n\x07user_id\x18\x01 \x01(\t\"\xdc\x01\n\x04Post\x12\n\n\x02id\x18\x01 \x01(\t\x12\r\n\x05title\x18\x02 \x01(\t\x12\x0c\n\x04text\x18\x03 \x01(\t\x12\x13\n\tvideo_url\x18\x04 \x01(\tH\x00\x12\x13\n\timage_url\x18\x05 \x01(\tH\x00\x12\x0e\n\x06\x61uthor\x18\x06 \x01(\t\x12\r\n\x05score\x18\x07 \x01(\x05\x12)\n\x05state\x18\x08 \x01(\x0e\x32\x1a.redditDataModel.PostState\x12\x18\n\x10publication_date\x18\t \x01(\x03\x12\x14\n\x0csubreddit_id\x18\n \x01(\x05\x42\x07\n\x05media\"\xa5\x01\n\x07\x43omment\x12\x12\n\ncomment_id\x18\x01 \x01(\t\x12\x0e\n\x06\x61uthor\x18\x02 \x01(\t\x12\r\n\x05score\x18\x03 \x01(\x05\x12,\n\x05state\x18\x04 \x01(\x0e\x32\x1d.redditDataModel.CommentState\x12\x18\n\x10publication_date\x18\x05 \x01(\x03\x12\x11\n\tparent_id\x18\x06 \x01(\t\x12\x0c\n\x04text\x18\x07 \x01(\t\"\x13\n\x03Tag\x12\x0c\n\x04name\x18\x01 \x01(\t\"\x8d\x01\n\tSubreddit\x12\x14\n\x0csubreddit_id\x18\x01 \x01(\x05\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x38\n\nvisibility\x18\x03 \x01(\x0e\x32$.redditDataModel.SubredditVisibility\x12\"\n\x04tags\x18\x04 \x03(\x0b\x32\x14.redditDataModel.Tag\"8\n\x15UpvoteDownvoteRequest\x12\x0f\n\x07item_id\x18\x01 \x01(\t\x12\x0e\n\x06upvote\x18\x02 \x01(\x08\"\x1e\n\x0bPostRequest\x12\x0f\n\x07post_id\x18\x01 \x01(\t\"1\n\x13TopNCommentsRequest\x12\x0f\n\x07post_id\x18\x01 \x01(\t\x12\t\n\x01n\x18\x02 \x01(\x05\"W\n\x14TopNCommentsResponse\x12*\n\x08\x63omments\x18\x01 \x03(\x0b\x32\x18.redditDataModel.Comment\x12\x13\n\x0bhas_replies\x18\x02 \x03(\x08\";\n\x1a\x45xpandCommentBranchRequest\x12\x12\n\ncomment_id\x18\x01 \x01(\t\x12\t\n\x01n\x18\x02 \x01(\x05\"I\n\x1b\x45xpandCommentBranchResponse\x12*\n\x08\x63omments\x18\x01 \x03(\x0b\x32\x18.redditDataModel.Comment\"=\n\x15MonitorUpdatesRequest\x12\x0f\n\x07post_id\x18\x01 \x01(\t\x12\x13\n\x0b\x63omment_ids\x18\x02 \x03(\t\"1\n\x0bScoreUpdate\x12\x0f\n\x07item_id\x18\x01 \x01(\t\x12\x11\n\tnew_score\x18\x02 \x01(\x05*>\n\tPostState\x12\x0f\n\x0bPOST_NORMAL\x10\x00\x12\x0f\n\x0bPOST_LOCKED\x10\x01\x12\x0f\n\x0bPOST_HIDDEN\x10\x02*6\n\x0c\x43ommentState\x12\x12\n\x0e\x43OMMENT_NORMAL\x10\x00\x12\x12\n\x0e\x43OMMENT_HIDDEN\x10\x01*X\n\x13SubredditVisibility\x12\x14\n\x10SUBREDDIT_PUBLIC\x10\x00\x12\x15\n\x11SUBREDDIT_PRIVATE\x10\x01\x12\x14\n\x10SUBREDDIT_HIDDEN\x10\x02\x32\xbd\x05\n\rRedditService\x12:\n\nCreatePost\x12\x15.redditDataModel.Post\x1a\x15.redditDataModel.Post\x12S\n\x12UpvoteDownvotePost\x12&.redditDataModel.UpvoteDownvoteRequest\x1a\x15.redditDataModel.Post\x12J\n\x13RetrievePostContent\x12\x1c.redditDataModel.PostRequest\x1a\x15.redditDataModel.Post\x12\x43\n\rCreateComment\x12\x18.redditDataModel.Comment\x1a\x18.redditDataModel.Comment\x12Y\n\x15UpvoteDownvoteComment\x12&.redditDataModel.UpvoteDownvoteRequest\x1a\x18.redditDataModel.Comment\x12\x63\n\x14RetrieveTopNComments\x12$.redditDataModel.TopNCommentsRequest\x1a%.redditDataModel.TopNCommentsResponse\x12p\n\x13\x45xpandCommentBranch\x12+.redditDataModel.ExpandCommentBranchRequest\x1a,.redditDataModel.ExpandCommentBranchResponse\x12X\n\x0eMonitorUpdates\x12&.redditDataModel.MonitorUpdatesRequest\x1a\x1c.redditDataModel.ScoreUpdate0\x01\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x12proto/reddit.proto\x12\x0fredditDataModel\"\x17\n\x04User\x12\x0f\n\x07user_id\x18\x01 \x01(\t\"\xdc\x01\n\x04Post\x12\n\n\x02id\x18\x01 \x01(\t\x12\r\n\x05title\x18\x02 \x01(\t\x12\x0c\n\x04text\x18\x03 \x01(\t\x12\x13\n\tvideo_url\x18\x04 \x01(\tH\x00\x12\x13\n\timage_url\x18\x05 \x01(\tH\x00\x12\x0e\n\x06\x61uthor\x18\x06 \x01(\t\x12\r\n\x05score\x18\x07 \x01(\x05\x12)\n\x05state\x18\x08 \x01(\x0e\x32\x1a.redditDataModel.PostState\x12\x18\n\x10publication_date\x18\t \x01(\x03\x12\x14\n\x0csubreddit_id\x18\n \x01(\x05\x42\x07\n\x05media\"\xa5\x01\n\x07\x43omment\x12\x12\n\ncomment_id\x18\x01 \x01(\t\x12\x0e\n\x06\x61uthor\x18\x02 \x01(\t\x12\r\n\x05score\x18\x03 \x01(\x05\x12,\n\x05state\x18\x04 \x01(\x0e\x32\x1d.redditDataModel.CommentState\x12\x18\n\x10publication_date\x18\x05 \x01(\x03\x12\x11\n\tparent_id\x18\x06 \x01(\t\x12\x0c\n\x04text\x18\x07 \x01(\t\"\x13\n\x03Tag\x12\x0c\n\x04name\x18\x01 \x01(\t\"\x8d\x01\n\tSubreddit\x12\x14\n\x0csubreddit_id\x18\x01 \x01(\x05\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x38\n\nvisibility\x18\x03 \x01(\x0e\x32$.redditDataModel.SubredditVisibility\x12\"\n\x04tags\x18\x04 \x03(\x0b\x32\x14.redditDataModel.Tag\"8\n\x15UpvoteDownvoteRequest\x12\x0f\n\x07item_id\x18\x01 \x01(\t\x12\x0e\n\x06upvote\x18\x02 \x01(\x08\"\x1e\n\x0bPostRequest\x12\x0f\n\x07post_id\x18\x01 \x01(\t\"1\n\x13TopNCommentsRequest\x12\x0f\n\x07post_id\x18\x01 \x01(\t\x12\t\n\x01n\x18\x02 \x01(\x05\"W\n\x14TopNCommentsResponse\x12*\n\x08\x63omments\x18\x01 \x03(\x0b\x32\x18.redditDataModel.Comment\x12\x13\n\x0bhas_replies\x18\x02 \x03(\x08\";\n\x1a\x45xpandCommentBranchRequest\x12\x12\n\ncomment_id\x18\x01 \x01(\t\x12\t\n\x01n\x18\x02 \x01(\x05\"I\n\x1b\x45xpandCommentBranchResponse\x12*\n\x08\x63omments\x18\x01 \x03(\x0b\x32\x18.redditDataModel.Comment\"O\n\x15MonitorUpdatesRequest\x12\x0f\n\x07post_id\x18\x01 \x01(\t\x12\x13\n\x0b\x63omment_ids\x18\x02 \x03(\t\x12\x10\n\x08post_ids\x18\x03 \x03(\t\"1\n\x0bScoreUpdate\x12\x0f\n\x07item_id\x18\x01 \x01(\t\x12\x11\n\tnew_score\x18\x02 \x01(\x05\"(\n\x14\x42\x61tchGetPostsRequest\x12\x10\n\x08post_ids\x18\x01 \x03(\t\"^\n\nPostResult\x12+\n\x06status\x18\x01 \x01(\x0e\x32\x1b.redditDataModel.ItemStatus\x12#\n\x04post\x18\x02 \x01(\x0b\x32\x15.redditDataModel.Post\"E\n\x15\x42\x61tchGetPostsResponse\x12,\n\x07results\x18\x01 \x03(\x0b\x32\x1b.redditDataModel.PostResult\"I\n\x10\x42\x61tchVoteRequest\x12\x35\n\x05votes\x18\x01 \x03(\x0b\x32&.redditDataModel.UpvoteDownvoteRequest\"]\n\nVoteResult\x12+\n\x06status\x18\x01 \x01(\x0e\x32\x1b.redditDataModel.ItemStatus\x12\x0f\n\x07item_id\x18\x02 \x01(\t\x12\x11\n\tnew_score\x18\x03 \x01(\x05\"A\n\x11\x42\x61tchVoteResponse\x12,\n\x07results\x18\x01 \x03(\x0b\x32\x1b.redditDataModel.VoteResult\"H\n\x1a\x42\x61tchCreateCommentsRequest\x12*\n\x08\x63omments\x18\x01 \x03(\x0b\x32\x18.redditDataModel.Comment\"g\n\rCommentResult\x12+\n\x06status\x18\x01 \x01(\x0e\x32\x1b.redditDataModel.ItemStatus\x12)\n\x07\x63omment\x18\x02 \x01(\x0b\x32\x18.redditDataModel.Comment\"N\n\x1b\x42\x61tchCreateCommentsResponse\x12/\n\x07results\x18\x01 \x03(\x0b\x32\x1e.redditDataModel.CommentResult\"_\n\rIngestSummary\x12\r\n\x05\x63ount\x18\x01 \x01(\x05\x12\x0b\n\x03ids\x18\x02 \x03(\t\x12\x32\n\x08rejected\x18\x03 \x03(\x0b\x32 .redditDataModel.IngestRejection\"Y\n\x0fIngestRejection\x12\r\n\x05index\x18\x01 \x01(\x05\x12\n\n\x02id\x18\x02 \x01(\t\x12+\n\x06status\x18\x03 \x01(\x0e\x32\x1b.redditDataModel.ItemStatus\"I\n\x13\x43ommentsPageRequest\x12\x0f\n\x07post_id\x18\x01 \x01(\t\x12\x11\n\tpage_size\x18\x02 \x01(\x05\x12\x0e\n\x06\x63ursor\x18\x03 \x01(\t\"l\n\x14\x43ommentsPageResponse\x12*\n\x08\x63omments\x18\x01 \x03(\x0b\x32\x18.redditDataModel.Comment\x12\x13\n\x0bhas_replies\x18\x02 \x03(\x08\x12\x13\n\x0bnext_cursor\x18\x03 \x01(\t\"G\n\x15StreamCommentsRequest\x12\x0f\n\x07post_id\x18\x01 \x01(\t\x12\t\n\x01n\x18\x02 \x01(\x05\x12\x12\n\nchunk_size\x18\x03 \x01(\x05\"q\n\x18\x45xpandCommentTreeRequest\x12\x0f\n\x07root_id\x18\x01 \x01(\t\x12\r\n\x05\x64\x65pth\x18\x02 \x01(\x05\x12\x0f\n\x07\x62readth\x18\x03 \x01(\x05\x12\x11\n\tmax_nodes\x18\x04 \x01(\x05\x12\x11\n\tmax_bytes\x18\x05 \x01(\x05\"\x81\x01\n\x0b\x43ommentNode\x12)\n\x07\x63omment\x18\x01 \x01(\x0b\x32\x18.redditDataModel.Comment\x12-\n\x07replies\x18\x02 \x03(\x0b\x32\x1c.redditDataModel.CommentNode\x12\x18\n\x10has_more_replies\x18\x03 \x01(\x08\"\x9f\x01\n\x19\x45xpandCommentTreeResponse\x12&\n\x04root\x18\x01 \x01(\x0b\x32\x18.redditDataModel.Comment\x12-\n\x07replies\x18\x02 \x03(\x0b\x32\x1c.redditDataModel.CommentNode\x12\x18\n\x10has_more_replies\x18\x03 \x01(\x08\x12\x11\n\ttruncated\x18\x04 \x01(\x08\"8\n\x0fPostPageRequest\x12\x0f\n\x07post_id\x18\x01 \x01(\t\x12\t\n\x01n\x18\x02 \x01(\x05\x12\t\n\x01m\x18\x03 \x01(\x05\"\x82\x01\n\x10PostPageResponse\x12#\n\x04post\x18\x01 \x01(\x0b\x32\x15.redditDataModel.Post\x12.\n\x08\x63omments\x18\x02 \x03(\x0b\x32\x1c.redditDataModel.CommentNode\x12\x19\n\x11has_more_comments\x18\x03 \x01(\x08\"\x10\n\x0eMetricsRequest\"~\n\x0fMetricsResponse\x12<\n\x06values\x18\x01 \x03(\x0b\x32,.redditDataModel.MetricsResponse.ValuesEntry\x1a-\n\x0bValuesEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x01:\x02\x38\x01*>\n\tPostState\x12\x0f\n\x0bPOST_NORMAL\x10\x00\x12\x0f\n\x0bPOST_LOCKED\x10\x01\x12\x0f\n\x0bPOST_HIDDEN\x10\x02*6\n\x0c\x43ommentState\x12\x12\n\x0e\x43OMMENT_NORMAL\x10\x00\x12\x12\n\x0e\x43OMMENT_HIDDEN\x10\x01*X\n\x13SubredditVisibility\x12\x14\n\x10SUBREDDIT_PUBLIC\x10\x00\x12\x15\n\x11SUBREDDIT_PRIVATE\x10\x01\x12\x14\n\x10SUBREDDIT_HIDDEN\x10\x02*R\n\nItemStatus\x12\x0b\n\x07ITEM_OK\x10\x00\x12\x12\n\x0eITEM_NOT_FOUND\x10\x01\x12\x0f\n\x0bITEM_FAILED\x10\x02\x12\x12\n\x0eITEM_DUPLICATE\x10\x03\x32\xd2\x0c\n\rRedditService\x12:\n\nCreatePost\x12\x15.redditDataModel.Post\x1a\x15.redditDataModel.Post\x12S\n\x12UpvoteDownvotePost\x12&.redditDataModel.UpvoteDownvoteRequest\x1a\x15.redditDataModel.Post\x12J\n\x13RetrievePostContent\x12\x1c.redditDataModel.PostRequest\x1a\x15.redditDataModel.Post\x12\x43\n\rCreateComment\x12\x18.redditDataModel.Comment\x1a\x18.redditDataModel.Comment\x12Y\n\x15UpvoteDownvoteComment\x12&.redditDataModel.UpvoteDownvoteRequest\x1a\x18.redditDataModel.Comment\x12\x63\n\x14RetrieveTopNComments\x12$.redditDataModel.TopNCommentsRequest\x1a%.redditDataModel.TopNCommentsResponse\x12p\n\x13\x45xpandCommentBranch\x12+.redditDataModel.ExpandCommentBranchRequest\x1a,.redditDataModel.ExpandCommentBranchResponse\x12X\n\x0eMonitorUpdates\x12&.redditDataModel.MonitorUpdatesRequest\x1a\x1c.redditDataModel.ScoreUpdate0\x01\x12^\n\rBatchGetPosts\x12%.redditDataModel.BatchGetPostsRequest\x1a&.redditDataModel.BatchGetPostsResponse\x12R\n\tBatchVote\x12!.redditDataModel.BatchVoteRequest\x1a\".redditDataModel.BatchVoteResponse\x12p\n\x13\x42\x61tchCreateComments\x12+.redditDataModel.BatchCreateCommentsRequest\x1a,.redditDataModel.BatchCreateCommentsResponse\x12\x46\n\x0bIngestPosts\x12\x15.redditDataModel.Post\x1a\x1e.redditDataModel.IngestSummary(\x01\x12L\n\x0eIngestComments\x12\x18.redditDataModel.Comment\x1a\x1e.redditDataModel.IngestSummary(\x01\x12\x63\n\x14RetrieveCommentsPage\x12$.redditDataModel.CommentsPageRequest\x1a%.redditDataModel.CommentsPageResponse\x12\x61\n\x0eStreamComments\x12&.redditDataModel.StreamCommentsRequest\x1a%.redditDataModel.CommentsPageResponse0\x01\x12j\n\x11\x45xpandCommentTree\x12).redditDataModel.ExpandCommentTreeRequest\x1a*.redditDataModel.ExpandCommentTreeResponse\x12R\n\x0bGetPostPage\x12 .redditDataModel.PostPageRequest\x1a!.redditDataModel.PostPageResponse\x12O\n\nGetMetrics\x12\x1f.redditDataModel.MetricsRequest\x1a .redditDataModel.MetricsResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'proto.reddit_pb2', _globals)
 if _descriptor._USE_C_DESCRIPTORS == False:
   DESCRIPTOR._options = None
-  _globals['_POSTSTATE']._serialized_start=1100
-  _globals['_POSTSTATE']._serialized_end=1162
-  _globals['_COMMENTSTATE']._serialized_start=1164
-  _globals['_COMMENTSTATE']._serialized_end=1218
-  _globals['_SUBREDDITVISIBILITY']._serialized_start=1220
-  _globals['_SUBREDDITVISIBILITY']._serialized_end=1308
+  _globals['_METRICSRESPONSE_VALUESENTRY']._options = None
+  _globals['_METRICSRESPONSE_VALUESENTRY']._serialized_options = b'8\001'
+  _globals['_POSTSTATE']._serialized_start=3015
+  _globals['_POSTSTATE']._serialized_end=3077
+  _globals['_COMMENTSTATE']._serialized_start=3079
+  _globals['_COMMENTSTATE']._serialized_end=3133
+  _globals['_SUBREDDITVISIBILITY']._serialized_start=3135
+  _globals['_SUBREDDITVISIBILITY']._serialized_end=3223
+  _globals['_ITEMSTATUS']._serialized_start=3225
+  _globals['_ITEMSTATUS']._serialized_end=3307
   _globals['_USER']._serialized_start=39
   _globals['_USER']._serialized_end=62
   _globals['_POST']._serialized_start=65
@@ -50,9 +54,53 @@ if _descriptor._USE_C_DESCRIPTORS == False:
   _globals['_EXPANDCOMMENTBRANCHRESPONSE']._serialized_start=911
   _globals['_EXPANDCOMMENTBRANCHRESPONSE']._serialized_end=984
   _globals['_MONITORUPDATESREQUEST']._serialized_start=986
-  _globals['_MONITORUPDATESREQUEST']._serialized_end=1047
-  _globals['_SCOREUPDATE']._serialized_start=1049
-  _globals['_SCOREUPDATE']._serialized_end=1098
-  _globals['_REDDITSERVICE']._serialized_start=1311
-  _globals['_REDDITSERVICE']._serialized_end=2012
+  _globals['_MONITORUPDATESREQUEST']._serialized_end=1065
+  _globals['_SCOREUPDATE']._serialized_start=1067
+  _globals['_SCOREUPDATE']._serialized_end=1116
+  _globals['_BATCHGETPOSTSREQUEST']._serialized_start=1118
+  _globals['_BATCHGETPOSTSREQUEST']._serialized_end=1158
+  _globals['_POSTRESULT']._serialized_start=1160
+  _globals['_POSTRESULT']._serialized_end=1254
+  _globals['_BATCHGETPOSTSRESPONSE']._serialized_start=1256
+  _globals['_BATCHGETPOSTSRESPONSE']._serialized_end=1325
+  _globals['_BATCHVOTEREQUEST']._serialized_start=1327
+  _globals['_BATCHVOTEREQUEST']._serialized_end=1400
+  _globals['_VOTERESULT']._serialized_start=1402
+  _globals['_VOTERESULT']._serialized_end=1495
+  _globals['_BATCHVOTERESPONSE']._serialized_start=1497
+  _globals['_BATCHVOTERESPONSE']._serialized_end=1562
+  _globals['_BATCHCREATECOMMENTSREQUEST']._serialized_start=1564
+  _globals['_BATCHCREATECOMMENTSREQUEST']._serialized_end=1636
+  _globals['_COMMENTRESULT']._serialized_start=1638
+  _globals['_COMMENTRESULT']._serialized_end=1741
+  _globals['_BATCHCREATECOMMENTSRESPONSE']._serialized_start=1743
+  _globals['_BATCHCREATECOMMENTSRESPONSE']._serialized_end=1821
+  _globals['_INGESTSUMMARY']._serialized_start=1823
+  _globals['_INGESTSUMMARY']._serialized_end=1918
+  _globals['_INGESTREJECTION']._serialized_start=1920
+  _globals['_INGESTREJECTION']._serialized_end=2009
+  _globals['_COMMENTSPAGEREQUEST']._serialized_start=2011
+  _globals['_COMMENTSPAGEREQUEST']._serialized_end=2084
+  _globals['_COMMENTSPAGERESPONSE']._serialized_start=2086
+  _globals['_COMMENTSPAGERESPONSE']._serialized_end=2194
+  _globals['_STREAMCOMMENTSREQUEST']._serialized_start=2196
+  _globals['_STREAMCOMMENTSREQUEST']._serialized_end=2267
+  _globals['_EXPANDCOMMENTTREEREQUEST']._serialized_start=2269
+  _globals['_EXPANDCOMMENTTREEREQUEST']._serialized_end=2382
+  _globals['_COMMENTNODE']._serialized_start=2385
+  _globals['_COMMENTNODE']._serialized_end=2514
+  _globals['_EXPANDCOMMENTTREERESPONSE']._serialized_start=2517
+  _globals['_EXPANDCOMMENTTREERESPONSE']._serialized_end=2676
+  _globals['_POSTPAGEREQUEST']._serialized_start=2678
+  _globals['_POSTPAGEREQUEST']._serialized_end=2734
+  _globals['_POSTPAGERESPONSE']._serialized_start=2737
+  _globals['_POSTPAGERESPONSE']._serialized_end=2867
+  _globals['_METRICSREQUEST']._serialized_start=2869
+  _globals['_METRICSREQUEST']._serialized_end=2885
+  _globals['_METRICSRESPONSE']._serialized_start=2887
+  _globals['_METRICSRESPONSE']._serialized_end=3013
+  _globals['_METRICSRESPONSE_VALUESENTRY']._serialized_start=2968
+  _globals['_METRICSRESPONSE_VALUESENTRY']._serialized_end=3013
+  _globals['_REDDITSERVICE']._serialized_start=3310
+  _globals['_REDDITSERVICE']._serialized_end=4928
 # @@protoc_insertion_point(module_scope)
@@ -54,6 +54,56 @@ class RedditServiceStub(object):
                 request_serializer=proto_dot_reddit__pb2.MonitorUpdatesRequest.SerializeToString,
                 response_deserializer=proto_dot_reddit__pb2.ScoreUpdate.FromString,
                 )
+        self.BatchGetPosts = channel.unary_unary(
+                '/redditDataModel.RedditService/BatchGetPosts',
+                request_serializer=proto_dot_reddit__pb2.BatchGetPostsRequest.SerializeToString,
+                response_deserializer=proto_dot_reddit__pb2.BatchGetPostsResponse.FromString,
+                )
+        self.BatchVote = channel.unary_unary(
+                '/redditDataModel.RedditService/BatchVote',
+                request_serializer=proto_dot_reddit__pb2.BatchVoteRequest.SerializeToString,
+                response_deserializer=proto_dot_reddit__pb2.BatchVoteResponse.FromString,
+                )
+        self.BatchCreateComments = channel.unary_unary(
+                '/redditDataModel.RedditService/BatchCreateComments',
+                request_serializer=proto_dot_reddit__pb2.BatchCreateCommentsRequest.SerializeToString,
+                response_deserializer=proto_dot_reddit__pb2.BatchCreateCommentsResponse.FromString,
+                )
+        self.IngestPosts = channel.stream_unary(
+                '/redditDataModel.RedditService/IngestPosts',
+                request_serializer=proto_dot_reddit__pb2.Post.SerializeToString,
+                response_deserializer=proto_dot_reddit__pb2.IngestSummary.FromString,
+                )
+        self.IngestComments = channel.stream_unary(
+                '/redditDataModel.RedditService/IngestComments',
+                request_serializer=proto_dot_reddit__pb2.Comment.SerializeToString,
+                response_deserializer=proto_dot_reddit__pb2.IngestSummary.FromString,
+                )
+        self.RetrieveCommentsPage = channel.unary_unary(
+                '/redditDataModel.RedditService/RetrieveCommentsPage',
+                request_serializer=proto_dot_reddit__pb2.CommentsPageRequest.SerializeToString,
+                response_deserializer=proto_dot_reddit__pb2.CommentsPageResponse.FromString,
+                )
+        self.StreamComments = channel.unary_stream(
+                '/redditDataModel.RedditService/StreamComments',
+                request_serializer=proto_dot_reddit__pb2.StreamCommentsRequest.SerializeToString,
+                response_deserializer=proto_dot_reddit__pb2.CommentsPageResponse.FromString,
+                )
+        self.ExpandCommentTree = channel.unary_unary(
+                '/redditDataModel.RedditService/ExpandCommentTree',
+                request_serializer=proto_dot_reddit__pb2.ExpandCommentTreeRequest.SerializeToString,
+                response_deserializer=proto_dot_reddit__pb2.ExpandCommentTreeResponse.FromString,
+                )
+        self.GetPostPage = channel.unary_unary(
+                '/redditDataModel.RedditService/GetPostPage',
+                request_serializer=proto_dot_reddit__pb2.PostPageRequest.SerializeToString,
+                response_deserializer=proto_dot_reddit__pb2.PostPageResponse.FromString,
+                )
+        self.GetMetrics = channel.unary_unary(
+                '/redditDataModel.RedditService/GetMetrics',
+                request_serializer=proto_dot_reddit__pb2.MetricsRequest.SerializeToString,
+                response_deserializer=proto_dot_reddit__pb2.MetricsResponse.FromString,
+                )
 
 
 class RedditServiceServicer(object):
@@ -111,6 +161,72 @@ class RedditServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def BatchGetPosts(self, request, context):
+        """Batch operations, many items in one round trip with a status per item
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def BatchVote(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def BatchCreateComments(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def IngestPosts(self, request_iterator, context):
+        """Bulk ingest (e.g. archive backfill), client streams the items and gets one summary back
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def IngestComments(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def RetrieveCommentsPage(self, request, context):
+        """Comments under a post in score order, one page per call or streamed in chunks
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def StreamComments(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ExpandCommentTree(self, request, context):
+        """Expand several levels of a comment tree in one call
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetPostPage(self, request, context):
+        """Post, its top comments and their top replies in one call (a full page load)
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetMetrics(self, request, context):
+        """Server metrics (e.g. snapshot duration and pause time)
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_RedditServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -154,6 +270,56 @@ def add_RedditServiceServicer_to_server(servicer, server):
                     request_deserializer=proto_dot_reddit__pb2.MonitorUpdatesRequest.FromString,
                     response_serializer=proto_dot_reddit__pb2.ScoreUpdate.SerializeToString,
             ),
+            'BatchGetPosts': grpc.unary_unary_rpc_method_handler(
+                    servicer.BatchGetPosts,
+                    request_deserializer=proto_dot_reddit__pb2.BatchGetPostsRequest.FromString,
+                    response_serializer=proto_dot_reddit__pb2.BatchGetPostsResponse.SerializeToString,
+            ),
+            'BatchVote': grpc.unary_unary_rpc_method_handler(
+                    servicer.BatchVote,
+                    request_deserializer=proto_dot_reddit__pb2.BatchVoteRequest.FromString,
+                    response_serializer=proto_dot_reddit__pb2.BatchVoteResponse.SerializeToString,
+            ),
+            'BatchCreateComments': grpc.unary_unary_rpc_method_handler(
+                    servicer.BatchCreateComments,
+                    request_deserializer=proto_dot_reddit__pb2.BatchCreateCommentsRequest.FromString,
+                    response_serializer=proto_dot_reddit__pb2.BatchCreateCommentsResponse.SerializeToString,
+            ),
+            'IngestPosts': grpc.stream_unary_rpc_method_handler(
+                    servicer.IngestPosts,
+                    request_deserializer=proto_dot_reddit__pb2.Post.FromString,
+                    response_serializer=proto_dot_reddit__pb2.IngestSummary.SerializeToString,
+            ),
+            'IngestComments': grpc.stream_unary_rpc_method_handler(
+                    servicer.IngestComments,
+                    request_deserializer=proto_dot_reddit__pb2.Comment.FromString,
+                    response_serializer=proto_dot_reddit__pb2.IngestSummary.SerializeToString,
+            ),
+            'RetrieveCommentsPage': grpc.unary_unary_rpc_method_handler(
+                    servicer.RetrieveCommentsPage,
+                    request_deserializer=proto_dot_reddit__pb2.CommentsPageRequest.FromString,
+                    response_serializer=proto_dot_reddit__pb2.CommentsPageResponse.SerializeToString,
+            ),
+            'StreamComments': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamComments,
+                    request_deserializer=proto_dot_reddit__pb2.StreamCommentsRequest.FromString,
+                    response_serializer=proto_dot_reddit__pb2.CommentsPageResponse.SerializeToString,
+            ),
+            'ExpandCommentTree': grpc.unary_unary_rpc_method_handler(
+                    servicer.ExpandCommentTree,
+                    request_deserializer=proto_dot_reddit__pb2.ExpandCommentTreeRequest.FromString,
+                    response_serializer=proto_dot_reddit__pb2.ExpandCommentTreeResponse.SerializeToString,
+            ),
+            'GetPostPage': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetPostPage,
+                    request_deserializer=proto_dot_reddit__pb2.PostPageRequest.FromString,
+                    response_serializer=proto_dot_reddit__pb2.PostPageResponse.SerializeToString,
+            ),
+            'GetMetrics': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetMetrics,
+                    request_deserializer=proto_dot_reddit__pb2.MetricsRequest.FromString,
+                    response_serializer=proto_dot_reddit__pb2.MetricsResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'redditDataModel.RedditService', rpc_method_handlers)
@@ -299,3 +465,173 @@ class RedditService(object):
             proto_dot_reddit__pb2.ScoreUpdate.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def BatchGetPosts(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/redditDataModel.RedditService/BatchGetPosts',
+            proto_dot_reddit__pb2.BatchGetPostsRequest.SerializeToString,
+            proto_dot_reddit__pb2.BatchGetPostsResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def BatchVote(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/redditDataModel.RedditService/BatchVote',
+            proto_dot_reddit__pb2.BatchVoteRequest.SerializeToString,
+            proto_dot_reddit__pb2.BatchVoteResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def BatchCreateComments(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/redditDataModel.RedditService/BatchCreateComments',
+            proto_dot_reddit__pb2.BatchCreateCommentsRequest.SerializeToString,
+            proto_dot_reddit__pb2.BatchCreateCommentsResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def IngestPosts(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(request_iterator, target, '/redditDataModel.RedditService/IngestPosts',
+            proto_dot_reddit__pb2.Post.SerializeToString,
+            proto_dot_reddit__pb2.IngestSummary.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def IngestComments(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(request_iterator, target, '/redditDataModel.RedditService/IngestComments',
+            proto_dot_reddit__pb2.Comment.SerializeToString,
+            proto_dot_reddit__pb2.IngestSummary.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def RetrieveCommentsPage(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/redditDataModel.RedditService/RetrieveCommentsPage',
+            proto_dot_reddit__pb2.CommentsPageRequest.SerializeToString,
+            proto_dot_reddit__pb2.CommentsPageResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def StreamComments(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/redditDataModel.RedditService/StreamComments',
+            proto_dot_reddit__pb2.StreamCommentsRequest.SerializeToString,
+            proto_dot_reddit__pb2.CommentsPageResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def ExpandCommentTree(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/redditDataModel.RedditService/ExpandCommentTree',
+            proto_dot_reddit__pb2.ExpandCommentTreeRequest.SerializeToString,
+            proto_dot_reddit__pb2.ExpandCommentTreeResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def GetPostPage(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/redditDataModel.RedditService/GetPostPage',
+            proto_dot_reddit__pb2.PostPageRequest.SerializeToString,
+            proto_dot_reddit__pb2.PostPageResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def GetMetrics(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/redditDataModel.RedditService/GetMetrics',
+            proto_dot_reddit__pb2.MetricsRequest.SerializeToString,
+            proto_dot_reddit__pb2.MetricsResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
@@ -0,0 +1,37 @@
+# ID format shared by the server, which generates IDs, and the client, which
+# routes by them in a sharded cluster (see server/ids.py and client/sharding.py).
+
+# Snowflake layout, high to low bits: 41 bits of milliseconds since EPOCH_MS,
+# 10 bits of node ID and 12 bits of per-millisecond sequence. IDs fit in a
+# signed 64-bit integer, sort by creation time and are unique across nodes.
+EPOCH_MS = 1704067200000  # 2024-01-01 UTC, 41 bits last until 2093
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+MAX_NODE_ID = (1 << NODE_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+TIMESTAMP_SHIFT = NODE_BITS + SEQUENCE_BITS
+MAX_ID = (1 << 63) - 1
+
+
+def timestamp_ms(snowflake):
+    # Unix time in milliseconds the ID was generated at
+    return (snowflake >> TIMESTAMP_SHIFT) + EPOCH_MS
+
+
+def node_of(snowflake):
+    return (snowflake >> SEQUENCE_BITS) & MAX_NODE_ID
+
+
+def to_key(item_id):
+    # Wire ID -> internal key: the integer for decimal IDs, the string as it is
+    # for anything else (e.g. UUIDs of archived items). Only canonical decimals
+    # are converted, so to_wire(to_key(item_id)) == item_id always holds.
+    if item_id.isascii() and item_id.isdigit() and (item_id[0] != '0' or item_id == '0') and len(item_id) <= 19:
+        key = int(item_id)
+        if key <= MAX_ID:
+            return key
+    return item_id
+
+
+def to_wire(key):
+    return key if isinstance(key, str) else str(key)
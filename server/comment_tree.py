@@ -0,0 +1,50 @@
+from proto import reddit_pb2
+
+DEFAULT_TREE_DEPTH = 1
+DEFAULT_TREE_BREADTH = 10
+MAX_TREE_NODES = 10000  # Server side cap on the comments returned by one expansion
+
+
+def expand_tree(store, root_id, depth, breadth, max_nodes=0, max_bytes=0):
+    """Expand the comment tree under a post or comment, most upvoted replies first.
+
+    The tree is walked one level at a time, so when the node or byte budget
+    runs out the upper levels are complete and only the deepest ones are cut
+    short. Returns (node, truncated): node is a CommentNode without a comment
+    holding the replies of root_id, truncated tells whether the budget ran out.
+    """
+    depth = depth if depth > 0 else DEFAULT_TREE_DEPTH
+    breadth = breadth if breadth > 0 else DEFAULT_TREE_BREADTH
+    nodes_left = min(max_nodes, MAX_TREE_NODES) if max_nodes > 0 else MAX_TREE_NODES
+    bytes_left = max_bytes if max_bytes > 0 else None
+
+    top = reddit_pb2.CommentNode()
+    level = [(root_id, top)]
+    truncated = False
+    for _ in range(depth):
+        next_level = []
+        for parent_id, node in level:
+            if truncated:
+                # Out of budget, only tell the client whether there is more to fetch
+                node.has_more_replies = store.has_replies(parent_id)
+                continue
+            children = store.top_children(parent_id, breadth + 1)  # One extra tells whether more exist
+            node.has_more_replies = len(children) > breadth
+            for comment in children[:breadth]:
+                size = comment.ByteSize()
+                if nodes_left == 0 or (bytes_left is not None and size > bytes_left):
+                    truncated = True
+                    node.has_more_replies = True
+                    break
+                nodes_left -= 1
+                if bytes_left is not None:
+                    bytes_left -= size
+                next_level.append((comment.comment_id, node.replies.add(comment=comment)))
+        level = next_level
+        if not level:
+            break
+
+    # The deepest level wasn't expanded, flag the comments that have replies below it
+    for parent_id, node in level:
+        node.has_more_replies = store.has_replies(parent_id)
+    return top, truncated
@@ -1,16 +1,16 @@
-CREATE TABLE users (
+CREATE TABLE IF NOT EXISTS users (
     user_id TEXT PRIMARY KEY
 );
 
-CREATE TABLE subreddits (
+CREATE TABLE IF NOT EXISTS subreddits (
     subreddit_id INTEGER PRIMARY KEY AUTOINCREMENT,
     name TEXT NOT NULL,
     visibility INTEGER NOT NULL,
     tags TEXT  -- JSON array of tags or a comma-separated list
 );
 
-CREATE TABLE posts (
-    post_id INTEGER PRIMARY KEY AUTOINCREMENT,
+CREATE TABLE IF NOT EXISTS posts (
+    post_id TEXT PRIMARY KEY,  -- Same ID as on the wire
     title TEXT NOT NULL,
     text TEXT NOT NULL,
     video_url TEXT,
@@ -23,13 +23,19 @@ CREATE TABLE posts (
     FOREIGN KEY (subreddit_id) REFERENCES subreddits(subreddit_id)
 );
 
-CREATE TABLE comments (
-    comment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+CREATE TABLE IF NOT EXISTS comments (
+    comment_id TEXT PRIMARY KEY,  -- Same ID as on the wire
     author TEXT NOT NULL,
     score INTEGER NOT NULL,
     state INTEGER NOT NULL,
     publication_date INTEGER NOT NULL,
-    parent_id INTEGER,
-    post_id INTEGER,
+    parent_id TEXT NOT NULL,  -- Post ID or parent comment ID
+    post_id TEXT NOT NULL,  -- Post at the root of the comment tree
+    text TEXT NOT NULL,
     FOREIGN KEY (post_id) REFERENCES posts(post_id)
 );
+
+-- Top N children of a post or comment, ties in creation (rowid) order
+CREATE INDEX IF NOT EXISTS comments_parent_score ON comments (parent_id, score DESC);
+-- All comments of a post in score order
+CREATE INDEX IF NOT EXISTS comments_post_score ON comments (post_id, score DESC);
@@ -0,0 +1,297 @@
+import logging
+import os
+import re
+import struct
+import threading
+import time
+
+import numpy as np
+
+from mapped_snapshot import MappedSnapshot, is_mapped_snapshot, write_mapped_snapshot
+from metrics import Metrics
+from oplog import OperationLog, fsync_directory, read_records
+from proto import reddit_pb2
+from store import Store, group_by_parent
+
+# Log record payloads: one operation byte, then its arguments
+OP_ADD_POST = 1  # Serialized Post
+OP_ADD_COMMENT = 2  # Serialized Comment
+OP_VOTE_POST = 3  # VOTE delta, then the UTF-8 post ID
+OP_VOTE_COMMENT = 4  # VOTE delta, then the UTF-8 comment ID
+OP_RANDOM_WALK = 5  # SEED of the score simulator step
+VOTE = struct.Struct('<i')
+SEED = struct.Struct('<Q')
+
+FILE_NAME = re.compile(r'^(log|snapshot)-(\d+)$')
+
+
+def encode_add(item):
+    op = OP_ADD_POST if isinstance(item, reddit_pb2.Post) else OP_ADD_COMMENT
+    return bytes([op]) + item.SerializeToString()
+
+
+def encode_vote(op, item_id, delta):
+    return bytes([op]) + VOTE.pack(delta) + item_id.encode()
+
+
+class DurableStore:
+    """In-memory Store made durable with an operation log and snapshots.
+
+    Every write is applied to the Store and appended to an OperationLog in
+    the same step (under one lock, so the log has the same order the Store
+    saw), then waits for the log's group commit before returning: once a
+    call returns, its change survives a crash. Score simulator steps are
+    logged as the seed of their random numbers, replaying a step with the
+    same seed on the same state gives the same scores.
+
+    The log is split into segments, log-N files in the data directory. A
+    snapshot starts a new segment and writes the Store as of that point to
+    snapshot-N, after which the older segments and snapshots are deleted.
+    On startup the latest snapshot is loaded and only the segments from its
+    number on are replayed. Snapshots are taken every snapshot_interval
+    seconds when anything changed, and on close().
+
+    Snapshots are written in the read-optimized format of mapped_snapshot.py
+    and loading one only maps it under the Store (Store.attach), so startup
+    takes about as long for a million items as for ten; items are read from
+    the mapped pages when they are first asked for. Snapshots of the older
+    framed format (one logged add per item) are still loaded by replaying.
+
+    With snapshot_mode 'fork' (the default where os.fork exists) a snapshot
+    forks the process, in the style of Redis BGSAVE: the child writes the
+    copy-on-write image of the Store as of the fork and exits, while the
+    parent goes on serving without sharing the GIL with the serialization.
+    With 'thread' the scores are copied and the file is written by a thread
+    of the server process. Writes are paused in both modes only for the
+    segment switch and the fork or the score copy. Each snapshot observes
+    snapshot_pause_seconds and snapshot_duration_seconds in metrics.
+    """
+
+    blocking = True  # Writes wait for an fsync, the asyncio server runs them off the event loop
+
+    def __init__(self, directory, store=None, fsync_interval=0, snapshot_interval=60.0,
+                 snapshot_mode=None, metrics=None):
+        self.directory = directory
+        self.store = store if store is not None else Store()
+        self.snapshot_mode = snapshot_mode or ('fork' if hasattr(os, 'fork') else 'thread')
+        self.metrics = metrics if metrics is not None else Metrics()
+        os.makedirs(directory, exist_ok=True)
+        self._write_lock = threading.Lock()  # Orders Store writes and log appends, see snapshot()
+        self._snapshot_lock = threading.Lock()
+        self.ingest_lock = threading.Lock()  # Held by ingests while they check IDs and store a chunk
+        last_segment, replayed = self._recover()
+        self.segment = last_segment + 1  # Every run starts its own segment
+        self.log = OperationLog(self._path('log', self.segment), fsync_interval)
+        self._snapshot_ticket = 0 if not replayed else -1  # Last log ticket covered by a snapshot, -1 for none
+        self._closed = threading.Event()
+        self._thread = None
+        if snapshot_interval > 0:
+            self._thread = threading.Thread(target=self._run_snapshots, args=(snapshot_interval,), daemon=True)
+            self._thread.start()
+
+    def _path(self, kind, segment):
+        return os.path.join(self.directory, f"{kind}-{segment:010d}")
+
+    # Recovery
+    def _files(self, kind):
+        # Segment numbers of the log or snapshot files in the data directory, in order
+        segments = []
+        for name in os.listdir(self.directory):
+            match = FILE_NAME.match(name)
+            if match and match.group(1) == kind:
+                segments.append(int(match.group(2)))
+        return sorted(segments)
+
+    def _recover(self):
+        # Loads the latest snapshot and replays the log after it. Returns (last
+        # segment number, number of records replayed), which counts a framed
+        # snapshot's items so the next snapshot rewrites it in the mapped format.
+        for name in os.listdir(self.directory):
+            if name.endswith('.tmp'):
+                os.remove(os.path.join(self.directory, name))  # Snapshot that never got finished
+        snapshots = self._files('snapshot')
+        start = snapshots[-1] if snapshots else 0
+        replayed = 0
+        if snapshots:
+            began = time.perf_counter()
+            path = self._path('snapshot', start)
+            if is_mapped_snapshot(path):
+                snapshot = MappedSnapshot(path)
+                self.store.attach(snapshot)
+                count = len(snapshot.posts) + len(snapshot.comments)
+            else:
+                payloads, _ = read_records(path)
+                self._apply_all(payloads)
+                count = replayed = len(payloads)
+            self.metrics.observe('snapshot_load_seconds', time.perf_counter() - began)
+            logging.info(f"Loaded snapshot {start}: {count} items")
+        segments = [segment for segment in self._files('log') if segment >= start]
+        for segment in segments:
+            path = self._path('log', segment)
+            payloads, valid_length = read_records(path)
+            self._apply_all(payloads)
+            replayed += len(payloads)
+            if valid_length < os.path.getsize(path):
+                # The tail of a write that never completed, nobody was told it succeeded
+                logging.warning(f"Dropping torn record at the end of {path}")
+                os.truncate(path, valid_length)
+            logging.info(f"Replayed log segment {segment}: {len(payloads)} records")
+        return max([start, *segments]), replayed
+
+    def _apply_all(self, payloads):
+        for payload in payloads:
+            op, body = payload[0], payload[1:]
+            if op == OP_ADD_POST:
+                self.store.add_post(reddit_pb2.Post.FromString(body))
+            elif op == OP_ADD_COMMENT:
+                self.store.add_comment(reddit_pb2.Comment.FromString(body))
+            elif op == OP_VOTE_POST:
+                self.store.vote_post(body[VOTE.size:].decode(), VOTE.unpack_from(body)[0])
+            elif op == OP_VOTE_COMMENT:
+                self.store.vote_comment(body[VOTE.size:].decode(), VOTE.unpack_from(body)[0])
+            elif op == OP_RANDOM_WALK:
+                self.store.random_walk(np.random.default_rng(SEED.unpack(body)[0]))
+            else:
+                raise ValueError(f"Unknown operation {op} in the operation log")
+
+    # Snapshots
+    def snapshot(self):
+        with self._snapshot_lock:
+            start = time.perf_counter()
+            with self._write_lock:
+                # Writes are paused only while the segment is switched and the image is taken
+                segment = self.segment + 1
+                self.log.rotate(self._path('log', segment))
+                self.segment = segment
+                ticket = self.log.last_ticket
+                path = self._path('snapshot', segment)
+                if self.snapshot_mode == 'fork':
+                    pid = os.fork()
+                    if pid == 0:
+                        self._snapshot_child(path + '.tmp')
+                else:
+                    items = self.store.snapshot()
+                pause = time.perf_counter() - start
+            if self.snapshot_mode == 'fork':
+                _, status = os.waitpid(pid, 0)
+                if status != 0:
+                    raise IOError(f"Snapshot process failed with status {status}")
+            else:
+                write_mapped_snapshot(path + '.tmp', items)
+            os.replace(path + '.tmp', path)
+            fsync_directory(self.directory)
+            # Everything before this segment is in the snapshot now
+            for kind in ('log', 'snapshot'):
+                for old in self._files(kind):
+                    if old < segment:
+                        os.remove(self._path(kind, old))
+            self._snapshot_ticket = ticket
+            duration = time.perf_counter() - start
+            self.metrics.observe('snapshot_pause_seconds', pause)
+            self.metrics.observe('snapshot_duration_seconds', duration)
+            logging.info(f"Wrote snapshot {segment} in {duration:.3f}s, writes paused for {pause * 1000:.1f}ms")
+
+    def _snapshot_child(self, path):
+        # Runs in the forked child: only the forking thread exists here and
+        # locks other threads held at the fork stay held, so nothing in here
+        # may take a lock (not even logging). Never returns.
+        status = 1
+        try:
+            write_mapped_snapshot(path, self.store.snapshot(copy=False))
+            status = 0
+        finally:
+            os._exit(status)
+
+    def _run_snapshots(self, interval):
+        while not self._closed.wait(interval):
+            if self.log.last_ticket == self._snapshot_ticket:
+                continue  # Nothing changed since the last one
+            try:
+                self.snapshot()
+            except Exception as e:
+                logging.error(f"Failed to write snapshot: {e}")
+
+    def close(self):
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.log.last_ticket != self._snapshot_ticket:
+            self.snapshot()  # Next startup won't have to replay anything
+        self.log.close()
+
+    # Writes
+    def _commit(self, ticket):
+        if ticket is not None:
+            self.log.wait(ticket)
+
+    def add_post(self, post):
+        with self._write_lock:
+            self.store.add_post(post)
+            ticket = self.log.append([encode_add(post)])
+        self._commit(ticket)
+
+    def add_posts(self, posts):
+        posts = list(posts)
+        with self._write_lock:
+            self.store.add_posts(posts)
+            ticket = self.log.append([encode_add(post) for post in posts])
+        self._commit(ticket)
+
+    def vote_post(self, post_id, delta):
+        with self._write_lock:
+            post = self.store.vote_post(post_id, delta)
+            ticket = None if post is None else self.log.append([encode_vote(OP_VOTE_POST, post_id, delta)])
+        self._commit(ticket)
+        return post
+
+    def add_comment(self, comment):
+        with self._write_lock:
+            self.store.add_comment(comment)
+            ticket = self.log.append([encode_add(comment)])
+        self._commit(ticket)
+
+    def add_comments(self, comments):
+        # Logged in the order the Store gives them slots, so that replaying one add at a time
+        # rebuilds the same slots and replayed random walks move the same comments
+        comments = [comment for siblings in group_by_parent(comments).values() for comment in siblings]
+        with self._write_lock:
+            self.store.add_comments(comments)
+            ticket = self.log.append([encode_add(comment) for comment in comments])
+        self._commit(ticket)
+
+    def vote_comment(self, comment_id, delta):
+        with self._write_lock:
+            comment = self.store.vote_comment(comment_id, delta)
+            ticket = None if comment is None else self.log.append([encode_vote(OP_VOTE_COMMENT, comment_id, delta)])
+        self._commit(ticket)
+        return comment
+
+    def random_walk(self, rng, item_ids=()):
+        # Not waited for, the simulator has nobody to acknowledge to
+        seed = int(rng.integers(1 << 63))
+        with self._write_lock:
+            changed = self.store.random_walk(np.random.default_rng(seed), item_ids)
+            self.log.append([bytes([OP_RANDOM_WALK]) + SEED.pack(seed)])
+        return changed
+
+    # Reads go straight to the Store
+    def get_post(self, post_id):
+        return self.store.get_post(post_id)
+
+    def post_ids(self):
+        return self.store.post_ids()
+
+    def get_comment(self, comment_id):
+        return self.store.get_comment(comment_id)
+
+    def top_children(self, parent_id, n):
+        return self.store.top_children(parent_id, n)
+
+    def children_page(self, parent_id, after, limit):
+        return self.store.children_page(parent_id, after, limit)
+
+    def has_replies(self, comment_id):
+        return self.store.has_replies(comment_id)
+
+    def comment_ids(self):
+        return self.store.comment_ids()
@@ -0,0 +1,38 @@
+import threading
+import time
+
+# The ID format is shared with the client, server modules import it from here
+from proto.snowflake import (EPOCH_MS, MAX_NODE_ID, MAX_SEQUENCE, SEQUENCE_BITS, TIMESTAMP_SHIFT, node_of,
+                             timestamp_ms, to_key, to_wire)
+
+
+class SnowflakeGenerator:
+    """Time-ordered 64-bit IDs, see the layout in proto/snowflake.py. Thread-safe.
+
+    IDs never go backwards: if the clock does, or more than 4096 IDs are
+    asked for in one millisecond, the generator keeps counting from its last
+    timestamp instead of waiting, running slightly ahead of the clock.
+    """
+
+    def __init__(self, node_id=0, clock=time.time):
+        if not 0 <= node_id <= MAX_NODE_ID:
+            raise ValueError(f"node_id must be between 0 and {MAX_NODE_ID}")
+        self.node_id = node_id
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._sequence = 0
+
+    def next_id(self):
+        with self._lock:
+            now_ms = int(self.clock() * 1000) - EPOCH_MS
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._sequence = 0
+            elif self._sequence < MAX_SEQUENCE:
+                self._sequence += 1
+            else:
+                self._last_ms += 1
+                self._sequence = 0
+            return (self._last_ms << TIMESTAMP_SHIFT) | (self.node_id << SEQUENCE_BITS) | self._sequence
+
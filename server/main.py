@@ -1,18 +1,12 @@
 import argparse
-import grpc
-from reddit_service import RedditService
+import logging
 
-def serve(host, port):
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    redditDataModel.add_RedditServiceServicer_to_server(RedditService(), server)
-    server.add_insecure_port(f'{host}:{port}')
-    server.start()
-    server.wait_for_termination()
+from reddit_service import add_server_arguments, run
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Reddit Clone gRPC Server')
-    parser.add_argument('--host', default='localhost', help='Host to serve on')
-    parser.add_argument('--port', type=int, default=50051, help='Port to serve on')
+    add_server_arguments(parser)
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-    serve(args.host, args.port)
+    run(args)
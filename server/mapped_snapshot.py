@@ -0,0 +1,279 @@
+import hashlib
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from ids import to_key, to_wire
+from proto import reddit_pb2
+
+# File layout, little endian: a header of MAGIC and the (offset, length) in
+# bytes of every section below, in SECTIONS order, each section starting on
+# an 8 byte boundary. Every section is a flat array that is used straight
+# from the mapped pages, nothing is parsed at startup.
+#
+#   strings         UTF-8 bytes of every distinct string, back to back
+#   string_offsets  uint64 start of string i, plus the end of the last one
+#   posts           POST_DTYPE records, by slot
+#   comments        COMMENT_DTYPE records, by slot; parents come before replies
+#   *_index_keys    key64 of every item, sorted
+#   *_index_slots   slot of the item with that key
+#   parent_keys     key64 of every parent that has comments, sorted
+#   parent_starts   start of its children in child_slots, plus the total
+#   child_slots     comment slots grouped by parent, in creation order
+#
+# key64 is the integer ID for decimal IDs and a 64-bit hash for other
+# strings. Lookups by key64 compare the actual ID, so collisions are
+# harmless: colliding items are next to each other in the index, and
+# children are grouped by the actual parent ID, so parents whose key64
+# collide have a group (and a parent_keys entry) each.
+MAGIC = b'RDSNAP01'
+SECTIONS = ['strings', 'string_offsets', 'posts', 'comments', 'post_index_keys', 'post_index_slots',
+            'comment_index_keys', 'comment_index_slots', 'parent_keys', 'parent_starts', 'child_slots']
+HEADER = struct.Struct('<8s' + 'QQ' * len(SECTIONS))
+NO_STRING = -1  # String reference of an ID that is an integer, or of a post without media
+
+POST_DTYPE = np.dtype([('id', '<i8'), ('id_str', '<i4'), ('title', '<i4'), ('text', '<i4'), ('video_url', '<i4'),
+                       ('image_url', '<i4'), ('author', '<i4'), ('state', 'u1'), ('subreddit_id', '<i4'),
+                       ('publication_date', '<i8'), ('score', '<i8')])
+COMMENT_DTYPE = np.dtype([('id', '<i8'), ('id_str', '<i4'), ('parent', '<i8'), ('parent_str', '<i4'), ('author', '<i4'),
+                          ('text', '<i4'), ('state', 'u1'), ('publication_date', '<i8'), ('score', '<i8')])
+SECTION_DTYPES = {'strings': np.uint8, 'string_offsets': '<u8', 'posts': POST_DTYPE, 'comments': COMMENT_DTYPE}
+
+
+def is_mapped_snapshot(path):
+    with open(path, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def key64(key):
+    if isinstance(key, int):
+        return key
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little', signed=True)
+
+
+class _StringTable:
+    # Collects distinct strings while writing, each is stored once
+    def __init__(self):
+        self.index = {}
+        self.encoded = []
+
+    def ref(self, text):
+        ref = self.index.get(text)
+        if ref is None:
+            ref = self.index[text] = len(self.encoded)
+            self.encoded.append(text.encode())
+        return ref
+
+    def id_fields(self, item_id):
+        # (id, id_str) fields of an item ID
+        key = to_key(item_id)
+        return (key, NO_STRING) if isinstance(key, int) else (key64(key), self.ref(key))
+
+
+class _Rows:
+    # Rows of a structured array appended one at a time, packed every CHUNK
+    # rows so a big snapshot never holds all of them as Python tuples
+    CHUNK = 65536
+
+    def __init__(self, dtype):
+        self.dtype = dtype
+        self.chunks = []
+        self.pending = []
+
+    def append(self, row):
+        self.pending.append(row)
+        if len(self.pending) == self.CHUNK:
+            self.chunks.append(np.array(self.pending, dtype=self.dtype))
+            self.pending = []
+
+    def array(self):
+        return np.concatenate(self.chunks + [np.array(self.pending, dtype=self.dtype)])
+
+
+def _sorted_index(keys):
+    slots = np.argsort(keys, kind='stable')
+    return keys[slots], slots.astype('<i8')
+
+
+def write_mapped_snapshot(path, items):
+    """Writes the messages of Store.snapshot() (posts, then comments) to path."""
+    strings = _StringTable()
+    posts, comments = _Rows(POST_DTYPE), _Rows(COMMENT_DTYPE)
+    for item in items:
+        if isinstance(item, reddit_pb2.Post):
+            media = item.WhichOneof('media')
+            posts.append((*strings.id_fields(item.id), strings.ref(item.title), strings.ref(item.text),
+                          strings.ref(item.video_url) if media == 'video_url' else NO_STRING,
+                          strings.ref(item.image_url) if media == 'image_url' else NO_STRING,
+                          strings.ref(item.author), item.state, item.subreddit_id, item.publication_date, item.score))
+        else:
+            comments.append((*strings.id_fields(item.comment_id), *strings.id_fields(item.parent_id),
+                             strings.ref(item.author), strings.ref(item.text), item.state, item.publication_date, item.score))
+    posts, comments = posts.array(), comments.array()
+
+    # Children grouped by parent, by key64 and then by the parent's string so colliding parents
+    # stay apart (a decimal parent has no string); the stable sort keeps each group in slot order
+    child_slots = np.lexsort((comments['parent_str'], comments['parent'])).astype('<i8')
+    keys, refs = comments['parent'][child_slots], comments['parent_str'][child_slots]
+    starts_group = np.ones(len(child_slots), dtype=bool)
+    starts_group[1:] = (keys[1:] != keys[:-1]) | (refs[1:] != refs[:-1])
+    parent_starts = np.flatnonzero(starts_group)
+    parent_keys = keys[parent_starts]
+    parent_starts = np.append(parent_starts, len(comments)).astype('<i8')
+
+    lengths = np.array([len(encoded) for encoded in strings.encoded], dtype='<u8')
+    sections = {
+        'strings': b''.join(strings.encoded),
+        'string_offsets': np.concatenate([[0], np.cumsum(lengths)]).astype('<u8'),
+        'posts': posts,
+        'comments': comments,
+    }
+    sections['post_index_keys'], sections['post_index_slots'] = _sorted_index(posts['id'])
+    sections['comment_index_keys'], sections['comment_index_slots'] = _sorted_index(comments['id'])
+    sections['parent_keys'] = parent_keys.astype('<i8')
+    sections['parent_starts'] = parent_starts
+    sections['child_slots'] = child_slots
+
+    with open(path, 'wb') as file:
+        file.write(b'\0' * HEADER.size)
+        layout = []
+        for name in SECTIONS:
+            data = sections[name]
+            data = data if isinstance(data, bytes) else np.ascontiguousarray(data).tobytes()
+            file.write(b'\0' * (-file.tell() % 8))
+            layout += [file.tell(), len(data)]
+            file.write(data)
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, *layout))
+        file.flush()
+        os.fsync(file.fileno())
+
+
+class MappedSnapshot:
+    """A snapshot file mapped read-only, entities are read from it on demand.
+
+    Opening it only maps the file and wraps the sections in NumPy arrays, so
+    it takes the same time at any size; pages are read in by the OS as they
+    are touched. posts and comments are MappedTables the Store's ScoreTables
+    read their first slots from.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, *layout = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a mapped snapshot")
+        arrays = {}
+        for i, name in enumerate(SECTIONS):
+            offset, length = layout[2 * i], layout[2 * i + 1]
+            dtype = np.dtype(SECTION_DTYPES.get(name, '<i8'))
+            arrays[name] = np.frombuffer(self._mmap, dtype=dtype, count=length // dtype.itemsize, offset=offset)
+        self._strings = arrays['strings']
+        self._string_offsets = arrays['string_offsets']
+        self.posts = MappedTable(self, arrays['posts'], arrays['post_index_keys'], arrays['post_index_slots'], MappedPost)
+        self.comments = MappedTable(self, arrays['comments'], arrays['comment_index_keys'], arrays['comment_index_slots'],
+                                    MappedComment)
+        self._parent_keys = arrays['parent_keys']
+        self._parent_starts = arrays['parent_starts']
+        self._child_slots = arrays['child_slots']
+
+    def string(self, ref):
+        start, end = self._string_offsets[ref], self._string_offsets[ref + 1]
+        return self._strings[start:end].tobytes().decode()
+
+    def key(self, key_value, ref):
+        # Internal key (see ids.to_key) of an (id, id_str) field pair
+        return int(key_value) if ref == NO_STRING else self.string(ref)
+
+    def children(self, parent_key):
+        # Slots of the comments under a parent in creation order, or None if it has none
+        value = key64(parent_key)
+        i = int(np.searchsorted(self._parent_keys, value))
+        while i < len(self._parent_keys) and self._parent_keys[i] == value:
+            slots = self._child_slots[self._parent_starts[i]:self._parent_starts[i + 1]]
+            if self.comments.record(int(slots[0])).parent_key == parent_key:
+                return slots
+            i += 1  # Hash collision with another parent
+        return None
+
+
+class MappedTable:
+    """Posts or comments of a MappedSnapshot, by slot."""
+
+    def __init__(self, snapshot, rows, index_keys, index_slots, record_class):
+        self.snapshot = snapshot
+        self.rows = rows
+        self.scores = rows['score']
+        self._index_keys = index_keys
+        self._index_slots = index_slots
+        self._record_class = record_class
+
+    def __len__(self):
+        return len(self.rows)
+
+    def item_key(self, slot):
+        row = self.rows[slot]
+        return self.snapshot.key(row['id'], row['id_str'])
+
+    def keys(self):
+        # Every item's key in slot order
+        ids, refs = self.rows['id'].tolist(), self.rows['id_str'].tolist()
+        return [key if ref == NO_STRING else self.snapshot.string(ref) for key, ref in zip(ids, refs)]
+
+    def record(self, slot):
+        return self._record_class(self.snapshot, self.rows[slot])
+
+    def find(self, key):
+        # Slot of the item with this key, or None; a binary search of the index
+        value = key64(key)
+        i = int(np.searchsorted(self._index_keys, value))
+        while i < len(self._index_keys) and self._index_keys[i] == value:
+            slot = int(self._index_slots[i])
+            if self.item_key(slot) == key:
+                return slot
+            i += 1
+        return None
+
+
+class MappedPost:
+    """Post record read from the mapped file, same interface as records.PostRecord."""
+
+    __slots__ = ('snapshot', 'row')
+
+    def __init__(self, snapshot, row):
+        self.snapshot = snapshot
+        self.row = row
+
+    def to_message(self, post_id, score):
+        row, string = self.row, self.snapshot.string
+        post = reddit_pb2.Post(id=post_id, title=string(row['title']), text=string(row['text']),
+                               author=string(row['author']), score=score, state=int(row['state']),
+                               publication_date=int(row['publication_date']), subreddit_id=int(row['subreddit_id']))
+        if row['video_url'] != NO_STRING:
+            post.video_url = string(row['video_url'])
+        elif row['image_url'] != NO_STRING:
+            post.image_url = string(row['image_url'])
+        return post
+
+
+class MappedComment:
+    """Comment record read from the mapped file, same interface as records.CommentRecord."""
+
+    __slots__ = ('snapshot', 'row')
+
+    def __init__(self, snapshot, row):
+        self.snapshot = snapshot
+        self.row = row
+
+    @property
+    def parent_key(self):
+        return self.snapshot.key(self.row['parent'], self.row['parent_str'])
+
+    def to_message(self, comment_id, score):
+        row, string = self.row, self.snapshot.string
+        return reddit_pb2.Comment(comment_id=comment_id, author=string(row['author']), score=score,
+                                  state=int(row['state']), publication_date=int(row['publication_date']),
+                                  parent_id=to_wire(self.parent_key), text=string(row['text']))
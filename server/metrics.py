@@ -0,0 +1,48 @@
+import threading
+
+
+class Metrics:
+    """Named counters and value summaries of the server, read by the GetMetrics RPC.
+
+    Counters only go up. Summaries keep the count, sum, max and last value
+    observed (e.g. the duration of each snapshot), which is enough for a
+    scraper to derive rates and averages without the server keeping samples.
+    Ratios are one counter divided by another, worked out when read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}  # name -> value
+        self._summaries = {}  # name -> [count, sum, max, last]
+        self._ratios = {}  # name -> (numerator counter, denominator counter)
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, name, value):
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                self._summaries[name] = [1, value, value, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+                summary[2] = max(summary[2], value)
+                summary[3] = value
+
+    def ratio(self, name, numerator, denominator):
+        # Reports numerator / denominator as name once the denominator counter is above 0
+        with self._lock:
+            self._ratios[name] = (numerator, denominator)
+
+    def values(self):
+        # Flat name -> value dict, summaries are split into name_count, name_sum, name_max and name_last
+        with self._lock:
+            values = dict(self._counters)
+            for name, (count, total, maximum, last) in self._summaries.items():
+                values.update({f"{name}_count": count, f"{name}_sum": total, f"{name}_max": maximum, f"{name}_last": last})
+            for name, (numerator, denominator) in self._ratios.items():
+                if self._counters.get(denominator):
+                    values[name] = self._counters.get(numerator, 0) / self._counters[denominator]
+            return values
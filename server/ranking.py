@@ -0,0 +1,129 @@
+from bisect import bisect_left, bisect_right, insort
+
+import numpy as np
+
+
+def encode_cursor(score, position):
+    # Page cursors are the (score, tie-break position) of the last comment handed out
+    return f"{score}:{position}"
+
+
+def decode_cursor(cursor):
+    # Returns (score, position), or None for an empty cursor; raises ValueError if malformed
+    if not cursor:
+        return None
+    score, position = cursor.split(":")
+    return int(score), int(position)
+
+
+def rank(scores, n):
+    """Positions of the n highest of an array of scores, in descending score order.
+
+    Ties keep their position order, the same order a stable sort would give,
+    so comments with equal scores stay in the order they were created in.
+    Only the candidates for the top n are sorted: the n-th highest score is
+    found with a partial selection and everything below it is dropped first.
+    """
+    size = len(scores)
+    if n <= 0 or size == 0:
+        return np.empty(0, dtype=np.intp)
+    if n < size:
+        threshold = np.partition(scores, size - n)[size - n]
+        candidates = np.flatnonzero(scores >= threshold)  # Ties at the threshold all stay, in order
+    else:
+        candidates = np.arange(size)
+    order = np.argsort(-scores[candidates], kind='stable')
+    return candidates[order[:n]]
+
+
+def rank_after(scores, after, n):
+    # Like rank, but only over the entries ranked after the (score, position)
+    # cursor `after`, from the start if it is None. Keyset based, so an entry
+    # keeps its place between pages unless its own score changes.
+    if after is None:
+        return rank(scores, n)
+    score, position = after
+    positions = np.arange(len(scores))
+    candidates = np.flatnonzero((scores < score) | ((scores == score) & (positions > position)))
+    return candidates[rank(scores[candidates], n)]
+
+
+class RankedChildren:
+    """Slots of one parent's comments, kept in descending score order.
+
+    The slots are held in a NumPy array in creation order (a child's index
+    in it is its position, the tie-break of cursors), grown with spare room
+    so adds don't copy it. The order is a sorted list of (-score, position)
+    keys, so ties keep their creation order like rank() does, with the
+    score each key was sorted by. Scores live in the ScoreTable: a vote
+    repositions its own entry with update(), and a score simulator step,
+    which moves every score at once and bumps the table's epoch, is caught
+    up by re-sorting on the next ensure_order(). Top N and pages are then a
+    slice of the list instead of a selection over every child.
+
+    Not thread safe, the Store calls it under the parent's index lock.
+    """
+
+    def __init__(self, slots):
+        self._slots = np.array(slots, dtype=np.int64)
+        self._size = len(self._slots)
+        self._keys = None  # Sorted (-score, position) of every child, None until the first ordered read
+        self._scores = None  # position -> score its key was sorted by
+        self._positions = None  # slot -> position
+        self.epoch = None  # Epoch of the ScoreTable the keys were sorted at
+
+    def __len__(self):
+        return self._size
+
+    def view(self):
+        # Slots in creation order, not copied
+        return self._slots[:self._size]
+
+    def add(self, slot, score):
+        if self._size == len(self._slots):
+            slots = np.empty(max(16, 2 * self._size), dtype=np.int64)
+            slots[:self._size] = self._slots[:self._size]
+            self._slots = slots
+        position = self._size
+        self._slots[position] = slot
+        self._size += 1
+        if self._keys is not None:
+            self._scores.append(score)
+            self._positions[slot] = position
+            insort(self._keys, (-score, position))
+
+    def update(self, slot, score):
+        # Reposition a child after its score changed
+        if self._keys is None:
+            return
+        position = self._positions[slot]
+        old = self._scores[position]
+        if old == score:
+            return
+        del self._keys[bisect_left(self._keys, (-old, position))]
+        self._scores[position] = score
+        insort(self._keys, (-score, position))
+
+    def ensure_order(self, table):
+        # Sort the children by their scores in table unless nothing but update() changed them since
+        epoch = table.epoch  # Read before the scores: a step running meanwhile leaves the old epoch behind
+        if self._keys is not None and self.epoch == epoch:
+            return
+        slots = self.view()
+        scores = table.take(slots)
+        order = np.argsort(-scores, kind='stable')
+        self._keys = list(zip((-scores[order]).tolist(), order.tolist()))
+        self._scores = scores.tolist()
+        self._positions = dict(zip(slots.tolist(), range(self._size)))
+        self.epoch = epoch
+
+    def top(self, n):
+        # (slot, score) of the n highest, after ensure_order()
+        return [(int(self._slots[position]), -score) for score, position in self._keys[:max(n, 0)]]
+
+    def page(self, after, limit):
+        # Up to limit (slot, score, position) ranked after the (score, position) cursor
+        # `after`, from the start if it is None; like rank_after(), after ensure_order()
+        start = 0 if after is None else bisect_right(self._keys, (-after[0], after[1]))
+        return [(int(self._slots[position]), -score, position)
+                for score, position in self._keys[start:start + max(limit, 0)]]
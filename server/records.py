@@ -0,0 +1,57 @@
+import sys
+
+from ids import to_wire
+from proto import reddit_pb2
+
+
+class PostRecord:
+    """Compact in-memory post, turned into a reddit_pb2.Post only when it's returned.
+
+    Holds neither the ID nor the score: the ID is the key the record is
+    stored under and the score lives in the Store's ScoreTable.
+    """
+
+    __slots__ = ('title', 'text', 'video_url', 'image_url', 'author', 'state', 'publication_date', 'subreddit_id')
+
+    def __init__(self, post):
+        self.title = post.title
+        self.text = post.text
+        media = post.WhichOneof('media')
+        self.video_url = post.video_url if media == 'video_url' else None
+        self.image_url = post.image_url if media == 'image_url' else None
+        self.author = sys.intern(post.author)  # A handful of authors write most posts
+        self.state = post.state
+        self.publication_date = post.publication_date
+        self.subreddit_id = post.subreddit_id
+
+    def to_message(self, post_id, score):
+        post = reddit_pb2.Post(id=post_id, title=self.title, text=self.text, author=self.author, score=score,
+                               state=self.state, publication_date=self.publication_date,
+                               subreddit_id=self.subreddit_id)
+        if self.video_url is not None:
+            post.video_url = self.video_url
+        elif self.image_url is not None:
+            post.image_url = self.image_url
+        return post
+
+
+class CommentRecord:
+    """Compact in-memory comment, see PostRecord.
+
+    parent_key is the parent's internal key (see ids.to_key), passed in by
+    the Store, which hands every sibling the object the parent itself is
+    stored under instead of a copy.
+    """
+
+    __slots__ = ('author', 'state', 'publication_date', 'parent_key', 'text')
+
+    def __init__(self, comment, parent_key):
+        self.author = sys.intern(comment.author)
+        self.state = comment.state
+        self.publication_date = comment.publication_date
+        self.parent_key = parent_key
+        self.text = comment.text
+
+    def to_message(self, comment_id, score):
+        return reddit_pb2.Comment(comment_id=comment_id, author=self.author, score=score, state=self.state,
+                                  publication_date=self.publication_date, parent_id=to_wire(self.parent_key), text=self.text)
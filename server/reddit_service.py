@@ -1,23 +1,34 @@
 import argparse
+import asyncio
 
 from concurrent import futures
 import datetime
 import os
-import random
+import signal
 import sys
-# from storage import Database
-import uuid
 import time
 import threading
 import logging
+import multiprocessing
 import grpc
+import numpy as np
+from comment_tree import expand_tree
+from durable_store import DurableStore
+from ids import MAX_NODE_ID, SnowflakeGenerator
+from metrics import Metrics
+from ranking import decode_cursor
+from response_cache import ResponseCache, add_cached_handlers
+from score_bus import AsyncSubscription, ScoreBus
+from shared_store import SharedState, SharedStore
+from single_flight import SingleFlight
+from storage import Database
+from store import Store
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'proto'))
 from proto import reddit_pb2
 from proto import reddit_pb2_grpc
 
-posts = {}  # Dictionary for posts
-comments = {}  # Dictionary for comments
+store = Store()  # Default in-memory backend: posts, comments and the parent -> children index
 users = {
     "user1": reddit_pb2.User(user_id="user1"),
     "user2": reddit_pb2.User(user_id="user2"),
@@ -25,6 +36,13 @@ users = {
     "user4": reddit_pb2.User(user_id="user4"),
     "user5": reddit_pb2.User(user_id="user5"),
     } # Sample Dictionary for users
+score_bus = ScoreBus()  # Score changes published to MonitorUpdates streams
+metrics = Metrics()  # Served by GetMetrics
+id_generator = SnowflakeGenerator()  # Time-ordered post and comment IDs, node ID set by --node-id
+SHARED_POLL_SECONDS = 0.1  # How often a worker of --workers looks for other workers' votes on watched items
+INGEST_CHUNK_SIZE = 1000  # Streamed items are stored this many at a time
+DEFAULT_PAGE_SIZE = 50  # Comments per page / streamed chunk when the request doesn't say
+MAX_PAGE_SIZE = 1000
 #logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # next_post_id = 1
@@ -32,17 +50,177 @@ users = {
 
 
 # For Monitorring Updates
-def update_scores():
+def update_scores(store, responses=None):
+    rng = np.random.default_rng()
     while True:
-        for post in posts.values():
-            post.score += random.randint(-1, 1)  # Randomly increment or decrement score
-        for comment in comments.values():
-            comment.score += random.randint(-1, 1)
+        # Every score takes a random step at once, only the watched ones are published
+        for item_id, score in store.random_walk(rng, score_bus.watched()):
+            score_bus.publish(item_id, score)
+        if responses is not None:
+            responses.expire_all()
         time.sleep(5)  # Update scores every 5 seconds
 
 
+def publish_shared_changes(store, interval=SHARED_POLL_SECONDS):
+    # A worker of a multi-process server only hears of its own votes: publish those other workers
+    # took on the items its MonitorUpdates streams watch, read from the shared scores
+    while True:
+        for item_id, score in store.changed_scores(score_bus.watched()):
+            score_bus.publish(item_id, score)
+        time.sleep(interval)
+
+
+def monitored_ids(request):
+    # Every item a MonitorUpdates request watches
+    post_ids = [request.post_id] if request.post_id else []
+    return [*post_ids, *request.post_ids, *request.comment_ids]
+
+
+def current_scores(store, request):
+    # Current scores of the posts and comments watched by a MonitorUpdates request
+    updates = []
+    for post_id in [request.post_id, *request.post_ids]:
+        post = store.get_post(post_id)
+        if post is not None:
+            updates.append(reddit_pb2.ScoreUpdate(item_id=post.id, new_score=post.score))
+    for comment_id in request.comment_ids:
+        comment = store.get_comment(comment_id)
+        if comment is not None:
+            updates.append(reddit_pb2.ScoreUpdate(item_id=comment.comment_id, new_score=comment.score))
+    return updates
+
+
+def new_id():
+    # IDs are 64-bit integers, sent as their decimal string
+    return str(id_generator.next_id())
+
+
+def build_comment(request):
+    # New comment with a generated ID from a CreateComment style request
+    return reddit_pb2.Comment(
+        comment_id=new_id(),
+        author=request.author,
+        score=0,
+        state=reddit_pb2.COMMENT_NORMAL,
+        publication_date=int(datetime.datetime.now().timestamp()),
+        parent_id=request.parent_id,
+        text=request.text
+    )
+
+
+def ingested_post(request):
+    # Archived posts keep their ID, score, state and date when they have them
+    post = reddit_pb2.Post()
+    post.CopyFrom(request)
+    if not post.id:
+        post.id = new_id()
+    if not post.publication_date:
+        post.publication_date = int(datetime.datetime.now().timestamp())
+    return post
+
+
+def ingested_comment(request):
+    # Archived comments keep their ID, score, state and date when they have them
+    comment = reddit_pb2.Comment()
+    comment.CopyFrom(request)
+    if not comment.comment_id:
+        comment.comment_id = new_id()
+    if not comment.publication_date:
+        comment.publication_date = int(datetime.datetime.now().timestamp())
+    return comment
+
+
+def chunked(items, size=INGEST_CHUNK_SIZE):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def ingest_summary(kind, ids, rejected):
+    logging.info(f"Ingested {len(ids)} {kind}, rejected {len(rejected)}")
+    return reddit_pb2.IngestSummary(count=len(ids), ids=ids, rejected=rejected)
+
+
+def clamp_page_size(page_size):
+    return min(page_size, MAX_PAGE_SIZE) if page_size > 0 else DEFAULT_PAGE_SIZE
+
+
+def next_chunk_size(chunk_size, remaining):
+    # Size of the next streamed chunk, remaining is None when streaming everything
+    return chunk_size if remaining is None else min(chunk_size, remaining)
+
+
+def build_comments_page(store, comments, next_cursor):
+    has_replies = [store.has_replies(comment.comment_id) for comment in comments]
+    return reddit_pb2.CommentsPageResponse(comments=comments, has_replies=has_replies, next_cursor=next_cursor)
+
+
 class RedditService(reddit_pb2_grpc.RedditServiceServicer):
-    
+
+    def __init__(self, store=store, responses=None):
+        self.store = store  # In-memory Store or SQLite Database, both have the same interface
+        self.responses = responses  # ResponseCache of serialized hot reads, or None
+        self.top_comments_flights = SingleFlight('top_comments', metrics)  # Identical concurrent reads run once
+
+    # Response cache: reads that can be served from it return serialized bytes (the handlers from
+    # add_cached_handlers() send them as they are), writes bump the versions of what they changed:
+    # ('post', post_id) for a post, ('children', parent_id) for the comments under a parent.
+    def cached(self, key, depends_on, build):
+        if self.responses is None:
+            return build()
+        return self.responses.get(key, depends_on, build)
+
+    def changed(self, *names):
+        if self.responses is not None:
+            self.responses.bump(*names)
+
+    def comment_created(self, comment):
+        # A new comment changes its parent's children, and the parent's has_replies in the grandparent's list
+        if self.responses is None:
+            return
+        parent = self.store.get_comment(comment.parent_id)
+        self.changed(('children', comment.parent_id), *([('children', parent.parent_id)] if parent is not None else []))
+
+    # Ingest: streams are stored a chunk at a time, start is the stream position of the chunk's first item.
+    # Items whose ID the store already has (as a post or a comment) or that repeat one earlier in the
+    # stream are rejected as ITEM_DUPLICATE before anything is written; the check and the write hold
+    # the store's ingest lock, so concurrent ingests can't both take an ID. The rest of the chunk is
+    # stored in one call, all or nothing on SQLite (one transaction): if it fails every item of it is
+    # rejected as ITEM_FAILED and the stream goes on with the next chunk. Returns (stored IDs, rejections).
+    def store_ingested_posts(self, posts, start=0):
+        return self.store_ingested(posts, start, lambda post: post.id, self.store.add_posts)
+
+    def store_ingested_comments(self, comments, start=0):
+        return self.store_ingested(comments, start, lambda comment: comment.comment_id, self.store.add_comments)
+
+    def store_ingested(self, items, start, item_id, add):
+        stored, rejected, taken = [], [], set()
+        with self.store.ingest_lock:
+            for index, item in enumerate(items, start):
+                key = item_id(item)
+                if key in taken or self.store.get_post(key) is not None or self.store.get_comment(key) is not None:
+                    rejected.append(reddit_pb2.IngestRejection(index=index, id=key, status=reddit_pb2.ITEM_DUPLICATE))
+                    continue
+                taken.add(key)
+                stored.append((index, item))
+            try:
+                if stored:
+                    add([item for _, item in stored])
+            except Exception as e:
+                logging.error(f"Failed to store {len(stored)} ingested items: {e}")
+                rejected.extend(reddit_pb2.IngestRejection(index=index, id=item_id(item), status=reddit_pb2.ITEM_FAILED)
+                                for index, item in stored)
+                rejected.sort(key=lambda rejection: rejection.index)
+                stored = []
+        if stored and self.responses is not None:
+            self.responses.expire_all()  # Cheaper than a bump per item in a bulk load
+        return [item_id(item) for _, item in stored], rejected
+
     #1. Create a Post
     def CreatePost(self, request, context):
         # Always grant to user therefore no check for user id required just a warning
@@ -50,7 +228,7 @@ class RedditService(reddit_pb2_grpc.RedditServiceServicer):
             logging.warning(f"User {request.author} isn't in authenticated userbase.")
         
         try:
-            post_id = str(uuid.uuid4())  # Generate a unique UUID
+            post_id = new_id()
             new_post = reddit_pb2.Post(
                 id=post_id,
                 title=request.title,
@@ -61,7 +239,7 @@ class RedditService(reddit_pb2_grpc.RedditServiceServicer):
                 publication_date=int(datetime.datetime.now().timestamp()),
                 subreddit_id=request.subreddit_id
             )
-            posts[post_id] = new_post  # Store the new post in the dictionary
+            self.store.add_post(new_post)  # Store the new post
             logging.info(f"Post created successfully: {request.title}")
 
             return new_post
@@ -72,10 +250,12 @@ class RedditService(reddit_pb2_grpc.RedditServiceServicer):
     def UpvoteDownvotePost(self, request, context):
         try:
             post_id = request.item_id
-            if post_id in posts:
-                posts[post_id].score += 1 if request.upvote else -1
-                logging.info(f"Post {request.item_id} {'upvoted' if request.upvote else 'downvoted'} successfully. New score {posts[post_id].score}.")
-                return posts[post_id]
+            post = self.store.vote_post(post_id, 1 if request.upvote else -1)
+            if post is not None:
+                self.changed(('post', post_id))
+                score_bus.publish(post_id, post.score)
+                logging.info(f"Post {request.item_id} {'upvoted' if request.upvote else 'downvoted'} successfully. New score {post.score}.")
+                return post
         
             logging.info(f"Post {request.item_id} not found.")
 
@@ -87,32 +267,26 @@ class RedditService(reddit_pb2_grpc.RedditServiceServicer):
     def RetrievePostContent(self, request, context):
         try:
             post_id = request.post_id
-            if post_id in posts:
-                logging.info(f"Retrieving content for post: {post_id}")
-                return posts[post_id]
-            else:
-                logging.warning(f"Post with ID {post_id} not found.")
-                return reddit_pb2.Post()  # Return an empty post if not found
+            return self.cached(('post', post_id), ('post', post_id), lambda: self.post_content(post_id))
         except Exception as e:
             logging.error(f"Failed to retrieve post content: {e}")
 
+    def post_content(self, post_id):
+        post = self.store.get_post(post_id)
+        if post is not None:
+            logging.info(f"Retrieving content for post: {post_id}")
+            return post
+        else:
+            logging.warning(f"Post with ID {post_id} not found.")
+            return reddit_pb2.Post()  # Return an empty post if not found
+
     # 4. Create Comment
     def CreateComment(self, request, context):
         try: 
-            #comment_id = f"c{len(comments) + 1}"  # Generate a unique comment ID
-            comment_id = str(uuid.uuid4())  # Generate a unique UUID
-
-            new_comment = reddit_pb2.Comment(
-                comment_id=comment_id,
-                author=request.author,
-                score=0,
-                state=reddit_pb2.COMMENT_NORMAL,
-                publication_date=int(datetime.datetime.now().timestamp()),
-                parent_id=request.parent_id,
-                text=request.text
-            )
-            comments[comment_id] = new_comment  # Store the new comment in the dictionary
-            logging.info(f"Comment created successfully: Comment ID {comment_id}, Author {request.author}")
+            new_comment = build_comment(request)
+            self.store.add_comment(new_comment)  # Store the new comment and index it under its parent
+            self.comment_created(new_comment)
+            logging.info(f"Comment created successfully: Comment ID {new_comment.comment_id}, Author {request.author}")
             return new_comment
         except Exception as e:
             logging.error(f"Failed to create comment: {e}")
@@ -121,10 +295,12 @@ class RedditService(reddit_pb2_grpc.RedditServiceServicer):
     def UpvoteDownvoteComment(self, request, context):
         try:
             comment_id = request.item_id
-            if comment_id in comments:
-                comments[comment_id].score += 1 if request.upvote else -1
-                logging.info(f"Comment {comment_id} {'upvoted' if request.upvote else 'downvoted'} successfully. New score {comments[comment_id].score}.")
-                return comments[comment_id]
+            comment = self.store.vote_comment(comment_id, 1 if request.upvote else -1)  # Also repositions it under its parent
+            if comment is not None:
+                self.changed(('children', comment.parent_id))
+                score_bus.publish(comment_id, comment.score)
+                logging.info(f"Comment {comment_id} {'upvoted' if request.upvote else 'downvoted'} successfully. New score {comment.score}.")
+                return comment
             else:
                 logging.warning(f"Comment with ID {comment_id} not found.")
                 return reddit_pb2.Comment()  # Return empty comment if not found
@@ -137,13 +313,9 @@ class RedditService(reddit_pb2_grpc.RedditServiceServicer):
     # 5. rerieve Top N comments
     def RetrieveTopNComments(self, request, context):
         try:
-            post_comments = [
-                comment for comment in comments.values() if comment.parent_id == request.post_id
-            ]
-            sorted_comments = sorted(post_comments, key=lambda c: c.score, reverse=True)[:request.n]
-            has_replies = [any(c.parent_id == comment.comment_id for c in comments.values()) for comment in sorted_comments]
-            logging.info(f"Retrieved top {request.n} comments for post {request.post_id}")
-            return reddit_pb2.TopNCommentsResponse(comments=sorted_comments, has_replies=has_replies)
+            return self.top_comments_flights.do((request.post_id, request.n), lambda: self.cached(
+                ('top', request.post_id, request.n), ('children', request.post_id),
+                lambda: self.top_comments(request.post_id, request.n)))
         except Exception as e:
             logging.error(f"Failed to retrieve top comments: {e}")
             # post_id = request.post_id
@@ -153,16 +325,21 @@ class RedditService(reddit_pb2_grpc.RedditServiceServicer):
             # has_replies = [False for _ in top_comments]  # Simplified
             # return reddit_pb2.TopNCommentsResponse(comments=top_comments, has_replies=has_replies)
 
+    def top_comments(self, post_id, n):
+        # Children are kept in score order, so the top N is a prefix of the index
+        sorted_comments = self.store.top_children(post_id, n)
+        has_replies = [self.store.has_replies(comment.comment_id) for comment in sorted_comments]
+        logging.info(f"Retrieved top {n} comments for post {post_id}")
+        return reddit_pb2.TopNCommentsResponse(comments=sorted_comments, has_replies=has_replies)
+
     # 6. Expand a Comment Branch
     def ExpandCommentBranch(self, request, context):
         try:
             comment_branch = []
-            main_comment = comments.get(request.comment_id)
+            main_comment = self.store.get_comment(request.comment_id)
             if main_comment:
                 comment_branch.append(main_comment)
-                child_comments = [comment for comment in comments.values() if comment.parent_id == main_comment.comment_id]
-                sorted_children = sorted(child_comments, key=lambda c: c.score, reverse=True)[:request.n]
-                comment_branch.extend(sorted_children)
+                comment_branch.extend(self.store.top_children(main_comment.comment_id, request.n))
             logging.info(f"Expanded comment branch for comment {request.comment_id}")
             return reddit_pb2.ExpandCommentBranchResponse(comments=comment_branch)
         except Exception as e:
@@ -179,71 +356,453 @@ class RedditService(reddit_pb2_grpc.RedditServiceServicer):
     
     # 7. Extra - Monitor Updates
     def MonitorUpdates(self, request, context):
-        last_post_score = None
-        last_comment_scores = {}
-
-        while True:
-            # Check for post score update
-            if request.post_id in posts:
-                post = posts[request.post_id]
-                if last_post_score != post.score:
-                    yield reddit_pb2.ScoreUpdate(
-                        item_id=post.id, 
-                        new_score=post.score
-                    )
-                    last_post_score = post.score
-
-            # Check for comment score updates
-            for comment_id in request.comment_ids:
-                if comment_id in comments:
-                    comment = comments[comment_id]
-                    if last_comment_scores.get(comment_id) != comment.score:
-                        yield reddit_pb2.ScoreUpdate(
-                            item_id=comment.comment_id, 
-                            new_score=comment.score
-                        )
-                        last_comment_scores[comment_id] = comment.score
-
-            time.sleep(1)  # Check for updates every second
-        
+        # Subscribe before reading the current scores so no change is missed in between
+        subscription = score_bus.subscribe(monitored_ids(request))
+        context.add_callback(subscription.close)  # Wake the stream up when the client goes away
+        try:
+            # Send the current scores first
+            yield from current_scores(self.store, request)
+
+            # Then sleep until one of the watched items changes
+            while True:
+                updates = subscription.wait()
+                if updates is None:
+                    break
+                for item_id, score in updates:
+                    yield reddit_pb2.ScoreUpdate(item_id=item_id, new_score=score)
+        finally:
+            subscription.close()
 
-def serve(host, port):
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    reddit_pb2_grpc.add_RedditServiceServicer_to_server(RedditService(), server)
+    # 8. Batch - Retrieve many Posts
+    def BatchGetPosts(self, request, context):
+        results = []
+        for post_id in request.post_ids:
+            try:
+                post = self.store.get_post(post_id)
+                if post is None:
+                    results.append(reddit_pb2.PostResult(status=reddit_pb2.ITEM_NOT_FOUND))
+                else:
+                    results.append(reddit_pb2.PostResult(status=reddit_pb2.ITEM_OK, post=post))
+            except Exception as e:
+                logging.error(f"Failed to retrieve post {post_id}: {e}")
+                results.append(reddit_pb2.PostResult(status=reddit_pb2.ITEM_FAILED))
+        logging.info(f"Retrieved {len(results)} posts in a batch")
+        return reddit_pb2.BatchGetPostsResponse(results=results)
+
+    # 9. Batch - Upvote or Downvote many Posts and Comments
+    def BatchVote(self, request, context):
+        results = []
+        for vote in request.votes:
+            try:
+                delta = 1 if vote.upvote else -1
+                item = self.store.vote_post(vote.item_id, delta)
+                if item is not None:
+                    self.changed(('post', vote.item_id))
+                else:
+                    item = self.store.vote_comment(vote.item_id, delta)
+                    if item is not None:
+                        self.changed(('children', item.parent_id))
+                if item is None:
+                    results.append(reddit_pb2.VoteResult(status=reddit_pb2.ITEM_NOT_FOUND, item_id=vote.item_id))
+                    continue
+                score_bus.publish(vote.item_id, item.score)
+                results.append(reddit_pb2.VoteResult(status=reddit_pb2.ITEM_OK, item_id=vote.item_id, new_score=item.score))
+            except Exception as e:
+                logging.error(f"Failed to upvote/downvote {vote.item_id}: {e}")
+                results.append(reddit_pb2.VoteResult(status=reddit_pb2.ITEM_FAILED, item_id=vote.item_id))
+        logging.info(f"Applied {len(results)} votes in a batch")
+        return reddit_pb2.BatchVoteResponse(results=results)
+
+    # 10. Batch - Create many Comments
+    def BatchCreateComments(self, request, context):
+        results = []
+        for comment_request in request.comments:
+            try:
+                new_comment = build_comment(comment_request)
+                self.store.add_comment(new_comment)
+                self.comment_created(new_comment)
+                results.append(reddit_pb2.CommentResult(status=reddit_pb2.ITEM_OK, comment=new_comment))
+            except Exception as e:
+                logging.error(f"Failed to create comment under {comment_request.parent_id}: {e}")
+                results.append(reddit_pb2.CommentResult(status=reddit_pb2.ITEM_FAILED))
+        logging.info(f"Created {len(results)} comments in a batch")
+        return reddit_pb2.BatchCreateCommentsResponse(results=results)
+
+    # 11. Bulk - Ingest a stream of Posts
+    def IngestPosts(self, request_iterator, context):
+        ids, rejected, start = [], [], 0
+        for chunk in chunked(ingested_post(request) for request in request_iterator):
+            stored, refused = self.store_ingested_posts(chunk, start)
+            ids.extend(stored)
+            rejected.extend(refused)
+            start += len(chunk)
+        return ingest_summary('posts', ids, rejected)
+
+    # 12. Bulk - Ingest a stream of Comments, parents must come before their replies
+    def IngestComments(self, request_iterator, context):
+        ids, rejected, start = [], [], 0
+        for chunk in chunked(ingested_comment(request) for request in request_iterator):
+            stored, refused = self.store_ingested_comments(chunk, start)
+            ids.extend(stored)
+            rejected.extend(refused)
+            start += len(chunk)
+        return ingest_summary('comments', ids, rejected)
+
+    # 13. Paginated Comments under a Post
+    def RetrieveCommentsPage(self, request, context):
+        try:
+            after = decode_cursor(request.cursor)
+        except ValueError:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(f"Invalid cursor {request.cursor!r}")
+            return reddit_pb2.CommentsPageResponse()
+        try:
+            comments, next_cursor = self.store.children_page(request.post_id, after, clamp_page_size(request.page_size))
+            logging.info(f"Retrieved a page of {len(comments)} comments for post {request.post_id}")
+            return build_comments_page(self.store, comments, next_cursor)
+        except Exception as e:
+            logging.error(f"Failed to retrieve comments page: {e}")
+
+    # 14. Stream Comments under a Post in chunks, each chunk is read only when it's about to be sent
+    def StreamComments(self, request, context):
+        chunk_size = clamp_page_size(request.chunk_size)
+        remaining = request.n if request.n > 0 else None
+        after = None
+        while remaining is None or remaining > 0:
+            comments, next_cursor = self.store.children_page(request.post_id, after, next_chunk_size(chunk_size, remaining))
+            if not comments:
+                break
+            yield build_comments_page(self.store, comments, next_cursor)
+            if not next_cursor:
+                break
+            after = decode_cursor(next_cursor)
+            if remaining is not None:
+                remaining -= len(comments)
+
+    # 15. Expand several levels of a Comment tree in one call
+    def ExpandCommentTree(self, request, context):
+        try:
+            root = self.store.get_comment(request.root_id)
+            if root is None and self.store.get_post(request.root_id) is None:
+                logging.warning(f"Comment or post with ID {request.root_id} not found.")
+                return reddit_pb2.ExpandCommentTreeResponse()
+            tree, truncated = expand_tree(self.store, request.root_id, request.depth, request.breadth,
+                                          request.max_nodes, request.max_bytes)
+            logging.info(f"Expanded comment tree for {request.root_id}")
+            return reddit_pb2.ExpandCommentTreeResponse(root=root, replies=tree.replies,
+                                                        has_more_replies=tree.has_more_replies, truncated=truncated)
+        except Exception as e:
+            logging.error(f"Failed to expand comment tree: {e}")
+
+    # 16. Post Page - Post, top N comments and their top M replies in one call
+    def GetPostPage(self, request, context):
+        try:
+            post = self.store.get_post(request.post_id)
+            if post is None:
+                logging.warning(f"Post with ID {request.post_id} not found.")
+                return reddit_pb2.PostPageResponse()
+            top_comments = self.store.top_children(request.post_id, request.n + 1)  # One extra tells whether more exist
+            nodes = []
+            for comment in top_comments[:request.n]:
+                if request.m > 0:
+                    replies, _ = expand_tree(self.store, comment.comment_id, 1, request.m)
+                    nodes.append(reddit_pb2.CommentNode(comment=comment, replies=replies.replies,
+                                                        has_more_replies=replies.has_more_replies))
+                else:
+                    nodes.append(reddit_pb2.CommentNode(comment=comment,
+                                                        has_more_replies=self.store.has_replies(comment.comment_id)))
+            logging.info(f"Retrieved page for post: {request.post_id}")
+            return reddit_pb2.PostPageResponse(post=post, comments=nodes,
+                                               has_more_comments=len(top_comments) > request.n)
+        except Exception as e:
+            logging.error(f"Failed to retrieve post page: {e}")
+
+    # 17. Metrics of the server
+    def GetMetrics(self, request, context):
+        return reddit_pb2.MetricsResponse(values=metrics.values())
+
+
+class AsyncRedditService(reddit_pb2_grpc.RedditServiceServicer):
+    # grpc.aio servicer. The in-memory operations never block, so the unary
+    # RPCs run inline on the event loop and reuse the RedditService logic;
+    # only MonitorUpdates needs its own implementation so it awaits instead
+    # of parking a thread.
+
+    def __init__(self, store=store, responses=None):
+        self.service = RedditService(store, responses)
+
+    async def call(self, function, *args):
+        # Backends that do disk I/O run on the default executor instead of blocking the loop
+        if self.service.store.blocking:
+            return await asyncio.to_thread(function, *args)
+        return function(*args)
+
+    async def CreatePost(self, request, context):
+        return await self.call(self.service.CreatePost, request, context)
+
+    async def UpvoteDownvotePost(self, request, context):
+        return await self.call(self.service.UpvoteDownvotePost, request, context)
+
+    async def RetrievePostContent(self, request, context):
+        return await self.call(self.service.RetrievePostContent, request, context)
+
+    async def CreateComment(self, request, context):
+        return await self.call(self.service.CreateComment, request, context)
+
+    async def UpvoteDownvoteComment(self, request, context):
+        return await self.call(self.service.UpvoteDownvoteComment, request, context)
+
+    async def RetrieveTopNComments(self, request, context):
+        return await self.call(self.service.RetrieveTopNComments, request, context)
+
+    async def ExpandCommentBranch(self, request, context):
+        return await self.call(self.service.ExpandCommentBranch, request, context)
+
+    async def BatchGetPosts(self, request, context):
+        return await self.call(self.service.BatchGetPosts, request, context)
+
+    async def BatchVote(self, request, context):
+        return await self.call(self.service.BatchVote, request, context)
+
+    async def BatchCreateComments(self, request, context):
+        return await self.call(self.service.BatchCreateComments, request, context)
+
+    async def IngestPosts(self, request_iterator, context):
+        ids, rejected, start = [], [], 0
+        chunk = []
+        async for request in request_iterator:
+            chunk.append(ingested_post(request))
+            if len(chunk) >= INGEST_CHUNK_SIZE:
+                stored, refused = await self.call(self.service.store_ingested_posts, chunk, start)
+                ids.extend(stored)
+                rejected.extend(refused)
+                start += len(chunk)
+                chunk = []
+        if chunk:
+            stored, refused = await self.call(self.service.store_ingested_posts, chunk, start)
+            ids.extend(stored)
+            rejected.extend(refused)
+        return ingest_summary('posts', ids, rejected)
+
+    async def IngestComments(self, request_iterator, context):
+        ids, rejected, start = [], [], 0
+        chunk = []
+        async for request in request_iterator:
+            chunk.append(ingested_comment(request))
+            if len(chunk) >= INGEST_CHUNK_SIZE:
+                stored, refused = await self.call(self.service.store_ingested_comments, chunk, start)
+                ids.extend(stored)
+                rejected.extend(refused)
+                start += len(chunk)
+                chunk = []
+        if chunk:
+            stored, refused = await self.call(self.service.store_ingested_comments, chunk, start)
+            ids.extend(stored)
+            rejected.extend(refused)
+        return ingest_summary('comments', ids, rejected)
+
+    async def RetrieveCommentsPage(self, request, context):
+        return await self.call(self.service.RetrieveCommentsPage, request, context)
+
+    async def ExpandCommentTree(self, request, context):
+        return await self.call(self.service.ExpandCommentTree, request, context)
+
+    async def GetPostPage(self, request, context):
+        return await self.call(self.service.GetPostPage, request, context)
+
+    async def GetMetrics(self, request, context):
+        return self.service.GetMetrics(request, context)
+
+    async def StreamComments(self, request, context):
+        store = self.service.store
+        chunk_size = clamp_page_size(request.chunk_size)
+        remaining = request.n if request.n > 0 else None
+        after = None
+        while remaining is None or remaining > 0:
+            comments, next_cursor = await self.call(store.children_page, request.post_id, after, next_chunk_size(chunk_size, remaining))
+            if not comments:
+                break
+            yield await self.call(build_comments_page, store, comments, next_cursor)
+            if not next_cursor:
+                break
+            after = decode_cursor(next_cursor)
+            if remaining is not None:
+                remaining -= len(comments)
+
+    async def MonitorUpdates(self, request, context):
+        subscription = score_bus.subscribe(monitored_ids(request), AsyncSubscription)
+        try:
+            for update in await self.call(current_scores, self.service.store, request):
+                yield update
+            # A cancelled stream raises CancelledError out of the await below
+            while True:
+                updates = await subscription.wait()
+                if updates is None:
+                    break
+                for item_id, score in updates:
+                    yield reddit_pb2.ScoreUpdate(item_id=item_id, new_score=score)
+        finally:
+            subscription.close()
+
+
+def server_options(reuse_port):
+    # Worker processes of a multi-process server all bind the same port, the kernel spreads connections over them
+    return [('grpc.so_reuseport', 1 if reuse_port else 0)]
+
+
+def add_servicer(servicer, server, responses):
+    if responses is not None:
+        add_cached_handlers(servicer, server)  # Send cached bytes without encoding them again
+    reddit_pb2_grpc.add_RedditServiceServicer_to_server(servicer, server)
+
+
+def serve(host, port, store=store, reuse_port=False, responses=None):
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10), options=server_options(reuse_port))
+    add_servicer(RedditService(store, responses), server, responses)
     server.add_insecure_port(f'{host}:{port}')
     server.start()
     print(f'Server running on {host}:{port}')
     server.wait_for_termination()
-    
-if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description='gRPC Reddit Clone Server')
+
+
+async def serve_aio(host, port, store=store, reuse_port=False, responses=None):
+    # Single event loop, no thread pool cap on in-flight RPCs and streams
+    server = grpc.aio.server(options=server_options(reuse_port))
+    add_servicer(AsyncRedditService(store, responses), server, responses)
+    server.add_insecure_port(f'{host}:{port}')
+    await server.start()
+    print(f'Server running on {host}:{port} (asyncio)')
+    await server.wait_for_termination()
+
+
+def add_server_arguments(parser):
     parser.add_argument('--host', default='localhost', type=str, help='Host to run gRPC server on')
     parser.add_argument('--port', default=50051, type=int, help='Port to run gRPC server on')
-    args = parser.parse_args()
-    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser.add_argument('--mode', default='thread', choices=['thread', 'aio'], help='Thread pool server or grpc.aio (asyncio) server')
+    parser.add_argument('--db', default=None, type=str, help='SQLite database file to persist data in (in-memory if not set)')
+    parser.add_argument('--vote-flush-interval', default=0.2, type=float, help='Seconds votes may wait in memory before being written to the database (0 writes every vote)')
+    parser.add_argument('--vote-flush-size', default=1000, type=int, help='Write buffered votes once this many items have pending votes')
+    parser.add_argument('--data-dir', default=None, type=str, help='Directory for the operation log and snapshots that make the in-memory store durable')
+    parser.add_argument('--fsync-interval', default=0.0, type=float, help='Seconds the operation log waits for more writes before each fsync (0: writes queued during an fsync share the next one)')
+    parser.add_argument('--snapshot-interval', default=60.0, type=float, help='Seconds between snapshots of the in-memory store (0 only snapshots on shutdown)')
+    parser.add_argument('--snapshot-mode', default=None, choices=['fork', 'thread'],
+                        help='Write snapshots from a forked child process or from a thread (default: fork where available)')
+    parser.add_argument('--node-id', default=0, type=int, choices=range(MAX_NODE_ID + 1), metavar=f'0-{MAX_NODE_ID}',
+                        help='Node ID in generated post and comment IDs, unique per server sharing a data set')
+    parser.add_argument('--workers', default=0, type=int,
+                        help='Serve from this many processes sharing the port and the in-memory store (0: a single process); '
+                             'worker i uses node ID --node-id + i')
+    parser.add_argument('--shared-capacity', default=1_000_000, type=int,
+                        help='Posts and comments (each) the shared score arrays of --workers have room for')
+    parser.add_argument('--shards', default=0, type=int,
+                        help='Run a local sharded cluster of this many servers, shard i on --port + i with node ID i '
+                             '(clients route with RedditClient(shards=...))')
+    parser.add_argument('--response-cache', default=10000, type=int,
+                        help='Serialized post and top comment responses to keep for hot reads (0 disables it; '
+                             'always off with --workers, other workers\' writes would not invalidate it)')
+
+
+def run_worker(args, state, index):
+    # Body of one process of a multi-process server, forked by run_workers()
+    id_generator.node_id = args.node_id + index
+    backend = SharedStore(state, simulates=index == 0)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    threading.Thread(target=update_scores, args=(backend,), daemon=True).start()
+    threading.Thread(target=publish_shared_changes, args=(backend,), daemon=True).start()
+    if args.mode == 'aio':
+        asyncio.run(serve_aio(args.host, args.port, backend, reuse_port=True))
+    else:
+        serve(args.host, args.port, backend, reuse_port=True)
+
+
+def run_workers(args):
+    # The GIL caps one process at one core: fork workers that share the port and the
+    # scores. Nothing gRPC may be created in this process before the fork.
+    if args.db or args.data_dir:
+        raise SystemExit("--workers only works with the in-memory store, not with --db or --data-dir")
+    if args.node_id + args.workers - 1 > MAX_NODE_ID:
+        raise SystemExit(f"--node-id + --workers - 1 must be at most {MAX_NODE_ID}")
+    state = SharedState(args.shared_capacity)
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=run_worker, args=(args, state, index)) for index in range(args.workers)]
+    try:
+        run_processes(workers, f'Started {args.workers} worker processes on {args.host}:{args.port}')
+    finally:
+        state.close()
+
 
+def run_shards(args):
+    # Every shard is an ordinary server holding its part of the posts and their comment trees; the
+    # node ID in the IDs it generates is its shard number, which is how clients route by ID
+    if args.workers:
+        raise SystemExit("--shards can't be combined with --workers, shards need a node ID each")
+    if args.shards > MAX_NODE_ID + 1:
+        raise SystemExit(f"At most {MAX_NODE_ID + 1} shards")
+    context = multiprocessing.get_context('fork')
+    shards = []
+    for index in range(args.shards):
+        shard_args = argparse.Namespace(**{**vars(args), 'shards': 0, 'port': args.port + index, 'node_id': index})
+        if args.data_dir:
+            shard_args.data_dir = os.path.join(args.data_dir, f"shard-{index}")
+        if args.db:
+            root, extension = os.path.splitext(args.db)
+            shard_args.db = f"{root}-shard{index}{extension}"
+        shards.append(context.Process(target=run, args=(shard_args,)))
+    run_processes(shards, f'Started {args.shards} shards on {args.host}:{args.port}-{args.port + args.shards - 1}')
+
+
+def run_processes(processes, started_message):
+    # Runs forked server processes until they exit or this one is terminated
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        for process in processes:
+            process.start()
+        print(started_message)
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+
+
+def run(args):
+    if args.shards > 0:
+        return run_shards(args)
+    if args.workers > 0:
+        return run_workers(args)
+    id_generator.node_id = args.node_id
+    # Extra - Database
+    backend = store
+    if args.db:
+        backend = Database(args.db, vote_flush_interval=args.vote_flush_interval, vote_flush_size=args.vote_flush_size)
+    elif args.data_dir:
+        backend = DurableStore(args.data_dir, store, fsync_interval=args.fsync_interval, snapshot_interval=args.snapshot_interval,
+                               snapshot_mode=args.snapshot_mode, metrics=metrics)
+    # Turn SIGTERM into a normal exit so the finally block below still runs
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    responses = ResponseCache(args.response_cache, metrics=metrics) if args.response_cache > 0 else None
 
     # Start the background thread for score updating
-    threading.Thread(target=update_scores, daemon=True).start()
+    threading.Thread(target=update_scores, args=(backend, responses), daemon=True).start()
 
     # Start the gRPC server with the provided host and port
-    serve(args.host, args.port)
-    
-    
-    # Extra - Database 
-    # db = Database('storage.db')
-
-    # server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    # reddit_pb2_grpc.add_RedditServiceServicer_to_server(RedditService(db), server)
-    # server.add_insecure_port('[::]:50051')
-    # server.start()
-    # print("Server started, listening on port 50051.")
-    # server.wait_for_termination()
-    
-    
-    # server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    # reddit_pb2_grpc.add_RedditServiceServicer_to_server(RedditService(), server)
-    # server.add_insecure_port('[::]:50051')
-    # server.start()
-    # server.wait_for_termination()
+    try:
+        if args.mode == 'aio':
+            asyncio.run(serve_aio(args.host, args.port, backend, responses=responses))
+        else:
+            serve(args.host, args.port, backend, responses=responses)
+    finally:
+        if backend is not store:
+            backend.close()  # Writes out buffered votes, or a final snapshot
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='gRPC Reddit Clone Server')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+    run(args)
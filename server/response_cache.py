@@ -0,0 +1,91 @@
+import collections
+import threading
+import zlib
+
+import grpc
+from proto import reddit_pb2
+
+SERVICE_NAME = 'redditDataModel.RedditService'
+
+
+class ResponseCache:
+    """Serialized responses of hot reads, invalidated by version counters.
+
+    A response is cached with the version of the data it was built from,
+    named by a (kind, item_id) pair like ('children', post_id): the counter
+    of its stripe (a fixed array of counters the names hash onto, so memory
+    doesn't grow with the items written) and the epoch, which expires
+    everything at once (the score simulator moves every score). Writers bump
+    the versions after changing the store, so a response built from data
+    older than a write never matches again and a lookup is just a version
+    compare. Names sharing a stripe only cost an extra miss. The least
+    recently used of more than max_entries responses are dropped.
+    """
+
+    def __init__(self, max_entries=10000, stripes=4096, metrics=None):
+        self.max_entries = max_entries
+        self.metrics = metrics
+        self._versions = [0] * stripes
+        self._epoch = 0
+        self._entries = collections.OrderedDict()  # key -> (version, bytes)
+        self._lock = threading.Lock()
+
+    def _stripe(self, name):
+        # Stable across processes, unlike hash() of strings
+        kind, item_id = name
+        return zlib.crc32(f"{kind}\0{item_id}".encode()) % len(self._versions)
+
+    def get(self, key, depends_on, build):
+        # Serialized response for key, built from the data versioned as depends_on; build() makes the message on a miss
+        with self._lock:
+            version = self._epoch, self._versions[self._stripe(depends_on)]
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self._count('response_cache_hits')
+                return entry[1]
+        self._count('response_cache_misses')
+        data = build().SerializeToString()  # Built outside the lock, version was read before the store
+        with self._lock:
+            self._entries[key] = (version, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return data
+
+    def bump(self, *names):
+        # Call after changing the store, responses built before don't match any more
+        with self._lock:
+            for name in names:
+                self._versions[self._stripe(name)] += 1
+
+    def expire_all(self):
+        with self._lock:
+            self._epoch += 1
+
+    def _count(self, name):
+        if self.metrics is not None:
+            self.metrics.increment(name)
+
+
+def passthrough(serialize):
+    # Response serializer that sends bytes as they are, cached responses are already encoded
+    def serializer(response):
+        return response if isinstance(response, bytes) else serialize(response)
+    return serializer
+
+
+def add_cached_handlers(servicer, server):
+    # Handlers of the RPCs that can return cached bytes. Added before the generated ones, which
+    # serve every other method: the server asks its generic handlers in the order they were added.
+    handlers = {
+        'RetrievePostContent': grpc.unary_unary_rpc_method_handler(
+            servicer.RetrievePostContent,
+            request_deserializer=reddit_pb2.PostRequest.FromString,
+            response_serializer=passthrough(reddit_pb2.Post.SerializeToString)),
+        'RetrieveTopNComments': grpc.unary_unary_rpc_method_handler(
+            servicer.RetrieveTopNComments,
+            request_deserializer=reddit_pb2.TopNCommentsRequest.FromString,
+            response_serializer=passthrough(reddit_pb2.TopNCommentsResponse.SerializeToString)),
+    }
+    server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler(SERVICE_NAME, handlers),))
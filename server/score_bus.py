@@ -0,0 +1,117 @@
+import asyncio
+import threading
+
+
+class Subscription:
+    """Score changes for a fixed set of item IDs, delivered to one stream.
+
+    Pending updates are coalesced per item, so a slow reader only ever sees
+    the latest score of each item instead of an unbounded backlog.
+    """
+
+    def __init__(self, bus, item_ids):
+        self.bus = bus
+        self.item_ids = frozenset(item_ids)
+        self.closed = False
+        self._pending = {}  # item_id -> latest score not yet handed out
+        self._cond = threading.Condition()
+
+    def _deliver(self, item_id, score):
+        with self._cond:
+            self._pending[item_id] = score
+            self._cond.notify()
+
+    def wait(self, timeout=None):
+        # Block until at least one watched item changes, returns a list of
+        # (item_id, score) pairs, or None once the subscription is closed
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or self.closed, timeout)
+            if self.closed:
+                return None
+            updates = list(self._pending.items())
+            self._pending.clear()
+            return updates
+
+    def close(self):
+        self.bus.unsubscribe(self)
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class AsyncSubscription(Subscription):
+    """Subscription read from a grpc.aio stream instead of a worker thread.
+
+    Publishers may run on any thread, so they hand the wake-up over to the
+    subscriber's event loop.
+    """
+
+    def __init__(self, bus, item_ids):
+        super().__init__(bus, item_ids)
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+
+    def _wake(self):
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            pass  # The event loop is already closed, nobody is waiting anymore
+
+    def _deliver(self, item_id, score):
+        with self._cond:
+            self._pending[item_id] = score
+        self._wake()
+
+    async def wait(self):
+        await self._event.wait()
+        with self._cond:
+            self._event.clear()
+            if self.closed:
+                return None
+            updates = list(self._pending.items())
+            self._pending.clear()
+            return updates
+
+    def close(self):
+        super().close()
+        self._wake()
+
+
+class ScoreBus:
+    """Publish/subscribe channel for post and comment score changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # item_id -> set of subscriptions watching it
+
+    def subscribe(self, item_ids, subscription_class=Subscription):
+        subscription = subscription_class(self, item_ids)
+        with self._lock:
+            for item_id in subscription.item_ids:
+                self._subscribers.setdefault(item_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for item_id in subscription.item_ids:
+                watchers = self._subscribers.get(item_id)
+                if watchers is None:
+                    continue
+                watchers.discard(subscription)
+                if not watchers:
+                    del self._subscribers[item_id]
+
+    def watched(self):
+        # IDs that currently have at least one subscriber
+        with self._lock:
+            return list(self._subscribers)
+
+    def publish(self, item_id, score):
+        # Publishing an item nobody watches is a single dict lookup
+        with self._lock:
+            watchers = self._subscribers.get(item_id)
+            if not watchers:
+                return
+            watchers = list(watchers)
+        for subscription in watchers:
+            subscription._deliver(item_id, score)
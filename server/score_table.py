@@ -0,0 +1,162 @@
+import contextlib
+import threading
+
+import numpy as np
+
+
+class ScoreTable:
+    """Scores of one kind of item (posts or comments) in a dense NumPy array.
+
+    Items get an internal integer index, their slot, in the order they are
+    added and the score of slot i is kept in one int64 array. That lets the
+    score simulator move every score with a single vectorized operation and
+    lets top-N selection work on the array instead of on the messages. The
+    item's ID and its record (e.g. a PostRecord) are in lists by slot too.
+
+    Votes hold one of a fixed set of stripe locks, picked by slot, so votes
+    on different items run in parallel and votes on the same item are
+    serialized. Adds hold self.lock for the lists and the slot dict. A
+    random walk step, and growing the array when an add needs more room,
+    take every stripe (in order, so they can't deadlock) since they touch
+    every score. Reads don't lock: an int64 element is never torn, so a read
+    running next to a random walk step sees each score either before or
+    after it.
+
+    With a base (a MappedTable of a mapped snapshot) the first len(base)
+    slots are the snapshot's items: their scores are copied into the array,
+    but their IDs and records are read from the mapped file when asked for
+    and only items added afterwards are in the lists and the slot dict.
+
+    With scores (an array in shared memory, see shared_store.py) the table
+    has a fixed capacity and the score of a new slot is expected to be in the
+    array already: processes sharing it each add the same items to their own
+    table, and only the one that created an item writes its first score.
+    stripes are then stripe locks shared by those processes.
+    """
+
+    def __init__(self, capacity=1024, base=None, scores=None, stripes=None, num_stripes=64):
+        self.lock = threading.Lock()
+        self._stripes = stripes if stripes is not None else [threading.Lock() for _ in range(num_stripes)]
+        self.base = base
+        self.base_size = len(base) if base is not None else 0
+        self.ids = []  # slot - base_size -> item_id
+        self.records = []  # slot - base_size -> record of the item
+        self._slots = {}  # item_id -> slot, of the items added after the base
+        self.shared = scores is not None
+        self._scores = scores if self.shared else np.zeros(max(capacity, 2 * self.base_size), dtype=np.int64)
+        if base is not None:
+            self._scores[:self.base_size] = base.scores
+        self._size = self.base_size
+        self.epoch = 0  # Bumped by every random walk step, which moves all scores at once
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, count):
+        # Called with self.lock held; the bigger array is in place before any new slot is handed out
+        needed = self._size + count
+        if needed <= len(self._scores):
+            return
+        if self.shared:
+            raise ValueError(f"Score table is full ({len(self._scores)} items)")
+        with self._all_stripes():  # No vote may land in the old array once it has been copied
+            scores = np.zeros(max(needed, 2 * len(self._scores)), dtype=np.int64)
+            scores[:self._size] = self._scores[:self._size]
+            self._scores = scores
+
+    @contextlib.contextmanager
+    def _all_stripes(self):
+        for lock in self._stripes:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(self._stripes):
+                lock.release()
+
+    def add(self, item_id, score, record=None):
+        with self.lock:
+            self._reserve(1)
+            slot = self._size
+            if not self.shared:
+                self._scores[slot] = score
+            self.ids.append(item_id)
+            self.records.append(record)
+            self._slots[item_id] = slot
+            self._size += 1
+            return slot
+
+    def add_many(self, items):
+        # Bulk version of add for (item_id, score, record) tuples, returns their slots
+        items = list(items)
+        with self.lock:
+            self._reserve(len(items))
+            start = self._size
+            slots = list(range(start, start + len(items)))  # The same int objects go to every index
+            if not self.shared:
+                self._scores[start:start + len(items)] = [score for item_id, score, record in items]
+            for slot, (item_id, score, record) in zip(slots, items):
+                self.ids.append(item_id)
+                self.records.append(record)
+                self._slots[item_id] = slot
+            self._size += len(items)
+            return slots
+
+    def slot(self, item_id):
+        slot = self._slots.get(item_id)
+        if slot is None and self.base is not None:
+            return self.base.find(item_id)
+        return slot
+
+    def item_id(self, slot):
+        if slot < self.base_size:
+            return self.base.item_key(slot)
+        return self.ids[slot - self.base_size]
+
+    def record(self, slot):
+        if slot < self.base_size:
+            return self.base.record(slot)
+        return self.records[slot - self.base_size]
+
+    def keys(self):
+        # Every item_id in slot order
+        if self.base is None:
+            return list(self.ids)
+        return self.base.keys() + self.ids
+
+    def score(self, slot):
+        return int(self._scores[slot])
+
+    def take(self, slots):
+        # Scores of an array of slots, as a new array
+        scores = self._scores
+        if len(slots) and slots.max() >= len(scores):
+            with self.lock:  # The array grew since it was read, wait for the bigger one
+                scores = self._scores
+        return scores[slots]
+
+    def copy_scores(self):
+        # Scores of every slot added so far, as a new array
+        with self.lock:
+            return self._scores[:self._size].copy()
+
+    def live_scores(self):
+        # Scores of every slot added so far without a copy or the lock, only
+        # safe when nothing writes to the table (e.g. in a forked child)
+        return self._scores[:self._size]
+
+    def vote(self, slot, delta):
+        # Returns the score after this vote
+        with self._stripes[slot % len(self._stripes)]:
+            self._scores[slot] += delta
+            return int(self._scores[slot])
+
+    def random_walk(self, rng, low=-1, high=1):
+        # Adds a random delta in [low, high] to every score in one step and returns the deltas
+        size = self._size
+        deltas = rng.integers(low, high + 1, size=size, dtype=np.int64)
+        with self._all_stripes():
+            self._scores[:size] += deltas
+            self.epoch += 1
+        return deltas
+
@@ -0,0 +1,213 @@
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from durable_store import OP_ADD_POST, encode_add
+from oplog import frame, parse_records
+from proto import reddit_pb2
+from score_table import ScoreTable
+from store import Store
+
+# Fields of the header in front of the score arrays
+LOG_LENGTH = 0  # Bytes of the creates log that are complete
+POST_COUNT = 1  # Post slots handed out
+COMMENT_COUNT = 2  # Comment slots handed out
+HEADER_FIELDS = 3
+
+
+class SharedState:
+    """State the worker processes of a multi-process server share.
+
+    Created by the parent before the workers are forked, which inherit it:
+    one shared memory block with the post and comment scores (fixed
+    capacity per kind, by slot) behind a small header, the creates log (a
+    file of framed Post and Comment adds with a single writer at a time) and
+    the cross-process locks. Votes take one of num_stripes locks per kind,
+    picked by slot, so votes on different items run in parallel across
+    workers (see ScoreTable). Posts and comments themselves aren't shared,
+    every worker builds its own index by reading the creates log.
+    """
+
+    def __init__(self, capacity=1_000_000, num_stripes=32):
+        self.capacity = capacity
+        self._memory = shared_memory.SharedMemory(create=True, size=8 * (HEADER_FIELDS + 2 * capacity))
+        array = np.ndarray(HEADER_FIELDS + 2 * capacity, dtype=np.int64, buffer=self._memory.buf)
+        array[:HEADER_FIELDS] = 0
+        self.header = array[:HEADER_FIELDS]
+        self.post_scores = array[HEADER_FIELDS:HEADER_FIELDS + capacity]
+        self.comment_scores = array[HEADER_FIELDS + capacity:]
+        self.directory = tempfile.mkdtemp(prefix='reddit-shared-')
+        self.log_path = os.path.join(self.directory, 'creates')
+        open(self.log_path, 'wb').close()
+        context = multiprocessing.get_context('fork')
+        self.create_lock = context.Lock()  # Held by the one process appending to the creates log
+        self.post_stripes = [context.Lock() for _ in range(num_stripes)]  # Post votes and simulator steps
+        self.comment_stripes = [context.Lock() for _ in range(num_stripes)]  # Comment votes and simulator steps
+        self.ingest_lock = context.Lock()  # Held by an ingest while it checks IDs and stores a chunk
+
+    def close(self):
+        # Called by the parent once every worker has exited
+        del self.header, self.post_scores, self.comment_scores
+        self._memory.close()
+        self._memory.unlink()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class SharedStore:
+    """One worker's view of a SharedState, with the same interface as Store.
+
+    Scores are read and voted on in shared memory, so a vote taken by any
+    worker is seen by all of them at once. A create hands out the next slots
+    and writes the first scores under the create lock, appends the items to
+    the creates log and then bumps the log length in the header. Every call
+    first applies what the log has gained since the last one to this
+    worker's own Store, in log order, so slots are the same in every worker.
+
+    The score simulator steps the shared scores from the worker with
+    simulates set. changed_scores() returns the watched items whose score
+    changed since it last looked, whoever changed it, so each worker can
+    publish other workers' votes and the simulator's steps to its own
+    MonitorUpdates streams; random_walk() steps and then calls it.
+    """
+
+    blocking = False  # Locks are only held for a slot hand-out or a vote, the asyncio server runs calls inline
+
+    def __init__(self, state, simulates=True):
+        self.state = state
+        self.simulates = simulates
+        self.store = Store()
+        self.store.post_scores = ScoreTable(scores=state.post_scores, stripes=state.post_stripes)
+        self.store.comment_scores = ScoreTable(scores=state.comment_scores, stripes=state.comment_stripes)
+        self._log = open(state.log_path, 'rb')
+        self._applied = 0  # Bytes of the creates log applied to self.store
+        self._catch_up_lock = threading.Lock()
+        self._seen = {}  # item_id -> score as of the last changed_scores()
+        self._seen_lock = threading.Lock()
+        self.ingest_lock = state.ingest_lock  # Ingests in every worker check IDs against each other's
+
+    def _catch_up(self):
+        if int(self.state.header[LOG_LENGTH]) == self._applied:
+            return
+        with self._catch_up_lock:
+            length = int(self.state.header[LOG_LENGTH])
+            self._log.seek(self._applied)
+            payloads, _ = parse_records(self._log.read(length - self._applied))
+            posts, comments = [], []
+            for payload in payloads:
+                if payload[0] == OP_ADD_POST:
+                    posts.append(reddit_pb2.Post.FromString(payload[1:]))
+                else:
+                    comments.append(reddit_pb2.Comment.FromString(payload[1:]))
+            # Posts first: every post a comment can refer to is in the log before it.
+            # add_comments() groups by parent, only runs of one parent keep the log's slot order.
+            self.store.add_posts(posts)
+            for _, siblings in itertools.groupby(comments, key=lambda comment: comment.parent_id):
+                self.store.add_comments(siblings)
+            self._applied = length
+
+    def _append(self, items, scores, count_field):
+        data = b''.join(frame(encode_add(item)) for item in items)
+        with self.state.create_lock:
+            start = int(self.state.header[count_field])
+            if start + len(items) > self.state.capacity:
+                raise ValueError(f"Shared score table is full ({self.state.capacity} items)")
+            scores[start:start + len(items)] = [item.score for item in items]
+            self.state.header[count_field] = start + len(items)
+            with open(self.state.log_path, 'ab') as log:
+                log.write(data)
+            self.state.header[LOG_LENGTH] += len(data)  # Readers only see the items once they are complete
+        self._catch_up()
+
+    # Posts
+    def add_post(self, post):
+        self._append([post], self.state.post_scores, POST_COUNT)
+
+    def add_posts(self, posts):
+        posts = list(posts)
+        if posts:
+            self._append(posts, self.state.post_scores, POST_COUNT)
+
+    def get_post(self, post_id):
+        self._catch_up()
+        return self.store.get_post(post_id)
+
+    def vote_post(self, post_id, delta):
+        self._catch_up()
+        post = self.store.vote_post(post_id, delta)
+        if post is not None:
+            self._saw(post_id, post.score)
+        return post
+
+    def post_ids(self):
+        self._catch_up()
+        return self.store.post_ids()
+
+    # Comments
+    def add_comment(self, comment):
+        self._append([comment], self.state.comment_scores, COMMENT_COUNT)
+
+    def add_comments(self, comments):
+        comments = list(comments)
+        if comments:
+            self._append(comments, self.state.comment_scores, COMMENT_COUNT)
+
+    def get_comment(self, comment_id):
+        self._catch_up()
+        return self.store.get_comment(comment_id)
+
+    def vote_comment(self, comment_id, delta):
+        self._catch_up()
+        comment = self.store.vote_comment(comment_id, delta)
+        if comment is not None:
+            self._saw(comment_id, comment.score)
+        return comment
+
+    def top_children(self, parent_id, n):
+        self._catch_up()
+        return self.store.top_children(parent_id, n)
+
+    def children_page(self, parent_id, after, limit):
+        self._catch_up()
+        return self.store.children_page(parent_id, after, limit)
+
+    def has_replies(self, comment_id):
+        self._catch_up()
+        return self.store.has_replies(comment_id)
+
+    def comment_ids(self):
+        self._catch_up()
+        return self.store.comment_ids()
+
+    def _saw(self, item_id, score):
+        # This worker's own votes are published by the servicer, changed_scores() needn't repeat them
+        with self._seen_lock:
+            if item_id in self._seen:
+                self._seen[item_id] = score
+
+    def changed_scores(self, item_ids):
+        # (item_id, score) of those of item_ids whose score changed since the last call
+        self._catch_up()
+        with self._seen_lock:
+            changed = []
+            seen = {}
+            for item_id in item_ids:
+                item = self.store.get_post(item_id) or self.store.get_comment(item_id)
+                if item is None:
+                    continue
+                seen[item_id] = item.score
+                if item_id in self._seen and self._seen[item_id] != item.score:
+                    changed.append((item_id, item.score))
+            self._seen = seen  # Items nobody watches anymore are forgotten
+            return changed
+
+    def random_walk(self, rng, item_ids=()):
+        self._catch_up()
+        if self.simulates:
+            self.store.random_walk(rng)
+        return self.changed_scores(item_ids)
@@ -0,0 +1,55 @@
+import threading
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces identical concurrent calls: one runs, the others wait and share its result.
+
+    A call for a key that already has one in flight doesn't run at all, it
+    gets the result (or the exception) of the running one. Calls after that
+    one finishes start a new flight, so nothing is remembered. Counts calls
+    and coalesced ones as <name>_calls and <name>_coalesced in metrics, and
+    their ratio as <name>_coalescing_ratio.
+    """
+
+    def __init__(self, name, metrics=None):
+        self.name = name
+        self.metrics = metrics
+        self._flights = {}  # key -> Flight in progress
+        self._lock = threading.Lock()
+        if metrics is not None:
+            metrics.ratio(f"{name}_coalescing_ratio", f"{name}_coalesced", f"{name}_calls")
+
+    def do(self, key, function):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+        if self.metrics is not None:
+            self.metrics.increment(f"{self.name}_calls")
+            if not leader:
+                self.metrics.increment(f"{self.name}_coalesced")
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = function()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
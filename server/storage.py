@@ -1,34 +1,324 @@
-
-from storage import Database
-
+import os
 import sqlite3
-from datetime import datetime
+import threading
 import proto.reddit_pb2 as reddit_pb2
 import proto.reddit_pb2_grpc as reddit_pb2_grpc
+from ranking import encode_cursor
+from vote_buffer import VoteBuffer
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'database.sql')
+
+# Statements are module constants so every connection's statement cache
+# (sqlite3 caches compiled statements by SQL text) hits after the first call
+POST_COLUMNS = "post_id, title, text, video_url, image_url, author, score, state, publication_date, subreddit_id"
+COMMENT_COLUMNS = "comment_id, author, score, state, publication_date, parent_id, text"
+
+INSERT_POST = f"INSERT INTO posts ({POST_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+SELECT_POST = f"SELECT {POST_COLUMNS} FROM posts WHERE post_id = ?"
+VOTE_POST = f"UPDATE posts SET score = score + ? WHERE post_id = ? RETURNING {POST_COLUMNS}"
+SELECT_POST_IDS = "SELECT post_id FROM posts"
+SELECT_POST_SCORE = "SELECT score FROM posts WHERE post_id = ?"
+ADD_POST_SCORE = "UPDATE posts SET score = score + ? WHERE post_id = ?"
+
+INSERT_COMMENT = f"INSERT INTO comments ({COMMENT_COLUMNS}, post_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+SELECT_COMMENT = f"SELECT {COMMENT_COLUMNS} FROM comments WHERE comment_id = ?"
+SELECT_ROOT_POST = "SELECT post_id FROM comments WHERE comment_id = ?"
+VOTE_COMMENT = f"UPDATE comments SET score = score + ? WHERE comment_id = ? RETURNING {COMMENT_COLUMNS}"
+SELECT_TOP_CHILDREN = f"SELECT {COMMENT_COLUMNS} FROM comments WHERE parent_id = ? ORDER BY score DESC, rowid LIMIT ?"
+SELECT_CHILDREN_FIRST_PAGE = f"SELECT {COMMENT_COLUMNS}, rowid FROM comments WHERE parent_id = ? ORDER BY score DESC, rowid LIMIT ?"
+SELECT_CHILDREN_NEXT_PAGE = (f"SELECT {COMMENT_COLUMNS}, rowid FROM comments WHERE parent_id = ? "
+                             "AND (score < ? OR (score = ? AND rowid > ?)) ORDER BY score DESC, rowid LIMIT ?")
+SELECT_HAS_REPLIES = "SELECT 1 FROM comments WHERE parent_id = ? LIMIT 1"
+SELECT_COMMENT_IDS = "SELECT comment_id FROM comments"
+SELECT_COMMENT_SCORE = "SELECT score FROM comments WHERE comment_id = ?"
+ADD_COMMENT_SCORE = "UPDATE comments SET score = score + ? WHERE comment_id = ?"
+
 
 class Database:
-    def __init__(self, db_path):
-        self.conn = sqlite3.connect(db_path)
-        self.conn.row_factory = sqlite3.Row  # Enables column access by name
+    """SQLite storage backend with the same interface as the in-memory Store.
+
+    The database runs in WAL mode so readers never wait for the writer. Every
+    thread gets its own connection (sqlite3 connections must not be shared
+    between threads) with a large prepared statement cache, and connections
+    are in autocommit mode so a single statement is its own transaction.
+
+    Votes go through a write-behind VoteBuffer unless vote_flush_interval is
+    0: they are summed per item in memory and written in batched
+    transactions, reads overlay the not yet written scores. See VoteBuffer
+    for the durability window.
+    """
+
+    blocking = True  # Calls do disk I/O, the asyncio server runs them off the event loop
+
+    def __init__(self, db_path, cached_statements=256, vote_flush_interval=0.2, vote_flush_size=1000):
+        self.db_path = db_path
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections = []  # Every per-thread connection, so close() can reach them
+        self._connections_lock = threading.Lock()
+        self.ingest_lock = threading.Lock()  # Held by ingests while they check IDs and store a chunk
+        with open(SCHEMA_PATH) as schema:
+            self._connection().executescript(schema.read())
+        self.votes = None
+        self._buffered_children = {}  # parent_id -> IDs of its comments that may have buffered votes
+        self._buffered_parents = {}  # comment_id in _buffered_children -> its parent_id
+        self._buffered_children_lock = threading.Lock()
+        if vote_flush_interval > 0:
+            self.votes = VoteBuffer(self._load_score, self._write_votes, vote_flush_size, vote_flush_interval,
+                                    flushed=self._forget_buffered)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None,
+                                   cached_statements=self.cached_statements, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # Durable at checkpoints, safe against corruption
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    # Write-behind votes
+    def _load_score(self, kind, item_id):
+        query = SELECT_POST_SCORE if kind == 'post' else SELECT_COMMENT_SCORE
+        row = self._connection().execute(query, (item_id,)).fetchone()
+        return row[0] if row else None
+
+    def _write_votes(self, deltas):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(ADD_POST_SCORE, [(delta, item_id) for (kind, item_id), delta in deltas.items()
+                                              if kind == 'post' and delta])
+            conn.executemany(ADD_COMMENT_SCORE, [(delta, item_id) for (kind, item_id), delta in deltas.items()
+                                                 if kind == 'comment' and delta])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _forget_buffered(self, keys):
+        # The buffer wrote these items out, their rows have the scores again
+        with self._buffered_children_lock:
+            for kind, item_id in keys:
+                parent_id = self._buffered_parents.pop(item_id, None) if kind == 'comment' else None
+                if parent_id is None:
+                    continue
+                siblings = self._buffered_children[parent_id]
+                siblings.discard(item_id)
+                if not siblings:
+                    del self._buffered_children[parent_id]
+
+    def _buffered_score(self, kind, item_id):
+        # Score with votes not written yet, None if the row is up to date
+        return self.votes.score(kind, item_id) if self.votes else None
+
+    # Posts
+    def add_post(self, post):
+        media = post.WhichOneof('media')
+        self._connection().execute(INSERT_POST, (
+            post.id, post.title, post.text,
+            post.video_url if media == 'video_url' else None,
+            post.image_url if media == 'image_url' else None,
+            post.author, post.score, post.state, post.publication_date, post.subreddit_id))
+
+    def add_posts(self, posts):
+        # Bulk insert in a single transaction, a failure leaves none of the posts stored
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for post in posts:
+                self.add_post(post)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _select_post(self, post_id):
+        row = self._connection().execute(SELECT_POST, (post_id,)).fetchone()
+        return _post_from_row(row) if row else None
+
+    def get_post(self, post_id):
+        # Read the buffered score before the row: once it has left the buffer the row has it
+        score = self._buffered_score('post', post_id)
+        post = self._select_post(post_id)
+        if post is not None and score is not None:
+            post.score = score
+        return post
+
+    def vote_post(self, post_id, delta):
+        if self.votes is None:
+            row = self._connection().execute(VOTE_POST, (delta, post_id)).fetchone()
+            return _post_from_row(row) if row else None
+        score = self.votes.vote('post', post_id, delta)
+        if score is None:
+            return None
+        post = self._select_post(post_id)
+        post.score = score  # The score this vote produced, storage may not have it yet
+        return post
 
-    def create_post(self, title, text, author, subreddit_id):
-        cursor = self.conn.cursor()
+    def post_ids(self):
+        return [row[0] for row in self._connection().execute(SELECT_POST_IDS)]
+
+    # Comments
+    def add_comment(self, comment):
+        conn = self._connection()
+        # Comments remember the post at the root of their tree, replies inherit it from their parent
+        row = conn.execute(SELECT_ROOT_POST, (comment.parent_id,)).fetchone()
+        post_id = row[0] if row else comment.parent_id
+        conn.execute(INSERT_COMMENT, (
+            comment.comment_id, comment.author, comment.score, comment.state,
+            comment.publication_date, comment.parent_id, comment.text, post_id))
+
+    def add_comments(self, comments):
+        # Bulk insert in a single transaction, replies may follow their parent in the same call.
+        # A failure leaves none of the comments stored.
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
         try:
-            # Current timestamp as publication date
-            publication_date = int(datetime.now().timestamp())
-
-            # Insert post into the database
-            cursor.execute("""
-                INSERT INTO posts (title, text, author, score, state, publication_date, subreddit_id)
-                VALUES (?, ?, ?, 0, ?, ?, ?)
-            """, (title, text, author, reddit_pb2.PostState.POST_NORMAL, publication_date, subreddit_id))
-
-            self.conn.commit()
-            return cursor.lastrowid  # Return the ID of the created post
-        except sqlite3.Error as e:
-            print(f"SQLite error: {e}")
+            for comment in comments:
+                self.add_comment(comment)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _select_comment(self, comment_id):
+        row = self._connection().execute(SELECT_COMMENT, (comment_id,)).fetchone()
+        return _comment_from_row(row) if row else None
+
+    def get_comment(self, comment_id):
+        score = self._buffered_score('comment', comment_id)  # Before the row, see get_post
+        comment = self._select_comment(comment_id)
+        if comment is not None and score is not None:
+            comment.score = score
+        return comment
+
+    def vote_comment(self, comment_id, delta):
+        if self.votes is None:
+            row = self._connection().execute(VOTE_COMMENT, (delta, comment_id)).fetchone()
+            return _comment_from_row(row) if row else None
+        score = self.votes.vote('comment', comment_id, delta)
+        if score is None:
             return None
+        comment = self._select_comment(comment_id)
+        comment.score = score  # The score this vote produced, storage may not have it yet
+        with self._buffered_children_lock:
+            # A flush may already have written this vote out, then there's nothing to remember
+            if self._buffered_score('comment', comment_id) is not None:
+                self._buffered_children.setdefault(comment.parent_id, set()).add(comment_id)
+                self._buffered_parents[comment_id] = comment.parent_id
+        return comment
+
+    def _buffered_children_scores(self, parent_id):
+        # Buffered scores of the parent's comments, forgetting the ones that were written since
+        with self._buffered_children_lock:
+            comment_ids = self._buffered_children.get(parent_id)
+            if not comment_ids:
+                return {}
+            scores = {}
+            for comment_id in list(comment_ids):
+                score = self._buffered_score('comment', comment_id)
+                if score is None:
+                    comment_ids.discard(comment_id)
+                    self._buffered_parents.pop(comment_id, None)
+                else:
+                    scores[comment_id] = score
+            if not comment_ids:
+                del self._buffered_children[parent_id]
+            return scores
+
+    def top_children(self, parent_id, n):
+        n = max(n, 0)
+        scores = self._buffered_children_scores(parent_id)
+        # Up to len(scores) of the rows may move once their buffered votes are
+        # counted, reading that many extra rows keeps the top n exact
+        rows = self._connection().execute(SELECT_TOP_CHILDREN, (parent_id, n + len(scores)))
+        top = [_comment_from_row(row) for row in rows]
+        if not scores:
+            return top[:n]
+        listed = set()
+        for comment in top:
+            listed.add(comment.comment_id)
+            if comment.comment_id in scores:
+                comment.score = scores[comment.comment_id]
+        # Buffered comments that rank too low in the table to be among the rows read
+        for comment_id, score in scores.items():
+            if comment_id not in listed:
+                comment = self._select_comment(comment_id)
+                comment.score = score
+                top.append(comment)
+        top.sort(key=lambda comment: comment.score, reverse=True)  # Stable, ties stay in table order
+        return top[:n]
+
+    def children_page(self, parent_id, after, limit):
+        # Keyset pagination over the (parent_id, score) index, the cursor
+        # tie-break is the rowid. Pages are ranked by the stored scores, so
+        # buffered votes on this parent's comments are written out first.
+        if self._buffered_children_scores(parent_id):
+            self.votes.flush()
+        if after is None:
+            rows = self._connection().execute(SELECT_CHILDREN_FIRST_PAGE, (parent_id, limit + 1)).fetchall()
+        else:
+            score, rowid = after
+            rows = self._connection().execute(SELECT_CHILDREN_NEXT_PAGE, (parent_id, score, score, rowid, limit + 1)).fetchall()
+        comments = []
+        for row in rows[:limit]:
+            comment = _comment_from_row(row[:-1])
+            score = self._buffered_score('comment', comment.comment_id)
+            if score is not None:
+                comment.score = score
+            comments.append(comment)
+        if len(rows) <= limit:
+            return comments, ""
+        last = rows[limit - 1]
+        return comments, encode_cursor(last[2], last[-1])  # Stored score and rowid of the last row
+
+    def has_replies(self, comment_id):
+        return self._connection().execute(SELECT_HAS_REPLIES, (comment_id,)).fetchone() is not None
+
+    def comment_ids(self):
+        return [row[0] for row in self._connection().execute(SELECT_COMMENT_IDS)]
+
+    def random_walk(self, rng, item_ids=()):
+        # Score simulator step, same contract as Store.random_walk. The deltas
+        # are drawn in one go, but each row still takes its own vote.
+        watched = set(item_ids)
+        changed = []
+        for item_ids, vote in ((self.post_ids(), self.vote_post), (self.comment_ids(), self.vote_comment)):
+            deltas = rng.integers(-1, 2, size=len(item_ids))
+            for item_id, delta in zip(item_ids, deltas.tolist()):
+                if not delta:
+                    continue
+                item = vote(item_id, delta)
+                if item is not None and item_id in watched:
+                    changed.append((item_id, item.score))
+        return changed
 
     def close(self):
-        self.conn.close()
+        if self.votes is not None:
+            self.votes.close()  # Write out the buffered votes before the connections go away
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def _post_from_row(row):
+    post_id, title, text, video_url, image_url, author, score, state, publication_date, subreddit_id = row
+    post = reddit_pb2.Post(id=post_id, title=title, text=text, author=author, score=score,
+                           state=state, publication_date=publication_date, subreddit_id=subreddit_id)
+    if video_url is not None:
+        post.video_url = video_url
+    elif image_url is not None:
+        post.image_url = image_url
+    return post
+
 
+def _comment_from_row(row):
+    comment_id, author, score, state, publication_date, parent_id, text = row
+    return reddit_pb2.Comment(comment_id=comment_id, author=author, score=score, state=state,
+                              publication_date=publication_date, parent_id=parent_id, text=text)
@@ -0,0 +1,258 @@
+import threading
+
+import numpy as np
+
+from ids import to_key, to_wire
+from ranking import RankedChildren, encode_cursor, rank, rank_after
+from records import CommentRecord, PostRecord
+from score_table import ScoreTable
+
+RANKED_CHILDREN = 64  # Parents with more children than this keep them in score order
+
+
+def group_by_parent(comments):
+    # parent_id -> its comments, parents in order of first appearance
+    by_parent = {}
+    for comment in comments:
+        by_parent.setdefault(comment.parent_id, []).append(comment)
+    return by_parent
+
+
+class Store:
+    """In-memory posts, comments and the parent -> children index.
+
+    Safe to share between the gRPC worker threads and the score simulator.
+    Scores aren't kept on the messages but in two ScoreTables, dense NumPy
+    arrays indexed by an internal integer slot: a vote is a locked add on one
+    element and a simulator tick moves every score in one vectorized step.
+    The children index is a list of slots per parent in creation order.
+    Most parents have a handful of children, their top N and pages are
+    selected from the children's scores when they are read. A parent with
+    more than RANKED_CHILDREN also gets a RankedChildren (see ranking.py)
+    the first time it is read: its children kept in score order, which a
+    vote on one of them updates, so reads are a slice of it rather than a
+    selection over every child. On shared score tables, which other
+    processes vote on, it only caches the children's slot array.
+
+    Posts and comments are kept as compact __slots__ records (see records.py)
+    rather than protobuf messages, keyed by the integer form of their IDs
+    (see ids.py), with interned authors and parent keys shared with the
+    parent; messages are only built for what a call returns. Children lists are
+    appended to under a lock striped by parent ID.
+
+    attach() puts a mapped snapshot (see mapped_snapshot.py) under an empty
+    Store: its items are read from the file when they are asked for, and
+    everything added afterwards is kept in memory as usual.
+    """
+
+    blocking = False  # Calls never block, the asyncio server runs them inline
+
+    def __init__(self, num_stripes=64):
+        self.post_scores = ScoreTable()  # Also holds the PostRecords, by slot
+        self.comment_scores = ScoreTable()  # Also holds the CommentRecords, by slot
+        self.children = {}  # parent key -> list of its comments' slots in creation order
+        self.ranked = {}  # parent key -> RankedChildren, for parents with more than RANKED_CHILDREN children
+        self.base = None  # MappedSnapshot the first slots of both tables come from
+        self._index_locks = [threading.Lock() for _ in range(num_stripes)]
+        self.ingest_lock = threading.Lock()  # Held by ingests while they check IDs and store a chunk
+
+    def attach(self, snapshot):
+        if self.base is not None or len(self.post_scores) or len(self.comment_scores):
+            raise ValueError("A snapshot can only be attached to an empty store")
+        self.base = snapshot
+        self.post_scores = ScoreTable(base=snapshot.posts)
+        self.comment_scores = ScoreTable(base=snapshot.comments)
+
+    def _index_lock(self, parent_key):
+        return self._index_locks[hash(parent_key) % len(self._index_locks)]
+
+    # Posts
+    def add_post(self, post):
+        self.post_scores.add(to_key(post.id), post.score, PostRecord(post))
+
+    def add_posts(self, posts):
+        self.post_scores.add_many((to_key(post.id), post.score, PostRecord(post)) for post in posts)
+
+    def _parent_key(self, parent_id):
+        # The key a known post or comment is stored under, so its replies share it instead of holding a copy
+        key = to_key(parent_id)
+        for table in (self.post_scores, self.comment_scores):
+            slot = table.slot(key)
+            if slot is not None:
+                return table.item_id(slot)
+        return key
+
+    def get_post(self, post_id):
+        slot = self.post_scores.slot(to_key(post_id))
+        if slot is None:
+            return None
+        return self.post_scores.record(slot).to_message(post_id, self.post_scores.score(slot))
+
+    def vote_post(self, post_id, delta):
+        # Returns the post as of this vote, or None if it doesn't exist
+        slot = self.post_scores.slot(to_key(post_id))
+        if slot is None:
+            return None
+        return self.post_scores.record(slot).to_message(post_id, self.post_scores.vote(slot, delta))
+
+    def post_ids(self):
+        return [to_wire(key) for key in self.post_scores.keys()]
+
+    # Comments
+    def add_comment(self, comment):
+        record = CommentRecord(comment, self._parent_key(comment.parent_id))
+        with self._index_lock(record.parent_key):
+            slot = self.comment_scores.add(to_key(comment.comment_id), comment.score, record)
+            self.children.setdefault(record.parent_key, []).append(slot)
+            ranked = self.ranked.get(record.parent_key)
+            if ranked is not None:
+                ranked.add(slot, comment.score)
+
+    def add_comments(self, comments):
+        # Bulk version of add_comment, each parent's index lock is taken once per call.
+        # Slots are given in the order of group_by_parent(comments).
+        for parent_id, siblings in group_by_parent(comments).items():
+            # Looked up only now, parents in earlier groups of this batch are stored by this point
+            parent_key = self._parent_key(parent_id)
+            siblings = [(to_key(comment.comment_id), comment.score, CommentRecord(comment, parent_key)) for comment in siblings]
+            with self._index_lock(parent_key):
+                slots = self.comment_scores.add_many(siblings)
+                self.children.setdefault(parent_key, []).extend(slots)
+                ranked = self.ranked.get(parent_key)
+                if ranked is not None:
+                    for slot, (_, score, _) in zip(slots, siblings):
+                        ranked.add(slot, score)
+
+    def get_comment(self, comment_id):
+        slot = self.comment_scores.slot(to_key(comment_id))
+        if slot is None:
+            return None
+        return self._comment_at(slot, self.comment_scores.score(slot))
+
+    def vote_comment(self, comment_id, delta):
+        # Returns the comment as of this vote, or None if it doesn't exist
+        slot = self.comment_scores.slot(to_key(comment_id))
+        if slot is None:
+            return None
+        score = self.comment_scores.vote(slot, delta)
+        # Looked up after the vote: a RankedChildren published since sorted by a score that includes it
+        parent_key = self.comment_scores.record(slot).parent_key if self.ranked else None
+        ranked = self.ranked.get(parent_key)
+        if ranked is not None:
+            with self._index_lock(parent_key):
+                ranked.update(slot, self.comment_scores.score(slot))  # Latest score, votes may land in any order
+        return self._comment_at(slot, score)
+
+    def _children(self, parent_key):
+        # Slots of the comments directly under a parent in creation order (positions are indexes
+        # into it), or its RankedChildren; None if it has no children
+        ranked = self.ranked.get(parent_key)
+        if ranked is not None:
+            return ranked
+        own = self.children.get(parent_key)
+        base_slots = self.base.children(parent_key) if self.base is not None else None
+        if own is None and base_slots is None:
+            return None
+        slots = base_slots  # The snapshot's children are older than any added since
+        with self._index_lock(parent_key):
+            ranked = self.ranked.get(parent_key)
+            if ranked is not None:
+                return ranked
+            if own is not None:
+                # A plain list per parent is much smaller than an array, most parents have one or two replies
+                slots = np.array(own, dtype=np.int64)
+                if base_slots is not None:
+                    slots = np.concatenate([base_slots, slots])
+            if len(slots) > RANKED_CHILDREN:
+                # Published before it is sorted, so a vote either sees it or comes before the sort
+                ranked = self.ranked[parent_key] = RankedChildren(slots)
+                return ranked
+        return slots
+
+    def _ranked_read(self, parent_key, ranked, read):
+        # read(ranked) once it is sorted by the current scores, under the parent's index lock.
+        # None on shared score tables, whose order can't be kept: other processes vote on them.
+        if self.comment_scores.shared:
+            return None
+        with self._index_lock(parent_key):
+            ranked.ensure_order(self.comment_scores)
+            return read(ranked)
+
+    def _comment_at(self, slot, score):
+        return self.comment_scores.record(slot).to_message(to_wire(self.comment_scores.item_id(slot)), int(score))
+
+    def top_children(self, parent_id, n):
+        # Top n comments directly under a post or comment, in score order
+        parent_key = to_key(parent_id)
+        slots = self._children(parent_key)
+        if isinstance(slots, RankedChildren):
+            top = self._ranked_read(parent_key, slots, lambda ranked: ranked.top(n))
+            if top is not None:
+                return [self._comment_at(slot, score) for slot, score in top]
+            slots = slots.view()
+        if slots is None:
+            return []
+        scores = self.comment_scores.take(slots)
+        return [self._comment_at(slots[i], scores[i]) for i in rank(scores, n)]
+
+    def children_page(self, parent_id, after, limit):
+        # Page of comments under a parent in score order, after is a decoded cursor or None.
+        # Returns (comments, next_cursor), next_cursor is empty on the last page.
+        parent_key = to_key(parent_id)
+        slots = self._children(parent_key)
+        if isinstance(slots, RankedChildren):
+            page = self._ranked_read(parent_key, slots, lambda ranked: ranked.page(after, limit + 1))
+            if page is not None:
+                comments = [self._comment_at(slot, score) for slot, score, _ in page[:limit]]
+                if len(page) <= limit:
+                    return comments, ""
+                _, score, position = page[limit - 1]
+                return comments, encode_cursor(score, position)
+            slots = slots.view()
+        if slots is None:
+            return [], ""
+        scores = self.comment_scores.take(slots)
+        positions = rank_after(scores, after, limit + 1)  # One extra tells whether another page follows
+        comments = [self._comment_at(slots[i], scores[i]) for i in positions[:limit]]
+        if len(positions) <= limit:
+            return comments, ""
+        last = positions[limit - 1]
+        return comments, encode_cursor(int(scores[last]), int(last))
+
+    def has_replies(self, comment_id):
+        key = to_key(comment_id)
+        return key in self.children or (self.base is not None and self.base.children(key) is not None)
+
+    def comment_ids(self):
+        return [to_wire(key) for key in self.comment_scores.keys()]
+
+    def snapshot(self, copy=True):
+        # Every post, then every comment, as messages with their score at the
+        # time of the call, parents before their replies. Only the scores are
+        # copied up front (records and IDs never change once added), so with
+        # writes paused this call is quick and the messages can be generated
+        # afterwards while writes go on. copy=False reads the live scores
+        # without taking locks, for a forked child whose memory nobody writes.
+        tables = [(table, table.copy_scores() if copy else table.live_scores())
+                  for table in (self.post_scores, self.comment_scores)]
+
+        def messages():
+            for table, scores in tables:
+                for slot, score in enumerate(scores.tolist()):
+                    yield table.record(slot).to_message(to_wire(table.item_id(slot)), score)
+        return messages()
+
+    def random_walk(self, rng, item_ids=()):
+        # Score simulator step: every post and comment score moves by a random
+        # -1, 0 or +1, one vectorized operation per table. Returns the new
+        # (item_id, score) of those of item_ids whose score changed.
+        tables = [self.post_scores, self.comment_scores]
+        deltas = [table.random_walk(rng) for table in tables]
+        changed = []
+        for item_id in item_ids:
+            for table, table_deltas in zip(tables, deltas):
+                slot = table.slot(to_key(item_id))
+                if slot is not None and slot < len(table_deltas) and table_deltas[slot]:
+                    changed.append((item_id, table.score(slot)))
+        return changed
+
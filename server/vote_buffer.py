@@ -0,0 +1,109 @@
+import logging
+import threading
+
+
+class VoteBuffer:
+    """Write-behind buffer for score deltas.
+
+    Votes are applied to an in-memory score and coalesced per item, a
+    background thread writes the summed deltas in one batch when either
+    max_pending items are waiting or flush_interval seconds have passed.
+    Items are keyed by (kind, item_id), kind being 'post' or 'comment'.
+
+    While an item has unflushed votes its in-memory score is the source of
+    truth, once its votes are written it is dropped and the next vote loads
+    it from storage again (outside the lock, so voters on other items don't
+    wait for that read); flushed(keys) is told which items were dropped. Each flush is a single transaction, so after a
+    crash storage holds every vote up to the last flush and nothing partial;
+    at most flush_interval seconds (or max_pending items) of votes are lost.
+    close() flushes whatever is left on a clean shutdown.
+    """
+
+    def __init__(self, load_score, write_batch, max_pending=1000, flush_interval=0.2, flushed=None):
+        self.load_score = load_score  # (kind, item_id) -> score in storage, or None if missing
+        self.write_batch = write_batch  # {(kind, item_id): delta} -> applies it in one transaction
+        self.flushed = flushed  # Called with the keys a flush dropped from the buffer
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self._scores = {}  # (kind, item_id) -> current score of items with unflushed votes
+        self._pending = {}  # (kind, item_id) -> summed delta not yet handed to a flush
+        self._flushes = 0  # Flushes that dropped items, a score loaded before one may be stale
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()  # One flush at a time, in order
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def vote(self, kind, item_id, delta):
+        # Returns the item's score after this vote, or None if it doesn't exist
+        key = (kind, item_id)
+        while True:
+            with self._lock:
+                if key in self._scores:
+                    return self._apply(key, delta)
+                flushes = self._flushes
+            stored = self.load_score(kind, item_id)
+            if stored is None:
+                return None
+            with self._lock:
+                if key in self._scores or self._flushes == flushes:
+                    self._scores.setdefault(key, stored)  # Another voter may have loaded it first
+                    return self._apply(key, delta)
+            # A flush dropped items since the load, storage may have moved past it: load again
+
+    def _apply(self, key, delta):
+        # Called with self._lock held and the item in self._scores
+        score = self._scores[key] + delta
+        self._scores[key] = score
+        self._pending[key] = self._pending.get(key, 0) + delta
+        if len(self._pending) >= self.max_pending:
+            self._wakeup.notify()
+        return score
+
+    def score(self, kind, item_id):
+        # In-memory score if the item has unflushed votes, None if storage is up to date
+        with self._lock:
+            return self._scores.get((kind, item_id))
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return
+            try:
+                self.write_batch(batch)
+            except Exception:
+                with self._lock:
+                    # Nothing was written, keep the deltas for the next flush
+                    for key, delta in batch.items():
+                        self._pending[key] = self._pending.get(key, 0) + delta
+                raise
+            with self._lock:
+                # Storage has caught up with these items unless they were voted on again meanwhile
+                dropped = [key for key in batch if key not in self._pending]
+                for key in dropped:
+                    del self._scores[key]
+                self._flushes += 1
+            if self.flushed is not None and dropped:
+                self.flushed(dropped)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                self._wakeup.wait_for(lambda: self._closed or len(self._pending) >= self.max_pending,
+                                      self.flush_interval)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Failed to flush votes: {e}")
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        self._thread.join()
+        self.flush()
@@ -0,0 +1,87 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from async_reddit_client import AsyncRedditClient, fan_out
+
+
+def test_fan_out_bounds_calls_in_flight():
+    in_flight, most = 0, 0
+
+    async def call(i):
+        nonlocal in_flight, most
+        in_flight += 1
+        most = max(most, in_flight)
+        await asyncio.sleep(0.001 * (i % 3))
+        in_flight -= 1
+        if i == 7:
+            raise ValueError(i)
+        return i * i
+
+    calls = [lambda i=i: call(i) for i in range(50)]
+    results = asyncio.run(fan_out(calls, limit=5, return_exceptions=True))
+    assert most == 5
+    assert isinstance(results[7], ValueError)
+    assert results[:7] + results[8:] == [i * i for i in range(50) if i != 7]
+    with pytest.raises(ValueError):
+        asyncio.run(fan_out(calls, limit=5))
+    assert asyncio.run(fan_out([], limit=5)) == []
+    with pytest.raises(ValueError):
+        asyncio.run(fan_out(calls, limit=0))
+
+
+def test_async_client_calls():
+    async def run():
+        async with AsyncRedditClient("localhost", 50051) as client:
+            post = await client.create_post("Async Post", "Text", 1)
+            await client.upvote_post(post.id)
+            assert (await client.retrieve_post_content(post.id)).score == 1
+
+            comments = await client.create_comments([("user1", post.id, f"Comment {i}") for i in range(10)], limit=4)
+            assert [comment.text for comment in comments] == [f"Comment {i}" for i in range(10)]
+            await client.vote_comments([(comments[3].comment_id, True), (comments[3].comment_id, True),
+                                        (comments[5].comment_id, False)])
+            reply = await client.create_comment("user2", comments[3].comment_id, "Reply")
+            assert (await client.retrieve_and_expand(post.id)).comment_id == reply.comment_id
+
+            posts = await client.retrieve_posts([post.id, "missing", post.id], return_exceptions=True)
+            assert posts[0].id == posts[2].id == post.id and not posts[1].id
+            top = await client.retrieve_top_n_comments(post.id, 1)
+            assert top.comments[0].comment_id == comments[3].comment_id
+
+            chunks = [chunk async for chunk in client.stream_comments(post.id, chunk_size=4)]
+            assert sum(len(chunk.comments) for chunk in chunks) == 10
+            pages = [page async for page in client.iter_comment_pages(post.id, 3)]
+            assert [comment.comment_id for page in pages for comment in page.comments][-1] == comments[5].comment_id
+
+            async def archive():
+                for i in range(3):
+                    yield {"id": f"{post.id}-async-{i}", "title": f"Archived {i}"}
+            summary = await client.ingest_posts(archive())
+            assert summary.count == 3
+    asyncio.run(run())
+
+
+def test_async_monitor_updates():
+    async def run():
+        async with AsyncRedditClient("localhost", 50051) as client:
+            post = await client.create_post("Watched Post", "Text", 1)
+            comment = await client.create_comment("user1", post.id, "Watched Comment")
+            updates = client.monitor_updates(post.id, [comment.comment_id])
+            current = [await anext(updates), await anext(updates)]  # Current scores come first
+            assert {update.item_id for update in current} == {post.id, comment.comment_id}
+
+            voted = await client.upvote_comment(comment.comment_id)
+
+            async def vote_update():
+                # A score simulator tick may publish something first
+                async for update in updates:
+                    if (update.item_id, update.new_score) == (comment.comment_id, voted.score):
+                        return update
+            assert await asyncio.wait_for(vote_update(), timeout=5)
+            await updates.aclose()  # Cancels the stream
+    asyncio.run(run())
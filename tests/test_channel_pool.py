@@ -0,0 +1,136 @@
+import os
+import sys
+import threading
+
+import grpc
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from channel_pool import ChannelPool
+from reddit_client import RedditClient
+
+
+class Unavailable(grpc.RpcError):
+    def code(self):
+        return grpc.StatusCode.UNAVAILABLE
+
+
+class NotFound(grpc.RpcError):
+    def code(self):
+        return grpc.StatusCode.NOT_FOUND
+
+
+class FakeStub:
+    # Answers with the address its channel was opened to, fails while that address is in `down`
+    down = set()
+
+    def __init__(self, channel):
+        self.address = channel._channel.target().decode()
+
+    def Call(self, request):
+        if self.address in FakeStub.down:
+            raise Unavailable()
+        return self.address
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def addresses():
+    FakeStub.down = set()
+    return ["localhost:1", "localhost:2"]
+
+
+def test_round_robin_uses_every_channel(addresses):
+    pool = ChannelPool(addresses, channels_per_endpoint=2, stub_class=FakeStub)
+    picked = [pool.acquire() for _ in range(8)]
+    assert {id(member) for member in picked} == {id(member) for member in pool.members}
+    assert [pool.stub.Call(None) for _ in range(4)].count("localhost:1") == 2
+    pool.close()
+
+
+def test_least_outstanding_picks_the_idle_channel(addresses):
+    pool = ChannelPool(addresses, channels_per_endpoint=2, policy='least_outstanding', stub_class=FakeStub)
+    busy = [pool.acquire() for _ in range(3)]  # Calls still in flight
+    idle = pool.acquire()
+    assert idle not in busy
+    pool.release(busy[0])
+    assert pool.acquire() is busy[0]
+    with pytest.raises(ValueError):
+        ChannelPool(addresses, policy='random')
+    pool.close()
+
+
+def test_failing_endpoint_is_ejected_and_retried(addresses):
+    clock = Clock()
+    pool = ChannelPool(addresses, eject_after=3, ejection_seconds=10, stub_class=FakeStub, clock=clock)
+    FakeStub.down = {"localhost:2"}
+    failures = 0
+    for _ in range(10):
+        try:
+            assert pool.stub.Call(None) == "localhost:1"
+        except Unavailable:
+            failures += 1
+    assert failures == 3 and pool.healthy_endpoints() == ["localhost:1"]
+
+    clock.now = 11  # Ejection over, the endpoint gets calls again
+    FakeStub.down = set()
+    assert {pool.stub.Call(None) for _ in range(4)} == set(addresses)
+
+    # Only UNAVAILABLE counts against an endpoint, and every endpoint being out still leaves calls somewhere
+    pool.release(pool.acquire(), NotFound())
+    assert pool.healthy_endpoints() == addresses
+    FakeStub.down = set(addresses)
+    for _ in range(6):
+        with pytest.raises(Unavailable):
+            pool.stub.Call(None)
+    assert pool.healthy_endpoints() == []
+    FakeStub.down = set()
+    assert pool.stub.Call(None) in addresses
+    assert all(member.outstanding == 0 for member in pool.members)
+    pool.close()
+
+
+def test_client_balances_over_endpoints():
+    # Second endpoint has no server behind it, it gets ejected and calls keep working
+    client = RedditClient(endpoints=["localhost:50051", "localhost:1"], channels_per_endpoint=2,
+                          policy='least_outstanding')
+    post = None
+    for _ in range(10):
+        try:
+            post = client.create_post("Balanced Post", "Text", 1)
+        except grpc.RpcError as e:
+            assert e.code() == grpc.StatusCode.UNAVAILABLE
+    assert client.channel.healthy_endpoints() == ["localhost:50051"]
+    assert client.upvote_post(post.id).score == 1
+
+    # Streams are counted until they end
+    comment = client.create_comment("user1", post.id, "Comment")
+    assert [chunk.comments[0].comment_id for chunk in client.stream_comments(post.id)] == [comment.comment_id]
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.retrieve_post_content(post.id).id)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [post.id] * 8
+    assert all(member.outstanding == 0 for member in client.channel.members)
+    client.close()
+
+    # A shard can be a list of replicas, batches go out as futures on its pool
+    sharded = RedditClient(shards=[["localhost:1", "localhost:50051"]], eject_after=1)
+    for _ in range(2):
+        try:
+            results = sharded.batch_get_posts([post.id]).results
+        except grpc.RpcError as e:
+            assert e.code() == grpc.StatusCode.UNAVAILABLE
+    assert results[0].post.id == post.id
+    assert sharded.channels[0].healthy_endpoints() == ["localhost:50051"]
+    sharded.close()
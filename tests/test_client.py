@@ -8,6 +8,7 @@ import pytest
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'client'))
 
 from reddit_client import RedditClient
+from proto import reddit_pb2
 
 @pytest.fixture
 def reddit_client():
@@ -62,6 +63,16 @@ def test_create_post():
     assert response.title == "Test Post"
     assert response.text == "This is a test"
     assert response.subreddit_id == 1
+
+
+def test_ids_are_time_ordered():
+    reddit_client = RedditClient("localhost", 50051)
+    post1 = reddit_client.create_post(title="Test Post 1", text="This is a test", subreddit_id=1)
+    post2 = reddit_client.create_post(title="Test Post 2", text="This is a test", subreddit_id=1)
+    comment = reddit_client.create_comment("user1", post2.id, "Test Comment")
+    # 64-bit integer IDs as decimal strings, newer items have bigger IDs
+    assert int(post1.id) < int(post2.id) < int(comment.comment_id) < 1 << 63
+    assert reddit_client.retrieve_post_content(post2.id).id == post2.id
     
 def test_upvote_post():
     #mock_reddit_client.upvote_post.return_value = MagicMock(score=1)
@@ -143,8 +154,25 @@ def test_retrieve_top_n_comments():
     assert len(response.comments) == 2
     assert response.comments[0].comment_id == comment1.comment_id
     assert response.comments[1].comment_id == comment3.comment_id
-    
-    
+
+
+def test_retrieve_top_n_comments_has_replies():
+    reddit_client = RedditClient("localhost", 50051)
+    post = reddit_client.create_post(title="Test Post", text="This is a test", subreddit_id=1)
+
+    # Comment 1 gets a reply and the higher score, comment 2 stays without replies
+    comment1 = reddit_client.create_comment("user1", post.id, "Test Comment 1")
+    reddit_client.upvote_comment(comment1.comment_id) # Score = 1
+    comment2 = reddit_client.create_comment("user2", post.id, "Test Comment 2")
+    reddit_client.create_comment("user3", comment1.comment_id, "Test Reply 1")
+
+    response = reddit_client.retrieve_top_n_comments(post.id, 2)
+    assert len(response.comments) == 2 # Reply is not counted as a top level comment
+    assert response.comments[0].comment_id == comment1.comment_id
+    assert response.comments[1].comment_id == comment2.comment_id
+    assert list(response.has_replies) == [True, False]
+
+
 def test_expand_comment_branch():
     # mock_reply = MagicMock(comment_id="3", author="user3", text="Test Reply", score=4)
     
@@ -186,6 +214,200 @@ def test_expand_comment_branch():
     assert response.comments[1].comment_id == comment3.comment_id # As score is higher, comment pushed to top
     assert response.comments[2].comment_id == comment2.comment_id # As score is low, comment pushed to bottom
 
+def test_batch_get_posts():
+    reddit_client = RedditClient("localhost", 50051)
+    post1 = reddit_client.create_post(title="Test Post 1", text="This is a test", subreddit_id=1)
+    post2 = reddit_client.create_post(title="Test Post 2", text="This is a test", subreddit_id=1)
+
+    response = reddit_client.batch_get_posts([post2.id, "missing", post1.id])
+    assert [result.status for result in response.results] == [reddit_pb2.ITEM_OK, reddit_pb2.ITEM_NOT_FOUND, reddit_pb2.ITEM_OK]
+    assert response.results[0].post.title == "Test Post 2"
+    assert response.results[2].post.title == "Test Post 1"
+
+
+def test_batch_vote():
+    reddit_client = RedditClient("localhost", 50051)
+    post = reddit_client.create_post(title="Test Post", text="This is a test", subreddit_id=1)
+    comment = reddit_client.create_comment("user1", post.id, "Test Comment")
+
+    response = reddit_client.batch_vote([(post.id, True), (comment.comment_id, False), (post.id, True), ("missing", True)])
+    assert [result.status for result in response.results] == [reddit_pb2.ITEM_OK] * 3 + [reddit_pb2.ITEM_NOT_FOUND]
+    assert [result.new_score for result in response.results[:3]] == [1, -1, 2]
+    assert reddit_client.retrieve_post_content(post.id).score == 2
+
+
+def test_batch_create_comments():
+    reddit_client = RedditClient("localhost", 50051)
+    post = reddit_client.create_post(title="Test Post", text="This is a test", subreddit_id=1)
+
+    response = reddit_client.batch_create_comments([("user1", post.id, "Comment 1"), ("user2", post.id, "Comment 2")])
+    assert all(result.status == reddit_pb2.ITEM_OK for result in response.results)
+    assert [result.comment.text for result in response.results] == ["Comment 1", "Comment 2"]
+
+    top = reddit_client.retrieve_top_n_comments(post.id, 5)
+    assert [comment.comment_id for comment in top.comments] == [result.comment.comment_id for result in response.results]
+
+
+def test_ingest_posts_and_comments():
+    reddit_client = RedditClient("localhost", 50051)
+
+    # Generators are streamed as they are consumed
+    summary = reddit_client.ingest_posts({"title": f"Archived Post {i}", "text": "Archive", "subreddit_id": 1} for i in range(2500))
+    assert summary.count == 2500
+    assert len(set(summary.ids)) == 2500
+    assert reddit_client.retrieve_post_content(summary.ids[1234]).title == "Archived Post 1234"
+
+    post_id = summary.ids[0]
+    comments = [
+        reddit_pb2.Comment(comment_id=f"{post_id}-c1", author="user1", parent_id=post_id, text="Archived 1", score=3),
+        reddit_pb2.Comment(comment_id=f"{post_id}-c2", author="user2", parent_id=post_id, text="Archived 2", score=7),
+        {"author": "user3", "parent_id": f"{post_id}-c1", "text": "Archived reply"},
+    ]
+    summary = reddit_client.ingest_comments(iter(comments))
+    assert summary.count == 3
+    assert list(summary.ids[:2]) == [f"{post_id}-c1", f"{post_id}-c2"]  # Archive IDs are kept
+
+    response = reddit_client.retrieve_top_n_comments(post_id, 2)
+    assert [comment.comment_id for comment in response.comments] == [f"{post_id}-c2", f"{post_id}-c1"]
+    assert list(response.has_replies) == [False, True]
+
+
+def test_ingest_rejects_duplicate_ids():
+    reddit_client = RedditClient("localhost", 50051)
+    post = reddit_client.create_post(title="Test Post", text="This is a test", subreddit_id=1)
+    archive = f"{post.id}-archive"
+    summary = reddit_client.ingest_posts([{"id": post.id}, {"id": archive, "title": "Archived"},
+                                          {"id": archive, "title": "Again"}, {"title": "New ID"}])
+    assert summary.count == 2 and summary.ids[0] == archive
+    assert [(r.index, r.id, r.status) for r in summary.rejected] == [
+        (0, post.id, reddit_pb2.ITEM_DUPLICATE), (2, archive, reddit_pb2.ITEM_DUPLICATE)]
+    assert reddit_client.retrieve_post_content(archive).title == "Archived"
+    assert reddit_client.retrieve_post_content(post.id).title == "Test Post"
+
+    # Comments can't take a post's ID either, nor one earlier in the stream
+    summary = reddit_client.ingest_comments([
+        {"comment_id": archive, "parent_id": post.id, "text": "Clash"},
+        {"comment_id": f"{archive}-c", "parent_id": post.id, "text": "First"},
+        {"comment_id": f"{archive}-c", "parent_id": post.id, "text": "Second"}])
+    assert list(summary.ids) == [f"{archive}-c"] and [r.index for r in summary.rejected] == [0, 2]
+    comments = reddit_client.retrieve_top_n_comments(post.id, 5).comments
+    assert [(comment.comment_id, comment.text) for comment in comments] == [(f"{archive}-c", "First")]
+
+
+def create_scored_comments(reddit_client, count):
+    # Comments with the scores 0 .. count - 1 under a new post, returns the post and IDs ordered by score
+    post = reddit_client.create_post(title="Test Post", text="This is a test", subreddit_id=1)
+    comments = reddit_client.batch_create_comments([("user1", post.id, f"Comment {i}") for i in range(count)])
+    comment_ids = [result.comment.comment_id for result in comments.results]
+    reddit_client.batch_vote([(comment_id, True) for i, comment_id in enumerate(comment_ids) for _ in range(i)])
+    return post, list(reversed(comment_ids))
+
+
+def test_retrieve_comments_page():
+    reddit_client = RedditClient("localhost", 50051)
+    post, ranked_ids = create_scored_comments(reddit_client, 7)
+
+    first = reddit_client.retrieve_comments_page(post.id, 3)
+    assert [comment.comment_id for comment in first.comments] == ranked_ids[:3]
+    assert first.next_cursor
+
+    pages = list(reddit_client.iter_comment_pages(post.id, 3))
+    assert [len(page.comments) for page in pages] == [3, 3, 1]
+    assert [comment.comment_id for page in pages for comment in page.comments] == ranked_ids
+    assert pages[-1].next_cursor == ""
+
+
+def test_retrieve_comments_page_invalid_cursor():
+    reddit_client = RedditClient("localhost", 50051)
+    with pytest.raises(grpc.RpcError) as error:
+        reddit_client.retrieve_comments_page("any", 3, "not-a-cursor")
+    assert error.value.code() == grpc.StatusCode.INVALID_ARGUMENT
+
+
+def test_stream_comments():
+    reddit_client = RedditClient("localhost", 50051)
+    post, ranked_ids = create_scored_comments(reddit_client, 7)
+
+    chunks = list(reddit_client.stream_comments(post.id, chunk_size=2))
+    assert [len(chunk.comments) for chunk in chunks] == [2, 2, 2, 1]
+    assert [comment.comment_id for chunk in chunks for comment in chunk.comments] == ranked_ids
+
+    chunks = list(reddit_client.stream_comments(post.id, n=5, chunk_size=2))
+    assert [comment.comment_id for chunk in chunks for comment in chunk.comments] == ranked_ids[:5]
+
+    # The cursor of the last chunk resumes where the stream stopped
+    rest = reddit_client.retrieve_comments_page(post.id, 10, chunks[-1].next_cursor)
+    assert [comment.comment_id for comment in rest.comments] == ranked_ids[5:]
+
+
+def test_expand_comment_tree():
+    reddit_client = RedditClient("localhost", 50051)
+    post, ranked_ids = create_scored_comments(reddit_client, 3)
+    top_id = ranked_ids[0]
+    replies = reddit_client.batch_create_comments([("user2", top_id, f"Reply {i}") for i in range(3)])
+    reply_ids = [result.comment.comment_id for result in replies.results]
+    reddit_client.upvote_comment(reply_ids[2])
+    reddit_client.create_comment("user3", reply_ids[2], "Nested Reply")
+
+    response = reddit_client.expand_comment_tree(post.id, depth=2, breadth=2)
+    assert not response.HasField("root")  # Expanded from a post
+    assert [node.comment.comment_id for node in response.replies] == ranked_ids[:2]
+    assert response.has_more_replies  # Third comment is beyond the breadth
+    assert [node.comment.comment_id for node in response.replies[0].replies] == [reply_ids[2], reply_ids[0]]
+    assert response.replies[0].has_more_replies
+    assert response.replies[0].replies[0].has_more_replies  # Nested reply is below the depth
+    assert not response.replies[0].replies[1].has_more_replies
+    assert not response.truncated
+
+    response = reddit_client.expand_comment_tree(top_id, depth=3, breadth=5)
+    assert response.root.comment_id == top_id
+    assert [node.comment.comment_id for node in response.replies] == [reply_ids[2], reply_ids[0], reply_ids[1]]
+    assert response.replies[0].replies[0].comment.text == "Nested Reply"
+
+
+def test_expand_comment_tree_budget():
+    reddit_client = RedditClient("localhost", 50051)
+    post, ranked_ids = create_scored_comments(reddit_client, 3)
+    reddit_client.create_comment("user2", ranked_ids[0], "Reply")
+
+    # The budget fills the top level first, the reply is left for a later call
+    response = reddit_client.expand_comment_tree(post.id, depth=2, breadth=5, max_nodes=3)
+    assert [node.comment.comment_id for node in response.replies] == ranked_ids
+    assert len(response.replies[0].replies) == 0
+    assert response.replies[0].has_more_replies
+    assert response.truncated
+
+    response = reddit_client.expand_comment_tree(post.id, depth=2, breadth=5, max_bytes=1)
+    assert len(response.replies) == 0
+    assert response.has_more_replies and response.truncated
+
+
+def test_get_post_page():
+    reddit_client = RedditClient("localhost", 50051)
+    post, ranked_ids = create_scored_comments(reddit_client, 3)
+    replies = reddit_client.batch_create_comments([("user2", ranked_ids[0], f"Reply {i}") for i in range(3)])
+    reply_ids = [result.comment.comment_id for result in replies.results]
+    reddit_client.upvote_comment(reply_ids[1])
+
+    page = reddit_client.get_post_page(post.id, 2, 2)
+    assert page.post.id == post.id
+    assert [node.comment.comment_id for node in page.comments] == ranked_ids[:2]
+    assert page.has_more_comments
+    assert [node.comment.comment_id for node in page.comments[0].replies] == [reply_ids[1], reply_ids[0]]
+    assert page.comments[0].has_more_replies
+    assert len(page.comments[1].replies) == 0
+
+    assert reddit_client.retrieve_and_expand(post.id).comment_id == reply_ids[1]
+    assert not reddit_client.get_post_page("missing", 2, 2).HasField("post")
+
+
+def test_get_metrics():
+    reddit_client = RedditClient("localhost", 50051)
+    metrics = reddit_client.get_metrics()
+    assert isinstance(metrics, dict)
+    assert all(isinstance(value, float) for value in metrics.values())
+
+
 # For Monitor Update, it update randomly, can't test
 # def test_monitor_updates():
 #     reddit_client = RedditClient("localhost", 50051)
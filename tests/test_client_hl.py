@@ -13,76 +13,75 @@ class MockPostResponse:
     def __init__(self, id=None):
         self.id = id
 
-class MockCommentsResponse:
-    def __init__(self, comments):
-        self.comments = comments
-
 class MockComment:
     def __init__(self, comment_id):
         self.comment_id = comment_id
 
+class MockCommentNode:
+    def __init__(self, comment_id, replies=()):
+        self.comment = MockComment(comment_id)
+        self.replies = list(replies)
+
+class MockPostPageResponse:
+    def __init__(self, post_id=None, comments=()):
+        self.post = MockPostResponse(post_id)
+        self.comments = list(comments)
+
 # The tests
 class TestRetrieveAndExpand(unittest.TestCase):
 
     def test_no_post(self):
         # Create a mock client with a non-existent post
         mock_client = Mock()
-        mock_client.retrieve_post_content.return_value = MockPostResponse()
+        mock_client.get_post_page.return_value = MockPostPageResponse()
         result = RedditClient.retrieve_and_expand(mock_client, 'nonexistent_post')
         self.assertIsNone(result)
 
     def test_no_comments(self):
         # Mock client with a post that has no comments
         mock_client = Mock()
-        mock_client.retrieve_post_content.return_value = MockPostResponse(id='post1')
-        mock_client.retrieve_top_n_comments.return_value = MockCommentsResponse([])
+        mock_client.get_post_page.return_value = MockPostPageResponse('post1')
         result = RedditClient.retrieve_and_expand(mock_client, 'post1')
         self.assertIsNone(result)
 
     def test_no_replies(self):
         mock_client = Mock()
-        mock_client.retrieve_post_content.return_value = MockPostResponse(id='post1')
-        mock_client.retrieve_top_n_comments.return_value = MockCommentsResponse([MockComment('comment1')])
-        mock_client.expand_comment_branch.return_value = MockCommentsResponse([MockComment('comment1')])
+        mock_client.get_post_page.return_value = MockPostPageResponse('post1', [MockCommentNode('comment1')])
         result = RedditClient.retrieve_and_expand(mock_client, 'post1')
         self.assertIsNone(result)
 
     def test_with_replies(self):
         mock_client = Mock()
-        mock_client.retrieve_post_content.return_value = MockPostResponse(id='post1')
-        mock_client.retrieve_top_n_comments.return_value = MockCommentsResponse([MockComment('comment1')])
-        mock_client.expand_comment_branch.return_value = MockCommentsResponse([MockComment('comment1'), MockComment('reply1')])
+        mock_client.get_post_page.return_value = MockPostPageResponse(
+            'post1', [MockCommentNode('comment1', [MockCommentNode('reply1')])])
         result = RedditClient.retrieve_and_expand(mock_client, 'post1')
         self.assertEqual(result.comment_id, 'reply1')
-    
+
+    def test_single_round_trip(self):
+        # The page is fetched with one call, asking for the top comment and its top reply
+        mock_client = Mock()
+        mock_client.get_post_page.return_value = MockPostPageResponse(
+            'post1', [MockCommentNode('comment1', [MockCommentNode('reply1')])])
+        RedditClient.retrieve_and_expand(mock_client, 'post1')
+        mock_client.get_post_page.assert_called_once_with('post1', 1, 1)
+        mock_client.retrieve_post_content.assert_not_called()
+        mock_client.retrieve_top_n_comments.assert_not_called()
+        mock_client.expand_comment_branch.assert_not_called()
+
     def test_multiple_comments_same_upvotes(self):
         # Mock client with multiple comments having the same highest upvotes
         mock_client = Mock()
-        mock_client.retrieve_post_content.return_value = MockPostResponse(id='post1')
-        # Create comments with the same upvotes
-        comments = [MockComment('comment1'), MockComment('comment2'), MockComment('comment3')]
-        mock_client.retrieve_top_n_comments.return_value = MockCommentsResponse(comments)
-        # Simulate that there are replies under the most upvoted comment
-        mock_client.expand_comment_branch.return_value = MockCommentsResponse([MockComment('comment1'), MockComment('reply1')])
+        # Create comments with the same upvotes, with replies under the most upvoted comment
+        comments = [MockCommentNode('comment1', [MockCommentNode('reply1')]), MockCommentNode('comment2'), MockCommentNode('comment3')]
+        mock_client.get_post_page.return_value = MockPostPageResponse('post1', comments)
         result = RedditClient.retrieve_and_expand(mock_client, 'post1')
         self.assertIn(result.comment_id, ['comment1', 'reply1', 'comment2', 'comment3'])
-        
-    def test_error_expanding_comment(self):
-        # Mock client with an error when expanding the comment
-        mock_client = Mock()
-        mock_client.retrieve_post_content.return_value = MockPostResponse(id='post1')
-        mock_client.retrieve_top_n_comments.return_value = MockCommentsResponse([MockComment('comment1')])
-        # Simulate an error when expanding the comment
-        mock_client.expand_comment_branch.side_effect = grpc.RpcError("Error expanding comment")
-        result = RedditClient.retrieve_and_expand(mock_client, 'post1')
-        self.assertIsNone(result)
-        
-    def test_error_retrieving_top_comments(self):
-        # Mock client with an error when retrieving top comments
+
+    def test_error_retrieving_page(self):
+        # Mock client with an error when retrieving the post page
         mock_client = Mock()
-        mock_client.retrieve_post_content.return_value = MockPostResponse(id='post1')
-        # Simulate an error when retrieving top comments
-        mock_client.retrieve_top_n_comments.side_effect = grpc.RpcError("Error retrieving top comments")
+        # Simulate an error when retrieving the page
+        mock_client.get_post_page.side_effect = grpc.RpcError("Error retrieving post page")
         result = RedditClient.retrieve_and_expand(mock_client, 'post1')
         self.assertIsNone(result)
 
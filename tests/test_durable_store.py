@@ -0,0 +1,183 @@
+import os
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from durable_store import DurableStore, encode_add
+from mapped_snapshot import is_mapped_snapshot
+from oplog import frame
+from proto import reddit_pb2
+
+
+def crash(durable):
+    # Stops the writer and snapshot threads without the final snapshot close() would write
+    durable._closed.set()
+    if durable._thread is not None:
+        durable._thread.join()
+    durable.log.close()
+
+
+def contents(durable):
+    # Everything a client could read, to compare a store before and after recovery
+    posts = [durable.get_post(post_id) for post_id in durable.post_ids()]
+    comments = [durable.get_comment(comment_id) for comment_id in durable.comment_ids()]
+    children = {parent_id: [comment.comment_id for comment in durable.top_children(parent_id, 100)]
+                for parent_id in durable.post_ids() + durable.comment_ids()}
+    return posts, comments, children
+
+
+def populate(durable, prefix="", count=5):
+    durable.add_post(reddit_pb2.Post(id=f"{prefix}p1", title="Title", text="Text", author="user1", image_url="http://img"))
+    durable.add_comments([reddit_pb2.Comment(comment_id=f"{prefix}c{i}", author="user2", parent_id=f"{prefix}p1", text=f"Comment {i}")
+                          for i in range(count)])
+    durable.add_comment(reddit_pb2.Comment(comment_id=f"{prefix}r1", author="user3", parent_id=f"{prefix}c0", text="Reply"))
+    for i in range(count):
+        for _ in range(i):
+            durable.vote_comment(f"{prefix}c{i}", 1)
+    durable.vote_post(f"{prefix}p1", -2)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    return str(tmp_path / "data")
+
+
+def test_writes_survive_a_crash(data_dir):
+    durable = DurableStore(data_dir, snapshot_interval=0)
+    populate(durable)
+    expected = contents(durable)
+    crash(durable)
+
+    recovered = DurableStore(data_dir, snapshot_interval=0)
+    assert contents(recovered) == expected
+    assert recovered.get_post("p1").score == -2
+    assert [comment.comment_id for comment in recovered.top_children("p1", 2)] == ["c4", "c3"]
+    assert recovered.vote_post("missing", 1) is None
+    recovered.close()
+
+
+def test_torn_tail_is_dropped(data_dir):
+    durable = DurableStore(data_dir, snapshot_interval=0)
+    populate(durable)
+    expected = contents(durable)
+    crash(durable)
+    with open(durable.log.path, 'ab') as log:
+        log.write(b'\x40\x00\x00\x00\x01\x02')  # Half written record
+
+    recovered = DurableStore(data_dir, snapshot_interval=0)
+    assert contents(recovered) == expected
+    recovered.vote_post("p1", 1)  # New writes go after the good records
+    crash(recovered)
+
+    assert DurableStore(data_dir, snapshot_interval=0).get_post("p1").score == -1
+
+
+@pytest.mark.parametrize("mode", ["fork", "thread"])
+def test_snapshot_then_tail_replay(data_dir, mode):
+    durable = DurableStore(data_dir, snapshot_interval=0, snapshot_mode=mode)
+    populate(durable, "a")
+    durable.snapshot()
+    populate(durable, "b")
+    durable.vote_comment("ac1", 10)
+    expected = contents(durable)
+    crash(durable)
+
+    # Segments before the snapshot are gone, only the tail is replayed
+    names = sorted(os.listdir(data_dir))
+    assert names == [f"log-{durable.segment:010d}", f"snapshot-{durable.segment:010d}"]
+
+    recovered = DurableStore(data_dir, snapshot_interval=0, snapshot_mode=mode)
+    assert contents(recovered) == expected
+    assert recovered.get_post("ap1").image_url == "http://img"
+    recovered.close()
+
+    # A clean shutdown leaves a snapshot that covers everything
+    assert sorted(os.listdir(data_dir)) == [f"log-{recovered.segment:010d}", f"snapshot-{recovered.segment:010d}"]
+    assert os.path.getsize(os.path.join(data_dir, f"log-{recovered.segment:010d}")) == 0
+    reopened = DurableStore(data_dir, snapshot_interval=0)
+    assert contents(reopened) == expected
+    reopened.close()
+
+
+def test_fork_snapshot_is_point_in_time(data_dir):
+    durable = DurableStore(data_dir, snapshot_interval=0, snapshot_mode="fork")
+    populate(durable)
+    expected = contents(durable)
+    durable.snapshot()
+    durable.vote_post("p1", 5)  # Lands in the new segment, not in the snapshot
+
+    values = durable.metrics.values()
+    assert values["snapshot_duration_seconds_count"] == 1
+    assert 0 < values["snapshot_pause_seconds_last"] <= values["snapshot_duration_seconds_last"]
+    crash(durable)
+
+    # The snapshot alone holds the state as of the fork
+    os.remove(os.path.join(data_dir, f"log-{durable.segment:010d}"))
+    assert contents(DurableStore(data_dir, snapshot_interval=0)) == expected
+
+
+def test_random_walk_replays_the_same_scores(data_dir):
+    durable = DurableStore(data_dir, fsync_interval=0, snapshot_interval=0)
+    populate(durable, count=12)
+    rng = np.random.default_rng(3)
+    durable.random_walk(rng)
+    durable.vote_comment("c7", 5)
+    durable.random_walk(rng)
+    expected = contents(durable)
+    durable.log.wait(durable.log.last_ticket)  # Walks aren't waited for
+    crash(durable)
+
+    assert contents(DurableStore(data_dir, snapshot_interval=0)) == expected
+
+
+def test_random_walk_replays_over_comments_of_mixed_parents(data_dir):
+    # The Store groups a batch by parent, replay must give the comments the same slots
+    durable = DurableStore(data_dir, fsync_interval=0, snapshot_interval=0)
+    durable.add_posts([reddit_pb2.Post(id="p1"), reddit_pb2.Post(id="p2")])
+    durable.add_comments([reddit_pb2.Comment(comment_id=f"c{i}", parent_id=f"p{i % 2 + 1}") for i in range(40)])
+    durable.random_walk(np.random.default_rng(7))
+    expected = contents(durable)
+    durable.log.wait(durable.log.last_ticket)
+    crash(durable)
+
+    assert contents(DurableStore(data_dir, snapshot_interval=0)) == expected
+
+
+def test_concurrent_writes_are_all_logged(data_dir):
+    durable = DurableStore(data_dir, fsync_interval=0.001, snapshot_interval=0)
+    durable.add_post(reddit_pb2.Post(id="p1"))
+
+    def vote():
+        for _ in range(200):
+            durable.vote_post("p1", 1)
+
+    threads = [threading.Thread(target=vote) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    crash(durable)
+
+    assert DurableStore(data_dir, snapshot_interval=0).get_post("p1").score == 8 * 200
+
+
+def test_framed_snapshots_are_still_loaded(data_dir):
+    durable = DurableStore(data_dir, snapshot_interval=0)
+    populate(durable)
+    expected = contents(durable)
+    crash(durable)
+    # Snapshot in the older format: the logged add of every item
+    with open(os.path.join(data_dir, f"snapshot-{durable.segment:010d}"), 'wb') as snapshot:
+        for item in durable.store.snapshot():
+            snapshot.write(frame(encode_add(item)))
+    os.remove(durable.log.path)
+
+    recovered = DurableStore(data_dir, snapshot_interval=0)
+    assert contents(recovered) == expected
+    assert recovered.metrics.values()["snapshot_load_seconds_count"] == 1
+    recovered.close()
+    assert is_mapped_snapshot(os.path.join(data_dir, f"snapshot-{recovered.segment:010d}"))  # Rewritten in the new one
@@ -0,0 +1,53 @@
+import os
+import sys
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from ids import MAX_SEQUENCE, SnowflakeGenerator, node_of, timestamp_ms, to_key, to_wire
+
+
+def test_ids_are_time_ordered():
+    now = [1717000000.0]
+    generator = SnowflakeGenerator(node_id=5, clock=lambda: now[0])
+    first = generator.next_id()
+    second = generator.next_id()
+    now[0] += 0.002
+    third = generator.next_id()
+    assert first < second < third < 1 << 63
+    assert timestamp_ms(first) == 1717000000000
+    assert timestamp_ms(third) == 1717000000002
+    assert node_of(third) == 5
+
+
+def test_ids_never_go_backwards():
+    now = [1717000000.0]
+    generator = SnowflakeGenerator(clock=lambda: now[0])
+    ids = [generator.next_id() for _ in range(MAX_SEQUENCE + 10)]  # Overflows the sequence of one millisecond
+    now[0] -= 5  # Clock jumps back
+    ids.append(generator.next_id())
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+
+
+def test_ids_are_unique_across_threads():
+    generator = SnowflakeGenerator()
+    ids = []
+
+    def generate():
+        ids.extend(generator.next_id() for _ in range(5000))
+
+    threads = [threading.Thread(target=generate) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(ids)) == 8 * 5000
+
+
+def test_keys_round_trip():
+    assert to_key("123456789") == 123456789
+    for item_id in ["0123", "abc", "", "1e5", "99999999999999999999", "2ab8c0e4-6f5e-4d1b-9b43-3f1d1c8e2f10"]:
+        assert to_key(item_id) == item_id
+    for item_id in ["0", "42", "0042", "post-1", str((1 << 63) - 1), str(1 << 63)]:
+        assert to_wire(to_key(item_id)) == item_id
@@ -0,0 +1,126 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from mapped_snapshot import MappedSnapshot, is_mapped_snapshot, key64, write_mapped_snapshot
+from proto import reddit_pb2
+from ranking import decode_cursor
+import store as store_module
+from store import Store
+
+
+def populate(store):
+    store.add_post(reddit_pb2.Post(id="1001", title="Numeric", text="Text", author="user1", video_url="http://video",
+                                   state=reddit_pb2.POST_LOCKED, publication_date=10, subreddit_id=3, score=4))
+    store.add_post(reddit_pb2.Post(id="p2", title="Named", author="user1", image_url="http://img"))
+    store.add_post(reddit_pb2.Post(id="p3", title="Plain"))
+    store.add_comments([reddit_pb2.Comment(comment_id=str(2000 + i), author="user2", parent_id="1001", text=f"Comment {i}",
+                                           score=i, publication_date=20) for i in range(5)])
+    store.add_comment(reddit_pb2.Comment(comment_id="r1", author="user3", parent_id="2003", text="Reply",
+                                         state=reddit_pb2.COMMENT_HIDDEN))
+    store.add_comment(reddit_pb2.Comment(comment_id="r2", author="user3", parent_id="p2", text="On a named post"))
+
+
+def contents(store):
+    posts = [store.get_post(post_id) for post_id in store.post_ids()]
+    comments = [store.get_comment(comment_id) for comment_id in store.comment_ids()]
+    children = {parent_id: [comment.comment_id for comment in store.top_children(parent_id, 100)]
+                for parent_id in store.post_ids() + store.comment_ids()}
+    return posts, comments, children
+
+
+@pytest.fixture
+def attached(tmp_path):
+    # (in-memory Store, empty Store with the first one's mapped snapshot attached)
+    store = Store()
+    populate(store)
+    path = str(tmp_path / "snapshot")
+    write_mapped_snapshot(path, store.snapshot())
+    mapped = Store()
+    mapped.attach(MappedSnapshot(path))
+    return store, mapped
+
+
+def test_attached_store_reads_the_same(attached):
+    store, mapped = attached
+    assert contents(mapped) == contents(store)
+    assert mapped.get_post("1001").WhichOneof("media") == "video_url"
+    assert mapped.get_post("p2").image_url == "http://img"
+    assert mapped.get_post("p3").WhichOneof("media") is None
+    assert mapped.has_replies("2003") and not mapped.has_replies("2004")
+    assert mapped.get_post("missing") is None and mapped.get_comment("1002") is None
+
+
+def test_writes_go_on_top_of_the_snapshot(attached):
+    store, mapped = attached
+    for backend in (store, mapped):
+        backend.vote_comment("2000", 10)
+        backend.add_comment(reddit_pb2.Comment(comment_id="r3", parent_id="1001", text="New"))
+        backend.add_comment(reddit_pb2.Comment(comment_id="r4", parent_id="2004", text="New reply"))
+    assert contents(mapped) == contents(store)
+    assert [comment.comment_id for comment in mapped.top_children("1001", 2)] == ["2000", "2004"]
+    assert mapped.has_replies("2004")
+
+    # Pages keep going across the snapshot's children and the new ones
+    first, cursor = mapped.children_page("1001", None, 3)
+    rest, end = mapped.children_page("1001", decode_cursor(cursor), 10)
+    assert end == ""
+    assert [comment.comment_id for comment in first + rest] == ["2000", "2004", "2003", "2002", "2001", "r3"]
+
+
+def test_ranked_children_span_the_snapshot(attached, monkeypatch):
+    # Every parent with more than two children keeps them in score order, the snapshot's first
+    monkeypatch.setattr(store_module, 'RANKED_CHILDREN', 2)
+    store, mapped = attached
+    assert contents(mapped) == contents(store)
+    assert mapped.ranked
+    mapped.vote_comment("2002", 10)
+    mapped.add_comment(reddit_pb2.Comment(comment_id="r3", parent_id="1001", text="New", score=20))
+    first, cursor = mapped.children_page("1001", None, 2)
+    rest, end = mapped.children_page("1001", decode_cursor(cursor), 10)
+    assert end == ""
+    assert [comment.comment_id for comment in first + rest] == ["r3", "2002", "2004", "2003", "2001", "2000"]
+
+
+def test_snapshot_of_an_attached_store(attached, tmp_path):
+    store, mapped = attached
+    mapped.add_post(reddit_pb2.Post(id="p4", title="After"))
+    path = str(tmp_path / "again")
+    write_mapped_snapshot(path, mapped.snapshot())
+    reopened = Store()
+    reopened.attach(MappedSnapshot(path))
+    assert contents(reopened) == contents(mapped)
+
+
+def test_hash_collisions_compare_the_id(tmp_path, monkeypatch):
+    import mapped_snapshot
+    monkeypatch.setattr(mapped_snapshot, "key64", lambda key: key if isinstance(key, int) else 7)
+    store = Store()
+    store.add_posts([reddit_pb2.Post(id=f"p{i}", title=f"Post {i}") for i in range(3)])
+    store.add_comments([reddit_pb2.Comment(comment_id="c1", parent_id="p2", text="Reply"),
+                        reddit_pb2.Comment(comment_id="c2", parent_id="p0", text="Reply"),
+                        reddit_pb2.Comment(comment_id="c3", parent_id="p2", text="Reply")])
+    path = str(tmp_path / "snapshot")
+    write_mapped_snapshot(path, store.snapshot())
+    mapped = Store()
+    mapped.attach(MappedSnapshot(path))
+    assert [mapped.get_post(f"p{i}").title for i in range(3)] == ["Post 0", "Post 1", "Post 2"]
+    # Parents whose keys collide keep their own children
+    assert [comment.comment_id for comment in mapped.top_children("p2", 5)] == ["c1", "c3"]
+    assert [comment.comment_id for comment in mapped.top_children("p0", 5)] == ["c2"]
+    assert mapped.top_children("p1", 5) == []
+
+
+def test_format_checks(tmp_path):
+    path = str(tmp_path / "empty")
+    write_mapped_snapshot(path, [])
+    assert is_mapped_snapshot(path)
+    empty = Store()
+    empty.attach(MappedSnapshot(path))
+    assert empty.post_ids() == [] and empty.top_children("p1", 5) == []
+    with pytest.raises(ValueError):
+        empty.attach(MappedSnapshot(path))  # Only one snapshot under a store
+    assert key64(12) == 12 and key64("p1") == key64("p1") != key64("p2")
@@ -0,0 +1,32 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from metrics import Metrics
+
+
+def test_counters_and_summaries():
+    metrics = Metrics()
+    metrics.increment("requests")
+    metrics.increment("requests", 2)
+    for value in [0.5, 2.0, 1.0]:
+        metrics.observe("duration_seconds", value)
+
+    assert metrics.values() == {
+        "requests": 3,
+        "duration_seconds_count": 3,
+        "duration_seconds_sum": 3.5,
+        "duration_seconds_max": 2.0,
+        "duration_seconds_last": 1.0,
+    }
+
+
+def test_ratios():
+    metrics = Metrics()
+    metrics.ratio("hit_ratio", "hits", "lookups")
+    assert "hit_ratio" not in metrics.values()
+    metrics.increment("lookups", 4)
+    assert metrics.values()["hit_ratio"] == 0
+    metrics.increment("hits")
+    assert metrics.values()["hit_ratio"] == 0.25
@@ -0,0 +1,76 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from ranking import RankedChildren, decode_cursor, encode_cursor, rank, rank_after
+
+
+def test_rank_is_score_ordered():
+    scores = np.array([0, 5, -1])
+    assert rank(scores, 2).tolist() == [1, 0]
+    assert rank(scores, 10).tolist() == [1, 0, 2]
+    assert rank(scores, 0).tolist() == []
+    assert rank(np.array([], dtype=np.int64), 3).tolist() == []
+
+
+def test_ties_keep_creation_order():
+    assert rank(np.zeros(3, dtype=np.int64), 3).tolist() == [0, 1, 2]
+    # Ties at the cut-off of a partial selection are taken in position order too
+    assert rank(np.array([1, 2, 1, 1, 0]), 3).tolist() == [1, 0, 2]
+
+
+def test_rank_matches_stable_sort():
+    rng = np.random.default_rng(7)
+    scores = rng.integers(-5, 5, size=1000)
+    expected = sorted(range(len(scores)), key=lambda i: -scores[i])
+    for n in [1, 10, 999, 1000]:
+        assert rank(scores, n).tolist() == expected[:n]
+
+
+def test_rank_after_walks_in_score_order():
+    scores = np.array([1, 3, 1, 0])
+    first = rank_after(scores, None, 2)
+    assert first.tolist() == [1, 0]
+    last = first[-1]
+    second = rank_after(scores, decode_cursor(encode_cursor(scores[last], last)), 2)
+    assert second.tolist() == [2, 3]
+    assert rank_after(scores, (0, second[-1]), 2).tolist() == []
+
+
+def test_decode_cursor():
+    assert decode_cursor("") is None
+    assert decode_cursor("-3:12") == (-3, 12)
+
+
+class Table:
+    # The part of a ScoreTable RankedChildren reads
+    def __init__(self, scores):
+        self.scores = np.array(scores, dtype=np.int64)
+        self.epoch = 0
+
+    def take(self, slots):
+        return self.scores[slots]
+
+
+def test_ranked_children_follow_votes_and_steps():
+    table = Table([4, 1, 1, 9, 0])
+    ranked = RankedChildren([1, 2, 0])  # Slots, their positions are 0, 1, 2
+    ranked.ensure_order(table)
+    assert ranked.top(5) == [(0, 4), (1, 1), (2, 1)]
+
+    table.scores[2] = 7
+    ranked.update(2, 7)
+    ranked.add(3, 9)
+    assert ranked.top(2) == [(3, 9), (2, 7)]
+    assert ranked.page((7, 1), 5) == [(0, 4, 2), (1, 1, 0)]
+    assert ranked.page(None, 0) == [] and len(ranked) == 4 and ranked.view().tolist() == [1, 2, 0, 3]
+
+    # A step moves scores behind its back, the next read sorts again
+    table.scores += np.array([0, 10, 0, -20, 0])
+    table.epoch += 1
+    ranked.ensure_order(table)
+    scores = table.take(ranked.view())
+    assert [position for _, _, position in ranked.page(None, 10)] == rank(scores, 10).tolist()
@@ -0,0 +1,215 @@
+import os
+import queue
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from proto import reddit_pb2
+from read_cache import ReadCache
+from reddit_client import RedditClient
+
+
+class FakeStream:
+    # MonitorUpdates stream the test pushes updates into
+    def __init__(self, posts):
+        self.posts = posts
+        self.cancelled = False
+        self.updates = queue.Queue()
+
+    def push(self, item_id, score):
+        self.updates.put(reddit_pb2.ScoreUpdate(item_id=item_id, new_score=score))
+
+    def end(self):
+        self.updates.put(None)
+
+    def cancel(self):
+        self.cancelled = True
+        self.end()
+
+    def __iter__(self):
+        return iter(self.updates.get, None)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def make_cache(watch_interval=0, **kwargs):
+    streams = []
+    cache = ReadCache(watch_interval=watch_interval, **kwargs)
+    cache.bind(lambda posts: streams.append(FakeStream(posts)) or [(list(posts), streams[-1])])
+    return cache, streams
+
+
+def top(*scores):
+    return reddit_pb2.TopNCommentsResponse(comments=[
+        reddit_pb2.Comment(comment_id=f"c{i}", score=score) for i, score in enumerate(scores)])
+
+
+def test_updates_keep_reads_fresh():
+    cache, streams = make_cache()
+    fetches = []
+
+    def fetch_post():
+        fetches.append("post")
+        return reddit_pb2.Post(id="p1", title="Post", score=3)
+
+    assert cache.post("p1", fetch_post).score == 3
+    assert cache.post("p1", fetch_post).score == 3 and fetches == ["post"]
+    stream = streams[0]
+    assert stream.posts == {"p1": []}
+
+    stream.push("p1", 3)  # Current score, nothing changed
+    stream.push("p1", 7)
+    wait_until(lambda: cache.post("p1", fetch_post).score == 7)
+    assert fetches == ["post"]
+
+    # A list's comments are added to the watch, their changes drop the list
+    assert len(cache.top_comments("p1", 2, lambda: top(5, 4)).comments) == 2
+    assert stream.cancelled and streams[1].posts == {"p1": ["c0", "c1"]}
+    streams[1].push("c0", 5)  # Unchanged, still cached
+    streams[1].push("p1", 8)
+    wait_until(lambda: cache.post("p1", fetch_post).score == 8)
+    assert cache.top_comments("p1", 2, lambda: top(1)).comments[0].score == 5
+    streams[1].push("c1", 6)
+    wait_until(lambda: cache.top_comments("p1", 2, lambda: top(6, 5)).comments[0].score == 6)
+    assert len(streams) == 2  # Nothing new to watch, same stream
+    assert fetches == ["post"]
+    cache.close()
+    assert streams[1].cancelled
+
+
+def test_staleness_and_eviction():
+    clock = Clock()
+    cache, streams = make_cache(max_posts=2, ttl=5, clock=clock)
+    for post_id in ["p1", "p2"]:
+        cache.post(post_id, lambda: reddit_pb2.Post(id=post_id, score=1))
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert streams[0].cancelled and list(streams[1].posts) == ["p1", "p2"]  # One stream watches both
+
+    clock.now = 4
+    assert cache.post("p1", lambda: reddit_pb2.Post(id="p1", score=2)).score == 1
+    clock.now = 6  # Too old, read again
+    assert cache.post("p1", lambda: reddit_pb2.Post(id="p1", score=2)).score == 2
+    assert (cache.hits, cache.misses) == (1, 3)
+
+    # p2 is the least recently read post, a third post drops it
+    cache.post("p3", lambda: reddit_pb2.Post(id="p3", score=1))
+    assert streams[1].cancelled and list(streams[2].posts) == ["p1", "p3"]
+    assert cache.post("p2", lambda: reddit_pb2.Post(id="p2", score=9)).score == 9
+    assert list(streams[3].posts) == ["p3", "p2"]
+
+    # Missing posts aren't cached, the posts of a stream that ends are dropped
+    assert not cache.post("gone", lambda: reddit_pb2.Post()).id
+    assert len(streams) == 4
+    streams[3].end()
+    wait_until(lambda: cache.post("p3", lambda: reddit_pb2.Post(id="p3", score=5)).score == 5)
+    assert cache.post("p2", lambda: reddit_pb2.Post(id="p2", score=6)).score == 6
+
+    # Own writes drop what they change
+    cache.top_comments("p2", 3, lambda: top(2, 1))
+    cache.invalidate("c1")
+    assert cache.top_comments("p2", 3, lambda: top(4)).comments[0].score == 4
+    cache.invalidate("p2")
+    assert cache.post("p2", lambda: reddit_pb2.Post(id="p2", score=10)).score == 10
+    cache.close()
+
+
+def test_reopens_are_batched():
+    cache, streams = make_cache(watch_interval=0.2)
+    cache.post("p1", lambda: reddit_pb2.Post(id="p1", score=1))
+    assert list(streams[0].posts) == ["p1"]  # The first read is watched right away
+    for i in range(2, 50):
+        cache.post(f"p{i}", lambda i=i: reddit_pb2.Post(id=f"p{i}", score=1))
+    assert len(streams) == 1  # The other reads wait for one reopen
+    wait_until(lambda: len(streams) == 2)
+    assert streams[0].cancelled and len(streams[1].posts) == 49
+    streams[1].push("p30", 4)  # The reopened stream sends the current scores
+    wait_until(lambda: cache.post("p30", lambda: reddit_pb2.Post(id="p30", score=1)).score == 4)
+    cache.post("p50", lambda: reddit_pb2.Post(id="p50", score=1))
+    opened = len(streams)
+    cache.close()
+    time.sleep(0.3)
+    assert len(streams) == opened and all(stream.cancelled for stream in streams)  # No reopen after close
+
+
+def test_client_cache_follows_other_clients_votes():
+    cache = ReadCache(ttl=60)
+    client = RedditClient("localhost", 50051, cache=cache)
+    other = RedditClient("localhost", 50051)
+    post = client.create_post("Cached Post", "Text", 1)
+    comment = client.create_comment("user1", post.id, "Comment")
+    assert client.retrieve_post_content(post.id).id == post.id
+    assert client.retrieve_top_n_comments(post.id, 5).comments[0].comment_id == comment.comment_id
+
+    other.upvote_post(post.id)
+    other.create_comment("user2", post.id, "Another Comment")
+    other.upvote_comment(comment.comment_id)
+    misses = cache.misses
+    wait_until(lambda: client.retrieve_post_content(post.id).score == other.retrieve_post_content(post.id).score)
+    assert cache.misses == misses  # Patched from the stream, not read again
+    # The vote on the listed comment drops the list, the new comment shows up when it's read again
+    wait_until(lambda: len(client.retrieve_top_n_comments(post.id, 5).comments) == 2)
+
+    # Own writes are read again right away
+    misses = cache.misses
+    client.downvote_post(post.id)
+    client.retrieve_post_content(post.id)
+    assert cache.misses == misses + 1
+    client.close()
+    other.close()
+
+
+def test_many_cached_posts_share_one_stream():
+    # More posts than the server has threads, one stream per post would leave none for other calls
+    client = RedditClient("localhost", 50051, cache=ReadCache(ttl=60))
+    other = RedditClient("localhost", 50051)
+    posts = [client.create_post(f"Cached Post {i}", "Text", 1) for i in range(12)]
+    for post in posts:
+        assert client.retrieve_post_content(post.id).id == post.id
+    assert len(client.cache._streams) == 1
+
+    other.upvote_post(posts[0].id)
+    assert other.retrieve_post_content(posts[-1].id).title == "Cached Post 11"
+    wait_until(lambda: client.retrieve_post_content(posts[0].id).score == 1)
+    client.close()
+    other.close()
+
+
+class RacingStub:
+    # Another thread reads the post while the vote is on its way, before the server applied it
+    def __init__(self, client):
+        self.client = client
+        self.score = 1
+
+    def RetrievePostContent(self, request):
+        return reddit_pb2.Post(id=request.post_id, score=self.score)
+
+    def UpvoteDownvotePost(self, request):
+        self.client.retrieve_post_content(request.item_id)
+        self.score += 1
+        return reddit_pb2.Post(id=request.item_id, score=self.score)
+
+    def MonitorUpdates(self, request):
+        return FakeStream({})
+
+
+def test_reads_during_own_write_are_not_kept():
+    client = RedditClient("localhost", 50051, cache=ReadCache(ttl=60))
+    client.stub = RacingStub(client)
+    assert client.retrieve_post_content("p1").score == 1
+    assert client.upvote_post("p1").score == 2
+    assert client.retrieve_post_content("p1").score == 2
+    client.close()
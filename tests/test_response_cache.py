@@ -0,0 +1,93 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from proto import reddit_pb2
+from reddit_client import RedditClient
+from reddit_service import RedditService
+from metrics import Metrics
+from response_cache import ResponseCache, passthrough
+from store import Store
+
+
+def test_versions_expire_entries():
+    metrics = Metrics()
+    cache = ResponseCache(max_entries=2, metrics=metrics)
+    builds = []
+
+    def build(title):
+        builds.append(title)
+        return reddit_pb2.Post(id="p1", title=title)
+
+    assert cache.get(('post', 'p1'), ('post', 'p1'), lambda: build("A")) == reddit_pb2.Post(id="p1", title="A").SerializeToString()
+    assert reddit_pb2.Post.FromString(cache.get(('post', 'p1'), ('post', 'p1'), lambda: build("B"))).title == "A"
+    cache.bump(('children', 'p1'))  # Other data, still cached
+    assert reddit_pb2.Post.FromString(cache.get(('post', 'p1'), ('post', 'p1'), lambda: build("B"))).title == "A"
+    cache.bump(('post', 'p1'))
+    assert reddit_pb2.Post.FromString(cache.get(('post', 'p1'), ('post', 'p1'), lambda: build("B"))).title == "B"
+    cache.expire_all()
+    assert reddit_pb2.Post.FromString(cache.get(('post', 'p1'), ('post', 'p1'), lambda: build("C"))).title == "C"
+    assert builds == ["A", "B", "C"]
+    assert (metrics.values()['response_cache_hits'], metrics.values()['response_cache_misses']) == (2, 3)
+
+    # Least recently used entries go first
+    cache.get(('post', 'p2'), ('post', 'p2'), lambda: build("D"))
+    cache.get(('post', 'p1'), ('post', 'p1'), lambda: build("E"))
+    cache.get(('post', 'p3'), ('post', 'p3'), lambda: build("F"))
+    cache.get(('post', 'p2'), ('post', 'p2'), lambda: build("G"))
+    assert builds[-1] == "G"
+
+    serialize = passthrough(reddit_pb2.Post.SerializeToString)
+    assert serialize(b"cached") == b"cached"
+    assert serialize(reddit_pb2.Post(id="p1")) == reddit_pb2.Post(id="p1").SerializeToString()
+
+
+def test_service_writes_invalidate_cached_reads():
+    service = RedditService(Store(), ResponseCache())
+
+    def top(post_id):
+        return reddit_pb2.TopNCommentsResponse.FromString(
+            service.RetrieveTopNComments(reddit_pb2.TopNCommentsRequest(post_id=post_id, n=5), None))
+
+    def post(post_id):
+        return reddit_pb2.Post.FromString(service.RetrievePostContent(reddit_pb2.PostRequest(post_id=post_id), None))
+
+    created = service.CreatePost(reddit_pb2.Post(title="Title", text="Text", subreddit_id=1), None)
+    assert post(created.id).score == 0 and not top(created.id).comments
+    first = service.CreateComment(reddit_pb2.Comment(author="user1", parent_id=created.id, text="First"), None)
+    second = service.CreateComment(reddit_pb2.Comment(author="user1", parent_id=created.id, text="Second"), None)
+    assert len(top(created.id).comments) == 2
+
+    service.UpvoteDownvotePost(reddit_pb2.UpvoteDownvoteRequest(item_id=created.id, upvote=True), None)
+    assert post(created.id).score == 1
+    service.UpvoteDownvoteComment(reddit_pb2.UpvoteDownvoteRequest(item_id=second.comment_id, upvote=True), None)
+    assert [comment.comment_id for comment in top(created.id).comments] == [second.comment_id, first.comment_id]
+
+    # A reply changes has_replies of its parent in the post's list
+    service.CreateComment(reddit_pb2.Comment(author="user2", parent_id=first.comment_id, text="Reply"), None)
+    assert list(top(created.id).has_replies) == [False, True]
+    service.BatchVote(reddit_pb2.BatchVoteRequest(votes=[
+        reddit_pb2.UpvoteDownvoteRequest(item_id=first.comment_id, upvote=True),
+        reddit_pb2.UpvoteDownvoteRequest(item_id=first.comment_id, upvote=True),
+        reddit_pb2.UpvoteDownvoteRequest(item_id=created.id, upvote=False)]), None)
+    assert top(created.id).comments[0].comment_id == first.comment_id
+    assert post(created.id).score == 0
+
+    assert not post("archived").id
+    service.IngestPosts(iter([reddit_pb2.Post(id="archived", title="Archived")]), None)
+    assert post("archived").title == "Archived"
+
+
+def test_cached_responses_over_grpc():
+    client = RedditClient("localhost", 50051)
+    created = client.create_post("Hot Post", "Text", 1)
+    comment = client.create_comment("user1", created.id, "Comment")
+    hits = client.get_metrics().get('response_cache_hits', 0)
+    for _ in range(3):
+        assert client.retrieve_post_content(created.id).title == "Hot Post"
+        assert client.retrieve_top_n_comments(created.id, 1).comments[0].comment_id == comment.comment_id
+    assert client.get_metrics()['response_cache_hits'] > hits
+    assert client.upvote_post(created.id).score == client.retrieve_post_content(created.id).score
+    client.close()
@@ -0,0 +1,68 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from score_bus import AsyncSubscription, ScoreBus
+
+
+def test_publish_wakes_subscriber():
+    bus = ScoreBus()
+    subscription = bus.subscribe(["post1", "comment1"])
+    received = []
+
+    def reader():
+        received.append((time.monotonic(), subscription.wait(timeout=2)))
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    time.sleep(0.05)
+    published_at = time.monotonic()
+    bus.publish("comment1", 3)
+    thread.join()
+
+    woke_at, updates = received[0]
+    assert updates == [("comment1", 3)]
+    assert woke_at - published_at < 0.01  # Woken by the publish, not by polling
+
+
+def test_unwatched_items_are_ignored():
+    bus = ScoreBus()
+    subscription = bus.subscribe(["post1"])
+    bus.publish("post2", 1)
+    assert subscription.wait(timeout=0.01) == []
+
+
+def test_updates_are_coalesced_per_item():
+    bus = ScoreBus()
+    subscription = bus.subscribe(["post1", "comment1"])
+    bus.publish("post1", 1)
+    bus.publish("post1", 2)
+    bus.publish("comment1", -1)
+    assert sorted(subscription.wait(timeout=1)) == [("comment1", -1), ("post1", 2)]
+
+
+def test_close_unblocks_waiter_and_unsubscribes():
+    bus = ScoreBus()
+    subscription = bus.subscribe(["post1"])
+    threading.Timer(0.05, subscription.close).start()
+    assert subscription.wait(timeout=2) is None
+    assert bus._subscribers == {}
+
+
+def test_async_subscription_is_woken_from_another_thread():
+    async def scenario():
+        bus = ScoreBus()
+        subscription = bus.subscribe(["post1"], AsyncSubscription)
+        threading.Timer(0.05, bus.publish, args=("post1", 7)).start()
+        updates = await asyncio.wait_for(subscription.wait(), timeout=2)
+        subscription.close()
+        closed = await asyncio.wait_for(subscription.wait(), timeout=2)
+        return updates, closed
+
+    updates, closed = asyncio.run(scenario())
+    assert updates == [("post1", 7)]
+    assert closed is None
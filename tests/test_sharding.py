@@ -0,0 +1,152 @@
+import os
+import subprocess
+import sys
+import time
+
+import grpc
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'client'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from ids import SnowflakeGenerator
+from proto import reddit_pb2
+from reddit_client import RedditClient
+from sharding import HashRing, snowflake_node
+
+CLUSTER_PORT = 50091
+NUM_SHARDS = 3
+
+
+def archive_id(node_id, unix_seconds):
+    # Decimal archive ID that looks like one the cluster generated at that time
+    return str(SnowflakeGenerator(node_id=node_id, clock=lambda: unix_seconds).next_id())
+
+
+def test_snowflake_node():
+    assert snowflake_node(str(SnowflakeGenerator(node_id=7).next_id())) == 7
+    for foreign in ["p1", "1001", "", "0123", "-5", str(1 << 63)]:
+        assert snowflake_node(foreign) is None
+    # Only timestamps the cluster could have generated an ID at count
+    assert snowflake_node(archive_id(7, 1717000000)) == 7
+    assert snowflake_node(archive_id(7, 1717000000), since_ms=1717000001000) is None
+    assert snowflake_node(archive_id(7, time.time() + 3600)) is None
+
+
+def test_hash_ring_moves_few_keys():
+    keys = [f"post-{i}" for i in range(10000)]
+    ring = HashRing(range(4))
+    owners = [ring.owner(key) for key in keys]
+    assert all(owners.count(shard) > 1500 for shard in range(4))  # Spread about evenly
+
+    bigger = HashRing(range(5))
+    moved = [key for key, owner in zip(keys, owners) if bigger.owner(key) != owner]
+    assert all(bigger.owner(key) == 4 for key in moved)  # Keys only move to the new shard
+    assert len(moved) < 0.3 * len(keys)
+
+
+@pytest.fixture(scope="module")
+def cluster():
+    server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(__file__), '..', 'server', 'reddit_service.py'),
+                               '--shards', str(NUM_SHARDS), '--port', str(CLUSTER_PORT)],
+                              env={**os.environ, 'PYTHONPATH': os.path.join(os.path.dirname(__file__), '..')})
+    addresses = [f"localhost:{CLUSTER_PORT + shard}" for shard in range(NUM_SHARDS)]
+    try:
+        for address in addresses:
+            with grpc.insecure_channel(address) as channel:
+                grpc.channel_ready_future(channel).result(timeout=10)
+        yield addresses
+    finally:
+        server.terminate()
+        assert server.wait(timeout=10) == 0
+
+
+def test_items_live_on_the_shard_in_their_id(cluster):
+    client = RedditClient(shards=cluster)
+    posts = [client.create_post(f"Post {i}", "Text", subreddit_id=i) for i in range(12)]
+    shards = [snowflake_node(post.id) for post in posts]
+    assert set(shards) == set(range(NUM_SHARDS))  # Subreddits are spread over the shards
+
+    post = posts[0]
+    comments = client.batch_create_comments([("user1", post.id, f"Comment {i}") for i in range(3)])
+    reply = client.create_comment("user2", comments.results[1].comment.comment_id, "Reply")
+    assert {snowflake_node(result.comment.comment_id) for result in comments.results} == {shards[0]}
+    assert snowflake_node(reply.comment_id) == shards[0]
+
+    client.upvote_comment(comments.results[1].comment.comment_id)
+    client.upvote_comment(reply.comment_id)
+    client.upvote_post(post.id)
+    assert client.retrieve_post_content(post.id).score == 1
+    assert client.retrieve_top_n_comments(post.id, 1).comments[0].comment_id == comments.results[1].comment.comment_id
+    assert client.retrieve_and_expand(post.id).comment_id == reply.comment_id
+
+    # Only the owning shard has the post
+    for shard, address in enumerate(cluster):
+        single = RedditClient(*address.split(":"))
+        assert (single.retrieve_post_content(post.id).id == post.id) == (shard == shards[0])
+        single.close()
+
+    # Batches are split over the shards and merged back in order
+    ids = [post.id for post in reversed(posts)] + ["missing"]
+    results = client.batch_get_posts(ids).results
+    assert [result.post.id for result in results[:-1]] == ids[:-1]
+    assert results[-1].status == reddit_pb2.ITEM_NOT_FOUND
+    votes = client.batch_vote([(posts[1].id, True), (reply.comment_id, True), (posts[2].id, False)]).results
+    assert [(vote.item_id, vote.new_score) for vote in votes] == [(posts[1].id, 1), (reply.comment_id, 2), (posts[2].id, -1)]
+
+    assert {name.split(".")[0] for name in client.get_metrics()} <= {f"shard{shard}" for shard in range(NUM_SHARDS)}
+    client.close()
+
+
+def test_ingested_ids_are_placed_by_the_ring(cluster):
+    client = RedditClient(shards=cluster)
+    summary = client.ingest_posts([{"id": f"archive-{i}", "title": f"Archived {i}"} for i in range(20)]
+                                  + [{"id": "archive-7", "title": "Again"}, {"id": "archive-20"}])
+    assert list(summary.ids) == [f"archive-{i}" for i in range(21)]
+    assert [(r.index, r.id) for r in summary.rejected] == [(20, "archive-7")]
+    comments = client.ingest_comments(
+        [{"comment_id": f"archive-{i}-c", "parent_id": f"archive-{i}", "text": "Comment"} for i in range(20)]
+        + [{"comment_id": f"archive-{i}-r", "parent_id": f"archive-{i}-c", "text": "Reply"} for i in range(20)])
+    assert comments.count == 40
+
+    # Archive IDs that look like the cluster's but name another shard than their parent's
+    parent = client.ingest_posts([{"id": "archive-lookalike", "title": "Archived"}]).ids[0]
+    owner = client._post_shard(parent)
+    lookalike = archive_id((owner + 1) % NUM_SHARDS, 1717000000)
+    assert client.ingest_comments([{"comment_id": lookalike, "parent_id": parent, "text": "Comment"}]).count == 1
+    assert client.upvote_comment(lookalike).score == 1  # Remembered where it went
+    client.close()
+    since = RedditClient(shards=cluster, ids_since=1717000001000)
+    assert since.expand_comment_branch(lookalike, 5).comments[0].comment_id == lookalike  # Looked for
+    since.close()
+    # A new client on default settings trusts the bits, then looks for what their shard doesn't have
+    fresh = RedditClient(shards=cluster)
+    assert fresh.upvote_comment(lookalike).score == 2
+    assert fresh.expand_comment_branch(lookalike, 5).comments[0].comment_id == lookalike
+    fresh.close()
+    fresh = RedditClient(shards=cluster)
+    assert fresh.expand_comment_tree(lookalike, 1, 5).root.comment_id == lookalike
+    assert [vote.new_score for vote in fresh.batch_vote([(lookalike, True), ("missing", True)]).results] == [3, 0]
+    fresh.close()
+    fresh = RedditClient(shards=cluster)
+    replies = [fresh.create_comment("user1", lookalike, "Reply").comment_id,
+               fresh.batch_create_comments([("user1", lookalike, "Reply")]).results[0].comment.comment_id]
+    fresh.close()
+    fresh = RedditClient(shards=cluster)
+    assert fresh.ingest_comments([{"comment_id": "archive-lookalike-r", "parent_id": lookalike}]).count == 1
+    fresh.close()
+    fresh = RedditClient(shards=cluster)  # Replies went to the shard their parent is on
+    branch = fresh.expand_comment_branch(lookalike, 5).comments
+    assert {comment.comment_id for comment in branch} == {lookalike, *replies, "archive-lookalike-r"}
+    fresh.close()
+
+    # A new client finds the archive's items without having seen the ingest
+    fresh = RedditClient(shards=cluster)
+    for i in range(20):
+        assert fresh.retrieve_post_content(f"archive-{i}").title == f"Archived {i}"
+        branch = fresh.expand_comment_branch(f"archive-{i}-c", 5)
+        assert [comment.comment_id for comment in branch.comments] == [f"archive-{i}-c", f"archive-{i}-r"]
+    assert fresh.upvote_comment("archive-3-r").score == 1
+    reply = fresh.create_comment("user1", "archive-3-r", "Reply to an archived comment")
+    assert fresh.expand_comment_branch("archive-3-r", 5).comments[1].comment_id == reply.comment_id
+    fresh.close()
@@ -0,0 +1,142 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import grpc
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from ids import node_of
+from proto import reddit_pb2, reddit_pb2_grpc
+from shared_store import SharedState, SharedStore
+
+WORKERS_PORT = 50071
+
+
+@pytest.fixture
+def state():
+    state = SharedState(capacity=100)
+    yield state
+    state.close()
+
+
+def test_workers_see_each_others_writes(state):
+    first, second = SharedStore(state), SharedStore(state, simulates=False)
+    first.add_post(reddit_pb2.Post(id="p1", title="Title", score=3))
+    # Replies to different parents interleaved in one batch keep their slots in every worker
+    second.add_comments([reddit_pb2.Comment(comment_id="c1", parent_id="p1", text="First"),
+                         reddit_pb2.Comment(comment_id="r1", parent_id="c1", text="Reply"),
+                         reddit_pb2.Comment(comment_id="c2", parent_id="p1", text="Second")])
+    first.vote_comment("c2", 5)
+    second.vote_comment("r1", 2)
+    second.vote_post("p1", 1)
+
+    for store in (first, second):
+        assert store.get_post("p1").score == 4
+        assert [comment.comment_id for comment in store.top_children("p1", 5)] == ["c2", "c1"]
+        assert store.get_comment("r1").score == 2 and store.get_comment("c1").score == 0
+        assert store.has_replies("c1") and store.comment_ids() == ["c1", "r1", "c2"]
+
+
+def test_many_children_follow_other_workers_votes(state):
+    first, second = SharedStore(state), SharedStore(state, simulates=False)
+    first.add_post(reddit_pb2.Post(id="p1"))
+    first.add_comments([reddit_pb2.Comment(comment_id=f"c{i}", parent_id="p1") for i in range(80)])
+    assert len(second.top_children("p1", 100)) == 80
+    first.vote_comment("c50", 3)
+    second.vote_comment("c70", 2)
+    for store in (first, second):
+        assert [comment.comment_id for comment in store.top_children("p1", 3)] == ["c50", "c70", "c0"]
+        comments, cursor = store.children_page("p1", None, 2)
+        assert [comment.comment_id for comment in comments] == ["c50", "c70"] and cursor == "2:70"
+
+
+def test_random_walk_reports_changes_from_any_worker(state):
+    simulator, watcher = SharedStore(state), SharedStore(state, simulates=False)
+    simulator.add_posts([reddit_pb2.Post(id=f"p{i}") for i in range(20)])
+    watched = ["p0", "p1", "missing"]
+    assert watcher.random_walk(np.random.default_rng(1), watched) == []  # Nothing seen yet
+
+    simulator.random_walk(np.random.default_rng(1))
+    changed = dict(watcher.random_walk(np.random.default_rng(1), watched))
+    assert changed == {item_id: simulator.get_post(item_id).score for item_id in ["p0", "p1"]
+                       if simulator.get_post(item_id).score != 0}
+
+    simulator.vote_post("p1", 10)
+    assert watcher.random_walk(np.random.default_rng(1), watched) == [("p1", simulator.get_post("p1").score)]
+    assert simulator.get_post("p5").score == watcher.get_post("p5").score  # The watcher never steps
+
+
+def test_workers_hear_of_each_others_votes(state):
+    first, second = SharedStore(state), SharedStore(state, simulates=False)
+    first.add_posts([reddit_pb2.Post(id="p1"), reddit_pb2.Post(id="p2")])
+    assert state.post_stripes is not state.comment_stripes and len(state.post_stripes) > 1
+    watched = ["p1", "p2"]
+    assert second.changed_scores(watched) == []  # Nothing seen yet
+
+    first.vote_post("p1", 2)
+    second.vote_post("p2", 1)  # Its own vote, already published by the servicer
+    assert second.changed_scores(watched) == [("p1", 2)]
+    assert second.changed_scores(watched) == []
+
+
+def vote_from_child(state):
+    store = SharedStore(state, simulates=False)
+    store.add_comment(reddit_pb2.Comment(comment_id="child", parent_id="p1"))
+    for _ in range(100):
+        store.vote_post("p1", 1)
+
+
+def test_forked_workers_share_scores(state):
+    store = SharedStore(state)
+    store.add_post(reddit_pb2.Post(id="p1"))
+    context = multiprocessing.get_context('fork')
+    children = [context.Process(target=vote_from_child, args=(state,)) for _ in range(3)]
+    for child in children:
+        child.start()
+    for _ in range(100):
+        store.vote_post("p1", -1)
+    for child in children:
+        child.join()
+        assert child.exitcode == 0
+    assert store.get_post("p1").score == 200
+    assert [comment.comment_id for comment in store.top_children("p1", 5)] == ["child"] * 3
+
+
+def test_capacity_is_fixed(state):
+    store = SharedStore(state)
+    store.add_posts([reddit_pb2.Post(id=f"p{i}") for i in range(100)])
+    with pytest.raises(ValueError):
+        store.add_post(reddit_pb2.Post(id="p100"))
+    assert len(store.post_ids()) == 100
+
+
+def test_multi_process_server():
+    server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(__file__), '..', 'server', 'reddit_service.py'),
+                               '--workers', '2', '--port', str(WORKERS_PORT), '--node-id', '5'],
+                              env={**os.environ, 'PYTHONPATH': os.path.join(os.path.dirname(__file__), '..')})
+    try:
+        # Channels that don't share a connection, so the kernel hands them to different workers
+        channels = [grpc.insecure_channel(f"localhost:{WORKERS_PORT}", options=[('grpc.use_local_subchannel_pool', 1)])
+                    for _ in range(8)]
+        grpc.channel_ready_future(channels[0]).result(timeout=10)
+        time.sleep(0.5)  # The other worker is listening by now too
+        for channel in channels[1:]:
+            grpc.channel_ready_future(channel).result(timeout=10)
+        stubs = [reddit_pb2_grpc.RedditServiceStub(channel) for channel in channels]
+        posts = [stub.CreatePost(reddit_pb2.Post(title="Title", text="Text", author="user1")) for stub in stubs]
+        assert {node_of(int(post.id)) for post in posts} <= {5, 6}
+        for stub in stubs:
+            stub.UpvoteDownvotePost(reddit_pb2.UpvoteDownvoteRequest(item_id=posts[0].id, upvote=True))
+        for stub in stubs:
+            post = stub.RetrievePostContent(reddit_pb2.PostRequest(post_id=posts[0].id))
+            assert post.score == len(stubs)
+        for channel in channels:
+            channel.close()
+    finally:
+        server.terminate()
+        assert server.wait(timeout=10) == 0
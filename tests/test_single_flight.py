@@ -0,0 +1,109 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from proto import reddit_pb2
+from metrics import Metrics
+from reddit_service import RedditService
+from single_flight import SingleFlight
+from store import Store
+
+
+def run_concurrently(count, call):
+    results = [None] * count
+
+    def target(i):
+        try:
+            results[i] = call()
+        except Exception as e:
+            results[i] = e
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def wait_for_followers(metrics, name, count):
+    while metrics.values().get(f"{name}_calls", 0) < count:
+        time.sleep(0.01)
+
+
+def test_concurrent_calls_share_one_run():
+    metrics = Metrics()
+    flights = SingleFlight('reads', metrics)
+    release = threading.Event()
+    runs = []
+
+    def slow(value):
+        runs.append(value)
+        release.wait()
+        return value
+
+    threads, results = run_concurrently(5, lambda: flights.do('key', lambda: slow("first")))
+    wait_for_followers(metrics, 'reads', 5)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert runs == ["first"] and results == ["first"] * 5
+    assert metrics.values()['reads_coalescing_ratio'] == 0.8
+
+    # Finished flights aren't remembered, other keys don't wait
+    assert flights.do('key', lambda: slow("second")) == "second"
+    assert flights.do('other', lambda: slow("third")) == "third"
+    assert metrics.values()['reads_coalescing_ratio'] == 4 / 7
+
+
+def test_errors_reach_every_waiting_call():
+    metrics = Metrics()
+    flights = SingleFlight('reads', metrics)
+    release = threading.Event()
+
+    def failing():
+        release.wait()
+        raise ValueError("broken")
+
+    threads, results = run_concurrently(3, lambda: flights.do('key', failing))
+    wait_for_followers(metrics, 'reads', 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert all(isinstance(result, ValueError) for result in results)
+    with pytest.raises(ValueError):
+        flights.do('key', failing)
+
+
+class SlowStore(Store):
+    # Top children reads wait until the test lets them through
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+        self.reads = 0
+
+    def top_children(self, parent_id, n):
+        self.reads += 1
+        self.release.wait()
+        return super().top_children(parent_id, n)
+
+
+def test_identical_top_comments_reads_are_coalesced():
+    store = SlowStore()
+    service = RedditService(store)
+    store.release.set()
+    post = service.CreatePost(reddit_pb2.Post(title="Title", text="Text", subreddit_id=1), None)
+    comment = service.CreateComment(reddit_pb2.Comment(author="user1", parent_id=post.id, text="Comment"), None)
+    store.release.clear()
+
+    calls = service.top_comments_flights.metrics.values().get('top_comments_calls', 0)
+    request = reddit_pb2.TopNCommentsRequest(post_id=post.id, n=5)
+    threads, results = run_concurrently(4, lambda: service.RetrieveTopNComments(request, None))
+    wait_for_followers(service.top_comments_flights.metrics, 'top_comments', calls + 4)
+    store.release.set()
+    for thread in threads:
+        thread.join()
+    assert store.reads == 1
+    assert all(result.comments[0].comment_id == comment.comment_id for result in results)
@@ -0,0 +1,121 @@
+import os
+import sqlite3
+import sys
+import threading
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from proto import reddit_pb2
+from storage import Database
+from reddit_service import RedditService
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / "storage.db"))
+    yield database
+    database.close()
+
+
+def test_post_roundtrip_and_votes(db):
+    db.add_post(reddit_pb2.Post(id="p1", title="Title", text="Text", author="user1",
+                                image_url="http://img", publication_date=10, subreddit_id=1))
+    post = db.get_post("p1")
+    assert post.title == "Title"
+    assert post.image_url == "http://img"
+    assert post.WhichOneof("media") == "image_url"
+
+    assert db.vote_post("p1", 1).score == 1
+    assert db.vote_post("p1", -1).score == 0
+    assert db.vote_post("missing", 1) is None
+    assert db.get_post("missing") is None
+
+
+def test_top_children_and_replies(db):
+    db.add_post(reddit_pb2.Post(id="p1", title="Title", text="Text"))
+    for comment_id, score in [("c1", 1), ("c2", 3), ("c3", 1)]:
+        db.add_comment(reddit_pb2.Comment(comment_id=comment_id, author="user1", parent_id="p1", text=comment_id))
+        db.vote_comment(comment_id, score)
+    db.add_comment(reddit_pb2.Comment(comment_id="r1", author="user2", parent_id="c2", text="reply"))
+
+    top = db.top_children("p1", 3)
+    assert [comment.comment_id for comment in top] == ["c2", "c1", "c3"]  # Ties in creation order
+    assert top[0].text == "c2"
+    assert db.has_replies("c2")
+    assert not db.has_replies("c1")
+    assert [comment.comment_id for comment in db.top_children("c2", 5)] == ["r1"]
+
+
+def test_replies_are_linked_to_root_post(db):
+    db.add_comment(reddit_pb2.Comment(comment_id="c1", author="user1", parent_id="p1", text="comment"))
+    db.add_comment(reddit_pb2.Comment(comment_id="r1", author="user2", parent_id="c1", text="reply"))
+    post_ids = db._connection().execute("SELECT comment_id, post_id FROM comments ORDER BY rowid").fetchall()
+    assert post_ids == [("c1", "p1"), ("r1", "p1")]
+
+
+def test_data_survives_reopen(tmp_path):
+    path = str(tmp_path / "storage.db")
+    db = Database(path)
+    db.add_post(reddit_pb2.Post(id="p1", title="Title", text="Text"))
+    db.vote_post("p1", 1)
+    db.close()
+
+    db = Database(path)
+    assert db.get_post("p1").score == 1
+    db.close()
+
+
+def test_wal_mode_and_indexes(db):
+    conn = db._connection()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    plan = conn.execute("EXPLAIN QUERY PLAN SELECT comment_id FROM comments WHERE parent_id = ? "
+                        "ORDER BY score DESC, rowid LIMIT 5", ("p1",)).fetchall()
+    assert "comments_parent_score" in plan[0][3]
+    assert not any("TEMP B-TREE" in row[3] for row in plan)  # The index already gives score order
+
+
+def test_each_thread_gets_its_own_connection(db):
+    connections = [db._connection()]
+    thread = threading.Thread(target=lambda: connections.append(db._connection()))
+    thread.start()
+    thread.join()
+    assert connections[0] is not connections[1]
+    assert db._connection() is connections[0]
+
+
+def test_service_on_database(db):
+    service = RedditService(db)
+    post = service.CreatePost(reddit_pb2.Post(title="Title", text="Text", subreddit_id=1), None)
+    comment = service.CreateComment(reddit_pb2.Comment(author="user1", parent_id=post.id, text="Comment"), None)
+    service.CreateComment(reddit_pb2.Comment(author="user2", parent_id=comment.comment_id, text="Reply"), None)
+    service.UpvoteDownvoteComment(reddit_pb2.UpvoteDownvoteRequest(item_id=comment.comment_id, upvote=True), None)
+
+    response = service.RetrieveTopNComments(reddit_pb2.TopNCommentsRequest(post_id=post.id, n=5), None)
+    assert [c.comment_id for c in response.comments] == [comment.comment_id]
+    assert response.comments[0].score == 1
+    assert list(response.has_replies) == [True]
+    assert service.RetrievePostContent(reddit_pb2.PostRequest(post_id=post.id), None).title == "Title"
+
+
+def test_bulk_inserts_are_all_or_nothing(db):
+    with pytest.raises(sqlite3.IntegrityError):
+        db.add_posts([reddit_pb2.Post(id="p1", title="First"), reddit_pb2.Post(id="p1", title="Again")])
+    assert db.get_post("p1") is None
+
+    # The service reports every item of a chunk the database failed on and goes on with the stream
+    service = RedditService(db)
+    add_posts = db.add_posts
+
+    def failing(posts):
+        if any(post.id == "bad" for post in posts):
+            raise sqlite3.OperationalError("disk I/O error")
+        add_posts(posts)
+    db.add_posts = failing
+    summary = service.IngestPosts(iter([reddit_pb2.Post(id="bad"), reddit_pb2.Post(id="p2")]), None)
+    assert (summary.count, [(r.index, r.id, r.status) for r in summary.rejected]) == (
+        0, [(0, "bad", reddit_pb2.ITEM_FAILED), (1, "p2", reddit_pb2.ITEM_FAILED)])
+    assert db.get_post("p2") is None
+    summary = service.IngestPosts(iter([reddit_pb2.Post(id="p2")]), None)
+    assert list(summary.ids) == ["p2"] and not summary.rejected
@@ -0,0 +1,198 @@
+import os
+import sys
+import threading
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from ids import to_wire
+from proto import reddit_pb2
+from ranking import decode_cursor, rank
+from score_table import ScoreTable
+from store import RANKED_CHILDREN, Store
+
+NUM_THREADS = 16
+VOTES_PER_THREAD = 2000
+
+
+def run_concurrently(target, num_threads=NUM_THREADS):
+    # Switch threads as often as possible to make lost updates likely if locking is broken
+    old_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        barrier = threading.Barrier(num_threads)
+
+        def worker(index):
+            barrier.wait()
+            target(index)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(num_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(old_interval)
+
+
+def test_concurrent_post_votes_are_not_lost():
+    store = Store()
+    for post_id in ["p1", "p2", "p3"]:
+        store.add_post(reddit_pb2.Post(id=post_id))
+
+    def vote(index):
+        for i in range(VOTES_PER_THREAD):
+            store.vote_post(f"p{i % 3 + 1}", 1)
+            store.vote_post("p3", -1 if index % 2 else 1)
+
+    run_concurrently(vote)
+
+    total = NUM_THREADS * VOTES_PER_THREAD
+    assert store.get_post("p1").score == sum(1 for i in range(VOTES_PER_THREAD) if i % 3 == 0) * NUM_THREADS
+    assert store.get_post("p2").score == sum(1 for i in range(VOTES_PER_THREAD) if i % 3 == 1) * NUM_THREADS
+    # Half the threads upvote and half downvote p3 on every iteration
+    assert store.get_post("p3").score == sum(1 for i in range(VOTES_PER_THREAD) if i % 3 == 2) * NUM_THREADS
+    assert store.get_post("p1").score + store.get_post("p2").score + store.get_post("p3").score == total
+
+
+def test_concurrent_comment_votes_keep_index_consistent():
+    store = Store()
+    store.add_post(reddit_pb2.Post(id="p1"))
+    comment_ids = [f"c{i}" for i in range(8)]
+    for comment_id in comment_ids:
+        store.add_comment(reddit_pb2.Comment(comment_id=comment_id, parent_id="p1"))
+
+    def vote(index):
+        for i in range(VOTES_PER_THREAD):
+            # Comment c<k> ends up with a score of k * NUM_THREADS * VOTES_PER_THREAD / 8
+            comment_id = comment_ids[i % len(comment_ids)]
+            store.vote_comment(comment_id, int(comment_id[1:]))
+
+    run_concurrently(vote)
+
+    per_comment = NUM_THREADS * VOTES_PER_THREAD // len(comment_ids)
+    for comment_id in comment_ids:
+        assert store.get_comment(comment_id).score == int(comment_id[1:]) * per_comment
+    top = store.top_children("p1", len(comment_ids))
+    assert [comment.comment_id for comment in top] == list(reversed(comment_ids))
+
+
+def test_vote_returns_score_of_that_vote():
+    store = Store()
+    store.add_post(reddit_pb2.Post(id="p1"))
+    results = []
+
+    def vote(index):
+        for _ in range(500):
+            results.append(store.vote_post("p1", 1).score)
+
+    run_concurrently(vote, num_threads=8)
+
+    # Every vote saw a distinct score, as if the votes ran one after another
+    assert sorted(results) == list(range(1, 8 * 500 + 1))
+
+
+def test_votes_on_different_slots_take_different_locks():
+    table = ScoreTable(num_stripes=4)
+    table.add_many((f"c{i}", 0, None) for i in range(8))
+    with table._stripes[0]:  # As if a vote on slot 0 were running
+        other = threading.Thread(target=table.vote, args=(1, 5))
+        other.start()
+        other.join(timeout=5)
+        assert not other.is_alive() and table.score(1) == 5
+        same = threading.Thread(target=table.vote, args=(4, 1))  # Slot 4 shares slot 0's stripe
+        same.start()
+        same.join(timeout=0.1)
+        assert same.is_alive()
+    same.join()
+    assert table.score(4) == 1
+
+
+def test_concurrent_creates_and_votes():
+    store = Store()
+    store.add_post(reddit_pb2.Post(id="p1"))
+
+    def create_and_vote(index):
+        for i in range(200):
+            comment_id = f"c{index}-{i}"
+            store.add_comment(reddit_pb2.Comment(comment_id=comment_id, parent_id="p1"))
+            store.vote_comment(comment_id, 1)
+
+    run_concurrently(create_and_vote)
+
+    top = store.top_children("p1", NUM_THREADS * 200)
+    assert len(top) == NUM_THREADS * 200
+    assert all(comment.score == 1 for comment in top)
+    assert store.vote_comment("missing", 1) is None
+    assert store.vote_post("missing", 1) is None
+
+
+def test_random_walk_moves_every_score():
+    store = Store()
+    store.add_posts([reddit_pb2.Post(id=f"p{i}") for i in range(1000)])
+    store.add_comments([reddit_pb2.Comment(comment_id=f"c{i}", parent_id="p0", score=10) for i in range(1000)])
+
+    changed = dict(store.random_walk(np.random.default_rng(1), ["p0", "c0", "c1", "missing"]))
+
+    post_scores = [store.get_post(f"p{i}").score for i in range(1000)]
+    comment_scores = [store.get_comment(f"c{i}").score for i in range(1000)]
+    assert set(post_scores) == {-1, 0, 1}
+    assert set(comment_scores) == {9, 10, 11}
+    # Only watched items that actually moved are reported
+    expected = {"p0": post_scores[0], "c0": comment_scores[0], "c1": comment_scores[1]}
+    assert changed == {item_id: score for item_id, score in expected.items() if score not in (0, 10)}
+    top = store.top_children("p0", 5)
+    assert [comment.score for comment in top] == [11] * 5
+
+
+def test_many_children_are_kept_in_score_order():
+    store = Store()
+    store.add_post(reddit_pb2.Post(id="p1"))
+    count = RANKED_CHILDREN * 3
+    store.add_comments([reddit_pb2.Comment(comment_id=f"c{i}", parent_id="p1", score=i % 7) for i in range(count)])
+    rng = np.random.default_rng(3)
+
+    def expected():
+        scores = np.array([store.get_comment(f"c{i}").score for i in range(count)])
+        return [f"c{i}" for i in rank(scores, count)]
+
+    def paged(size):
+        comment_ids, after = [], None
+        while True:
+            comments, cursor = store.children_page("p1", after, size)
+            comment_ids.extend(comment.comment_id for comment in comments)
+            if not cursor:
+                return comment_ids
+            after = decode_cursor(cursor)
+
+    assert [comment.comment_id for comment in store.top_children("p1", count)] == expected()
+    assert "p1" in map(to_wire, store.ranked)
+    for step in range(3):
+        for i in rng.integers(0, count, size=50):
+            store.vote_comment(f"c{i}", int(rng.integers(-3, 4)))
+        store.add_comment(reddit_pb2.Comment(comment_id=f"c{count}", parent_id="p1", score=step))
+        count += 1
+        assert [comment.comment_id for comment in store.top_children("p1", 10)] == expected()[:10]
+        assert paged(17) == expected()
+        store.random_walk(rng)
+        assert paged(50) == expected()
+
+
+def test_records_roundtrip_through_messages():
+    store = Store()
+    post = reddit_pb2.Post(id="p1", title="Title", text="Text", author="user1", video_url="http://video",
+                           state=reddit_pb2.POST_LOCKED, publication_date=10, subreddit_id=3)
+    store.add_post(post)
+    store.add_comments([reddit_pb2.Comment(comment_id=f"c{i}", author="user2", parent_id="p1", text=f"Comment {i}",
+                                           state=reddit_pb2.COMMENT_HIDDEN, publication_date=20) for i in range(2)])
+
+    assert store.get_post("p1") == post
+    assert store.get_post("p1").WhichOneof("media") == "video_url"
+    comment = store.get_comment("c1")
+    assert comment == reddit_pb2.Comment(comment_id="c1", author="user2", parent_id="p1", text="Comment 1",
+                                         state=reddit_pb2.COMMENT_HIDDEN, publication_date=20)
+    # Repeated strings are shared between records
+    first, second = store.comment_scores.records
+    assert first.author is second.author
+    assert first.parent_key is second.parent_key is store.post_scores.ids[0]
@@ -0,0 +1,171 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+
+from proto import reddit_pb2
+from storage import Database
+from vote_buffer import VoteBuffer
+
+
+class FakeStorage:
+    def __init__(self, scores):
+        self.scores = dict(scores)
+        self.batches = []
+        self.fail = False
+
+    def load_score(self, kind, item_id):
+        return self.scores.get((kind, item_id))
+
+    def write_batch(self, deltas):
+        if self.fail:
+            raise RuntimeError("disk full")
+        self.batches.append(dict(deltas))
+        for key, delta in deltas.items():
+            self.scores[key] += delta
+
+
+def make_buffer(storage, **kwargs):
+    return VoteBuffer(storage.load_score, storage.write_batch, **kwargs)
+
+
+def test_votes_are_coalesced_into_one_batch():
+    storage = FakeStorage({('post', 'p1'): 10, ('comment', 'c1'): 0})
+    buffer = make_buffer(storage, flush_interval=60)
+
+    assert buffer.vote('post', 'p1', 1) == 11
+    assert buffer.vote('post', 'p1', 1) == 12
+    assert buffer.vote('comment', 'c1', -1) == -1
+    assert buffer.vote('post', 'missing', 1) is None
+    assert buffer.score('post', 'p1') == 12
+    assert storage.scores[('post', 'p1')] == 10  # Not written yet
+
+    buffer.close()
+    assert storage.batches == [{('post', 'p1'): 2, ('comment', 'c1'): -1}]
+    assert storage.scores[('post', 'p1')] == 12
+    assert buffer.score('post', 'p1') is None  # Storage is the source of truth again
+
+
+def test_flushes_on_size_trigger():
+    storage = FakeStorage({('post', f'p{i}'): 0 for i in range(10)})
+    buffer = make_buffer(storage, max_pending=5, flush_interval=60)
+    for i in range(5):
+        buffer.vote('post', f'p{i}', 1)
+    deadline = time.monotonic() + 2
+    while not storage.batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(storage.batches) == 1
+    assert len(storage.batches[0]) == 5
+    buffer.close()
+
+
+def test_flushes_on_time_trigger():
+    storage = FakeStorage({('post', 'p1'): 0})
+    buffer = make_buffer(storage, flush_interval=0.05)
+    buffer.vote('post', 'p1', 1)
+    time.sleep(0.3)
+    assert storage.scores[('post', 'p1')] == 1  # Durable within the flush interval
+    buffer.close()
+
+
+def test_failed_flush_keeps_votes():
+    storage = FakeStorage({('post', 'p1'): 0})
+    buffer = make_buffer(storage, flush_interval=60)
+    buffer.vote('post', 'p1', 1)
+    storage.fail = True
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    buffer.vote('post', 'p1', 1)
+    storage.fail = False
+    buffer.close()
+    assert storage.scores[('post', 'p1')] == 2
+
+
+def test_concurrent_votes_are_not_lost():
+    storage = FakeStorage({('post', 'p1'): 0})
+    buffer = make_buffer(storage, max_pending=1, flush_interval=0.001)
+
+    def vote():
+        for _ in range(1000):
+            buffer.vote('post', 'p1', 1)
+
+    threads = [threading.Thread(target=vote) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    buffer.close()
+    assert storage.scores[('post', 'p1')] == 8000
+
+
+def test_database_votes_are_written_behind(tmp_path):
+    path = str(tmp_path / "storage.db")
+    db = Database(path, vote_flush_interval=60)
+    db.add_post(reddit_pb2.Post(id="p1", title="Title", text="Text"))
+    db.add_comment(reddit_pb2.Comment(comment_id="c1", author="user1", parent_id="p1", text="a"))
+    db.add_comment(reddit_pb2.Comment(comment_id="c2", author="user1", parent_id="p1", text="b"))
+    db.add_comment(reddit_pb2.Comment(comment_id="c3", author="user1", parent_id="p1", text="c"))
+    for _ in range(3):
+        assert db.vote_post("p1", 1) is not None
+    assert db.vote_comment("c3", 1).score == 1
+    assert db.vote_post("missing", 1) is None
+
+    # Responses and reads see every vote, the table doesn't yet
+    assert db.get_post("p1").score == 3
+    assert [c.comment_id for c in db.top_children("p1", 1)] == ["c3"]
+    assert [c.comment_id for c in db.top_children("p1", 3)] == ["c3", "c1", "c2"]
+    assert db._connection().execute("SELECT score FROM posts").fetchone()[0] == 0
+
+    db.close()
+    db = Database(path)
+    assert db.get_post("p1").score == 3
+    assert db.get_comment("c3").score == 1
+    db.close()
+
+
+def test_storage_reads_happen_outside_the_lock():
+    storage = FakeStorage({('post', 'slow'): 0, ('post', 'p1'): 5})
+    loading = threading.Event()
+    release = threading.Event()
+
+    def load_score(kind, item_id):
+        if item_id == 'slow':
+            loading.set()
+            release.wait()
+        return storage.load_score(kind, item_id)
+
+    buffer = VoteBuffer(load_score, storage.write_batch, flush_interval=60)
+    slow = threading.Thread(target=lambda: buffer.vote('post', 'slow', 1))
+    slow.start()
+    loading.wait()
+    assert buffer.vote('post', 'p1', 1) == 6  # Not stuck behind the slow read
+    release.set()
+    slow.join()
+    assert buffer.score('post', 'slow') == 1
+    buffer.close()
+
+
+def test_flushed_items_are_reported(tmp_path):
+    flushed = []
+    storage = FakeStorage({('post', 'p1'): 0, ('post', 'p2'): 0})
+    buffer = make_buffer(storage, flush_interval=60, flushed=flushed.extend)
+    buffer.vote('post', 'p1', 1)
+    buffer.vote('post', 'p2', 1)
+    buffer.flush()
+    assert sorted(flushed) == [('post', 'p1'), ('post', 'p2')]
+    buffer.close()
+
+    # The database forgets which parents have buffered votes once they are written, even if never read
+    db = Database(str(tmp_path / "storage.db"), vote_flush_interval=60)
+    db.add_post(reddit_pb2.Post(id="p1", title="Title", text="Text"))
+    db.add_comment(reddit_pb2.Comment(comment_id="c1", author="user1", parent_id="p1", text="a"))
+    db.vote_comment("c1", 1)
+    assert db._buffered_children == {"p1": {"c1"}}
+    db.votes.flush()
+    assert db._buffered_children == {} and db._buffered_parents == {}
+    assert db.get_comment("c1").score == 1
+    db.close()